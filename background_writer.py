@@ -0,0 +1,121 @@
+"""Estagio de escrita em background: uma thread consome jobs de uma fila limitada.
+
+O produtor (thread de rede) chama `submit(fn, *args)`; se a fila estiver cheia, `submit`
+bloqueia ate haver espaco (backpressure) e o tempo bloqueado entra em `stats()`. Os jobs
+rodam em ordem, um de cada vez, entao funcoes de persistencia nao precisam de lock proprio.
+`close()` drena a fila e junta a thread. Com `maxsize <= 0` os jobs rodam na propria
+thread do chamador (modo sincrono, mesmas estatisticas).
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_LATENCY_SAMPLES_MAX = 10000
+
+
+class BackgroundWriter:
+    """Executa jobs de escrita numa thread dedicada, alimentada por uma fila de `maxsize` itens."""
+
+    def __init__(self, maxsize: int = 64, name: str = 'writer',
+                 on_depth: Optional[Callable[[int], None]] = None,
+                 on_job: Optional[Callable[[float], None]] = None):
+        self.sync = maxsize <= 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._on_depth = on_depth
+        self._on_job = on_job
+        self._lock = threading.Lock()
+        self._stats = {'jobs': 0, 'errors': 0, 'write_seconds': 0.0, 'blocked_seconds': 0.0,
+                       'max_depth': 0}
+        self._samples: list = []
+        self._closed = False
+        self._thread = None
+        if not self.sync:
+            self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+            self._thread.start()
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Enfileira um job; bloqueia enquanto a fila estiver cheia."""
+        if self._closed:
+            raise RuntimeError('BackgroundWriter ja foi fechado')
+        item = (fn, args, kwargs)
+        if self.sync:
+            self._execute(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            started = time.perf_counter()
+            self._queue.put(item)
+            with self._lock:
+                self._stats['blocked_seconds'] += time.perf_counter() - started
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats['max_depth'] = max(self._stats['max_depth'], depth)
+        if self._on_depth:
+            self._on_depth(depth)
+
+    def _execute(self, item):
+        fn, args, kwargs = item
+        started = time.perf_counter()
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            logger.warning('Falha em job de escrita %s: %s', getattr(fn, '__name__', fn), e)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._stats['jobs'] += 1
+            self._stats['write_seconds'] += elapsed
+            if len(self._samples) < _LATENCY_SAMPLES_MAX:
+                self._samples.append(elapsed)
+        if self._on_job:
+            self._on_job(elapsed)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._execute(item)
+                if self._on_depth:
+                    self._on_depth(self._queue.qsize())
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Espera todos os jobs enfileirados ate agora terminarem."""
+        self._queue.join()
+
+    def close(self):
+        """Drena a fila, para a thread e espera ela terminar (idempotente)."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            samples = sorted(self._samples)
+        out['write_seconds'] = round(out['write_seconds'], 4)
+        out['blocked_seconds'] = round(out['blocked_seconds'], 4)
+        for name, pct in (('p50', 50), ('p95', 95), ('p99', 99)):
+            idx = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1)))) if samples else 0
+            out[f'write_{name}'] = round(samples[idx], 6) if samples else 0.0
+        out['queue_depth'] = self._queue.qsize()
+        return out
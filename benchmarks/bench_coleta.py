@@ -0,0 +1,246 @@
+"""Benchmark end-to-end do coletor contra a API local (fake_spotify_api).
+
+Cada cenario roda `coletar_por_genero`, `run_batch_genres` ou `coletar_todos_generos` em um
+processo filho (DATA_DIR temporario, RSS isolado) contra um FakeSpotifyServer no processo pai,
+e mede: artistas/s, chamadas de API por artista, bytes gravados por artista e pico de RSS.
+
+Uso:
+  python benchmarks/bench_coleta.py                       # sweep rapido
+  python benchmarks/bench_coleta.py --full                # ate 10.000 artistas
+  python benchmarks/bench_coleta.py --save benchmarks/baselines/local.json
+  python benchmarks/bench_coleta.py --compare benchmarks/baselines/local.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_mod
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from fake_spotify_api import FakeCatalog, FakeSpotifyServer  # noqa: E402
+
+# limite de offset da busca: um unico genero rende no maximo 1000 artistas
+MAX_ARTISTS_PER_GENRE = 1000
+
+QUICK_SWEEP = {
+    'modes': ['genero', 'batch', 'todos'],
+    'artists': [10, 100],
+    'genres': [1, 3],
+    'latency_ms': [0, 20],
+    'workers': [1, 8],
+}
+FULL_SWEEP = {
+    'modes': ['genero', 'batch', 'todos'],
+    'artists': [10, 100, 1000, 10000],
+    'genres': [1, 4, 11],
+    'latency_ms': [0, 20, 80],
+    'workers': [1, 8, 32],
+}
+# intervalo entre as checagens de que o processo filho ainda esta vivo
+CHILD_POLL_SECONDS = 1.0
+# metricas comparadas em --compare e se "maior e melhor"
+COMPARED = {'artists_per_sec': True, 'api_calls_per_artist': False,
+            'bytes_written_per_artist': False, 'peak_rss_mb': False}
+
+
+def scenario_key(sc: dict) -> str:
+    return f"{sc['mode']}|artists={sc['artists']}|genres={sc['genres']}|latency={sc['latency_ms']}|workers={sc['workers']}"
+
+
+def build_scenarios(sweep: dict) -> list:
+    scenarios = []
+    for mode in sweep['modes']:
+        for genres in sweep['genres']:
+            # coletar_por_genero e sempre um genero so
+            if mode == 'genero' and genres != 1:
+                continue
+            if mode != 'genero' and genres == 1:
+                continue
+            for artists in sweep['artists']:
+                if artists / genres > MAX_ARTISTS_PER_GENRE:
+                    continue
+                for latency in sweep['latency_ms']:
+                    for workers in sweep['workers']:
+                        scenarios.append({'mode': mode, 'artists': artists, 'genres': genres,
+                                          'latency_ms': latency, 'workers': workers})
+    return scenarios
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for fn in files:
+            try:
+                total += os.path.getsize(os.path.join(root, fn))
+            except OSError:
+                pass
+    return total
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB, macOS bytes
+    return peak / (1024 * 1024) if platform.system() == 'Darwin' else peak / 1024
+
+
+def _run_child(sc: dict, base_url: str, data_dir: str, queue):
+    """Processo filho: configura o ambiente antes de importar o coletor e roda o cenario."""
+    per_genre = max(1, sc['artists'] // sc['genres'])
+    os.environ.update({
+        'DATA_DIR': data_dir,
+        'SPOTIFY_API_BASE_URL': base_url,
+        'SPOTIFY_AUTH_BASE_URL': base_url,
+        'SPOTIFY_CLIENT_ID': 'bench-id',
+        'SPOTIFY_CLIENT_SECRET': 'bench-secret',
+        'SPOTIFY_QTD_ARTISTAS': str(per_genre),
+        'SPOTIFY_RATE_LIMIT_RPS': os.environ.get('BENCH_RATE_LIMIT_RPS', '0'),
+        'SPOTIFY_HTTP_POOL_MAXSIZE': str(max(10, sc['workers'])),
+        'SPOTIFY_DISCOVERY_TTL_HOURS': '0',
+    })
+    import logging
+
+    import coleta_spotify as cs
+    cs.logger.setLevel(logging.WARNING)
+
+    started = time.perf_counter()
+    if sc['mode'] == 'genero':
+        cs.coletar_por_genero('genre000', per_genre, 'BR', workers=sc['workers'])
+    elif sc['mode'] == 'batch':
+        cs.run_batch_genres(sc['genres'], os.path.join(data_dir, 'rotation.json'), workers=sc['workers'])
+    else:
+        cs.coletar_todos_generos(per_genre, workers=sc['workers'])
+    elapsed = time.perf_counter() - started
+    queue.put({'elapsed_s': elapsed, 'artists_processed': cs._METRICS.get('artists_processed', 0),
+               'collector_api_calls': cs._METRICS.get('api_calls', 0), 'peak_rss_mb': _peak_rss_mb()})
+
+
+def _aguardar_filho(proc, queue, key: str) -> dict:
+    """Resultado do filho; RuntimeError se ele morrer sem entregar (import, excecao no coletor...)."""
+    while True:
+        try:
+            return queue.get(timeout=CHILD_POLL_SECONDS)
+        except queue_mod.Empty:
+            pass
+        if not proc.is_alive():
+            # o filho pode ter posto o resultado logo antes de sair
+            try:
+                return queue.get(timeout=CHILD_POLL_SECONDS)
+            except queue_mod.Empty:
+                proc.join()
+                raise RuntimeError(f'cenario {key}: processo filho saiu com codigo {proc.exitcode} '
+                                   'sem entregar resultado')
+
+
+def run_scenario(sc: dict, keep_data: bool = False) -> dict:
+    per_genre = max(1, sc['artists'] // sc['genres'])
+    catalog = FakeCatalog(artists=per_genre * sc['genres'], genres=sc['genres'])
+    data_dir = tempfile.mkdtemp(prefix='bench_coleta_')
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    try:
+        with FakeSpotifyServer(catalog, latency_ms=sc['latency_ms']) as server:
+            proc = ctx.Process(target=_run_child, args=(sc, server.base_url, data_dir, queue))
+            proc.start()
+            result = _aguardar_filho(proc, queue, scenario_key(sc))
+            proc.join()
+            server_calls = sum(server.stats.values())
+        written = _dir_size(data_dir)
+    finally:
+        if not keep_data:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    artists = result['artists_processed'] or 1
+    return dict(sc, **{
+        'elapsed_s': round(result['elapsed_s'], 3),
+        'artists_processed': result['artists_processed'],
+        'artists_per_sec': round(result['artists_processed'] / result['elapsed_s'], 2) if result['elapsed_s'] else 0.0,
+        'api_calls': server_calls,
+        'api_calls_per_artist': round(server_calls / artists, 3),
+        'bytes_written': written,
+        'bytes_written_per_artist': round(written / artists),
+        'peak_rss_mb': round(result['peak_rss_mb'], 1),
+    })
+
+
+def compare(results: list, baseline_path: str, max_regression: float) -> int:
+    """Imprime a variacao contra o baseline; retorna 1 se alguma metrica piorou alem do limite."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {scenario_key(r): r for r in json.load(f)['results']}
+    regressions = 0
+    for r in results:
+        base = baseline.get(scenario_key(r))
+        if not base:
+            print(f'{scenario_key(r)}: sem baseline')
+            continue
+        parts = []
+        for metric, higher_is_better in COMPARED.items():
+            old, new = base.get(metric), r.get(metric)
+            if not old:
+                continue
+            delta = (new - old) / old
+            worse = -delta if higher_is_better else delta
+            flag = ''
+            if worse > max_regression:
+                flag = ' !'
+                regressions += 1
+            parts.append(f'{metric} {old} -> {new} ({delta:+.1%}){flag}')
+        print(f'{scenario_key(r)}: ' + '; '.join(parts))
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark end-to-end do coletor Spotify')
+    parser.add_argument('--full', action='store_true', help='Sweep completo (ate 10.000 artistas)')
+    parser.add_argument('--modes', help='Lista separada por virgula: genero,batch,todos')
+    parser.add_argument('--artists', help='Tamanhos (total de artistas), ex: 10,100,1000')
+    parser.add_argument('--genres', help='Quantidades de generos, ex: 1,4')
+    parser.add_argument('--latency-ms', help='Latencias simuladas, ex: 0,50')
+    parser.add_argument('--workers', help='Valores de --workers, ex: 1,8')
+    parser.add_argument('--save', help='Grava os resultados como baseline JSON neste caminho')
+    parser.add_argument('--compare', help='Baseline JSON para comparar')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Piora relativa tolerada antes de falhar o --compare (default 0.2)')
+    args = parser.parse_args()
+
+    sweep = dict(FULL_SWEEP if args.full else QUICK_SWEEP)
+    for name in ('modes', 'artists', 'genres', 'latency_ms', 'workers'):
+        raw = getattr(args, name)
+        if raw:
+            values = raw.split(',')
+            sweep[name] = values if name == 'modes' else [int(v) for v in values]
+
+    results = []
+    falhas = 0
+    for sc in build_scenarios(sweep):
+        try:
+            r = run_scenario(sc)
+        except RuntimeError as e:
+            falhas += 1
+            print(f'{scenario_key(sc)}: FALHOU: {e}', file=sys.stderr)
+            continue
+        results.append(r)
+        print(f"{scenario_key(r)}: {r['artists_per_sec']} artistas/s, {r['api_calls_per_artist']} calls/artista, "
+              f"{r['bytes_written_per_artist']} B/artista, pico RSS {r['peak_rss_mb']} MB")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'generated_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                       'python': platform.python_version(), 'platform': platform.platform(),
+                       'results': results}, f, ensure_ascii=False, indent=2)
+        print(f'Baseline salvo em {args.save}')
+    code = compare(results, args.compare, args.max_regression) if args.compare else 0
+    if falhas or code:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,47 @@
 import argparse
+import atexit
+import hashlib
 import json
 import logging
+import math
 import os
+import random
 import shutil
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import List, Optional
+from urllib.parse import quote
 
+import pyarrow.parquet as pq
 import requests
 from dotenv import load_dotenv
-from jsonschema import ValidationError, validate
+from jsonschema.validators import validator_for
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from background_writer import BackgroundWriter
+from db_client import DEFAULT_MARKET, insert_artist_tracks
+from http_cache import ResponseCache
+from parquet_sink import ParquetSink
+from raw_archive import DedupeIndex, RawArchive, payload_sha256
+from retention import aplicar as aplicar_retencao
 
-from db_client import insert_artist_tracks
+try:
+    import fcntl  # lock do cache de token em disco (POSIX)
+except ImportError:
+    fcntl = None
+
+try:
+    import fastjsonschema  # validador gerado em codigo; sem o pacote usa o validador do jsonschema
+except ImportError:
+    fastjsonschema = None
 
 # Load .env only if present, but do not overwrite existing environment variables.
 # We call load_dotenv with override=False to avoid accidentally overwriting variables set
@@ -54,7 +83,7 @@ def security_check_env():
     repo_candidates = ['.env', '.env.local', '.secrets', 'credentials.txt']
     for p in repo_candidates:
         full = os.path.join(os.path.dirname(__file__), p)
-        if os.path.exists(full) and _file_contains_secret(full, required):
+        if os.path.exists(full) and _file_contains_secret(full, required + ['SPOTIFY_CREDENTIALS']):
             raise RuntimeError(
                 f'Arquivo {p} contem possiveis secrets. Remova antes de commitar.')
 
@@ -83,33 +112,107 @@ logger.setLevel(logging.INFO)
 # Config via variaveis de ambiente
 CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
 CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
+# Pool opcional de credenciais extras: "id1:secret1,id2:secret2"
+CREDENTIALS = [tuple(c.strip().split(':', 1)) for c in os.getenv('SPOTIFY_CREDENTIALS', '').split(',')
+               if ':' in c]
+if not CLIENT_ID and CREDENTIALS:
+    CLIENT_ID, CLIENT_SECRET = CREDENTIALS[0]
 
 # Defaults
 GENERO = os.getenv('SPOTIFY_GENERO', 'rock')
 QTD_ARTISTAS = int(os.getenv('SPOTIFY_QTD_ARTISTAS', '10'))
+WORKERS = int(os.getenv('SPOTIFY_WORKERS', '1'))
+# Campos que cada helper realmente usa, enviados via `fields` onde a API aceita o parametro
+# (hoje so os endpoints de playlist; search, top-tracks e artists devolvem o objeto completo)
+API_FIELDS = {
+    'playlist-tracks': 'items(track(artists(id,name))),next',
+}
+# Limites da busca do Spotify: itens por pagina e offset maximo
+SEARCH_PAGE_MAX = 50
+SEARCH_MAX_OFFSET = 1000
+# Estrategia por playlist: quantas playlists agregar e limite de paginas (100 tracks) por playlist
+PLAYLIST_MAX = int(os.getenv('SPOTIFY_PLAYLIST_MAX', '3'))
+PLAYLIST_MAX_PAGES = int(os.getenv('SPOTIFY_PLAYLIST_MAX_PAGES', '10'))
+# Por quanto tempo reaproveitar a lista de artistas descoberta por genero (0 = sempre buscar)
+DISCOVERY_TTL_HOURS = float(os.getenv('SPOTIFY_DISCOVERY_TTL_HOURS', '24'))
 DATA_DIR = os.getenv('DATA_DIR', 'data')
 RAW_DIR = os.path.join(DATA_DIR, 'raw')
 PROCESSED_DIR = os.path.join(DATA_DIR, 'processed')
 SCHEMA_PATH = os.path.join(os.path.dirname(
     __file__), 'schema', 'top_tracks_schema.json')
 
+# Base das APIs (sobrescreva para apontar para um stand-in local, ex.: fake_spotify_api.py)
+API_BASE_URL = os.getenv('SPOTIFY_API_BASE_URL', 'https://api.spotify.com').rstrip('/')
+AUTH_BASE_URL = os.getenv('SPOTIFY_AUTH_BASE_URL', 'https://accounts.spotify.com').rstrip('/')
+
+# HTTP connection pool (keep-alive) compartilhado por todas as chamadas a API
+HTTP_POOL_CONNECTIONS = int(os.getenv('SPOTIFY_HTTP_POOL_CONNECTIONS', '4'))
+HTTP_POOL_MAXSIZE = int(os.getenv('SPOTIFY_HTTP_POOL_MAXSIZE', '10'))
+HTTP_POOL_BLOCK = os.getenv('SPOTIFY_HTTP_POOL_BLOCK', '0') == '1'
+HTTP_KEEP_ALIVE = os.getenv('SPOTIFY_HTTP_KEEP_ALIVE', '1') != '0'
+
+# Rate limit global (token bucket): requisicoes/s e rajada maxima (0 = sem limite)
+RATE_LIMIT_RPS = float(os.getenv('SPOTIFY_RATE_LIMIT_RPS', '10'))
+RATE_LIMIT_BURST = int(os.getenv('SPOTIFY_RATE_LIMIT_BURST', '10'))
+# Pool de credenciais (SPOTIFY_CREDENTIALS): cada uma tem o proprio bucket com os limites acima;
+# N 429 seguidos colocam a credencial em quarentena por SPOTIFY_CREDENTIAL_QUARANTINE_SECONDS
+CREDENTIAL_QUARANTINE_429 = int(os.getenv('SPOTIFY_CREDENTIAL_QUARANTINE_429', '3'))
+CREDENTIAL_QUARANTINE_SECONDS = float(os.getenv('SPOTIFY_CREDENTIAL_QUARANTINE_SECONDS', '300'))
+
+# Circuit breaker por endpoint e teto do backoff com jitter
+BREAKER_FAILURES = int(os.getenv('SPOTIFY_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('SPOTIFY_BREAKER_RESET_SECONDS', '30'))
+BACKOFF_CAP_SECONDS = float(os.getenv('SPOTIFY_BACKOFF_CAP_SECONDS', '30'))
+
+# Cache HTTP em disco (GET) com revalidacao por ETag/Last-Modified
+HTTP_CACHE_ENABLED = os.getenv('SPOTIFY_HTTP_CACHE', '1') != '0'
+HTTP_CACHE_MAX_MB = int(os.getenv('SPOTIFY_HTTP_CACHE_MAX_MB', '256'))
+
+# Fila do writer em background (persistencia); 0 = gravar na thread da coleta
+WRITER_QUEUE = int(os.getenv('SPOTIFY_WRITER_QUEUE', '64'))
+
+# Raw: 'json' (um arquivo por resposta em raw/misc) ou 'ndjson' (segmentos comprimidos por genero/dia)
+RAW_FORMAT = os.getenv('SPOTIFY_RAW_FORMAT', 'json')
+RAW_COMPRESSION = os.getenv('SPOTIFY_RAW_COMPRESSION', 'gzip')
+RAW_SEGMENT_MB = int(os.getenv('SPOTIFY_RAW_SEGMENT_MB', '64'))
+# Payload raw igual ao ultimo da mesma chave vira referencia (sha256) em vez de nova copia
+RAW_DEDUPE = os.getenv('SPOTIFY_RAW_DEDUPE', '1') != '0'
+
+# Valida os processados contra SCHEMA_PATH; linhas invalidas vao para DATA_DIR/rejects
+SCHEMA_VALIDATION = os.getenv('SPOTIFY_SCHEMA_VALIDATION', '1') != '0'
+
+# Processados: 'json' (um arquivo por artista) ou 'parquet' (row groups por genero/market/dia, parquet_sink.py)
+PROCESSED_FORMAT = os.getenv('SPOTIFY_PROCESSED_FORMAT', 'json')
+PARQUET_ROW_GROUP = int(os.getenv('SPOTIFY_PARQUET_ROW_GROUP', '10000'))
+
+# Retencao do DATA_DIR apos cada genero coletado (politicas em SPOTIFY_RETENTION_<CAMADA>, ver retention.py)
+RETENTION_ENABLED = os.getenv('SPOTIFY_RETENTION', '0') == '1'
+
+# Token: renovar N segundos antes de expirar; cache em disco opcional (vazio = desativado)
+TOKEN_REFRESH_MARGIN = int(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', '60'))
+TOKEN_CACHE_PATH = os.getenv('SPOTIFY_TOKEN_CACHE', '')
+
 os.makedirs(RAW_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
 
-def _current_date_partition() -> str:
-    """Return date partition string YYYY/MM/DD for current UTC date."""
-    now = datetime.now(timezone.utc)
+def _current_date_partition(when: Optional[datetime] = None) -> str:
+    """Return date partition string YYYY/MM/DD for `when` (default: current UTC date)."""
+    now = when or datetime.now(timezone.utc)
     return os.path.join(str(now.year), f"{now.month:02d}", f"{now.day:02d}")
 
 
-def _ensure_partition_dirs(base_dir: str, genero: str) -> str:
+def _ensure_partition_dirs(base_dir: str, genero: str, market: Optional[str] = None,
+                           when: Optional[datetime] = None) -> str:
     """Ensure and return partitioned path for given base_dir and genre.
 
-    Example: base_dir/genre/YYYY/MM/DD
+    Example: base_dir/genre/YYYY/MM/DD, or base_dir/genre/market=BR/YYYY/MM/DD when market is given
     """
-    part = _current_date_partition()
-    path = os.path.join(base_dir, genero, part)
+    part = _current_date_partition(when)
+    if market:
+        path = os.path.join(base_dir, genero, f'market={market}', part)
+    else:
+        path = os.path.join(base_dir, genero, part)
     os.makedirs(path, exist_ok=True)
     return path
 
@@ -143,22 +246,166 @@ def save_checkpoint(genero: str, checkpoint: dict) -> str:
     return path
 
 
+def _discovery_cache_path(genero: str) -> str:
+    cache_dir = os.path.join(DATA_DIR, 'discovery_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, f'discovery_{genero}.json')
+
+
+def load_discovery_cache(genero: str, strategy: str, limit: int) -> Optional[List[dict]]:
+    """Retorna artistas descobertos ha menos de DISCOVERY_TTL_HOURS para (genero, strategy, limit).
+
+    Uma entrada gravada com limit maior tambem serve (a ordem da busca e a mesma).
+    Retorna None quando nao ha entrada valida; lista vazia e um resultado cacheado.
+    """
+    if DISCOVERY_TTL_HOURS <= 0:
+        return None
+    path = _discovery_cache_path(genero)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return None
+    now = time.time()
+    for key, entry in entries.items():
+        e_strategy, e_limit = key.rsplit(':', 1)
+        if e_strategy != strategy or now - entry.get('discovered_at', 0) > DISCOVERY_TTL_HOURS * 3600:
+            continue
+        if int(e_limit) >= limit:
+            return entry.get('artists', [])[:limit]
+    return None
+
+
+def save_discovery_cache(genero: str, strategy: str, limit: int, artistas: List[dict]):
+    path = _discovery_cache_path(genero)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {}
+    entries[f'{strategy}:{limit}'] = {'discovered_at': time.time(), 'artists': artistas}
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _descobrir_com_cache(genero: str, strategy: str, limit: int, buscar) -> Optional[List[dict]]:
+    """Usa o cache de descoberta se valido; senao chama `buscar()` e grava o resultado.
+
+    `buscar()` retorna None quando a busca falhou: nada e gravado e a proxima execucao
+    busca de novo (uma lista vazia e um resultado valido e vai para o cache).
+    """
+    artistas = load_discovery_cache(genero, strategy, limit)
+    if artistas is not None:
+        _inc_metric('discovery_cache_hits', 1)
+        logger.info('Descoberta (%s) de %s servida do cache: %d artistas',
+                    strategy, genero, len(artistas))
+        return artistas
+    artistas = buscar()
+    if artistas is None:
+        logger.warning('Descoberta (%s) de %s falhou; resultado nao vai para o cache', strategy, genero)
+        return None
+    if DISCOVERY_TTL_HOURS > 0:
+        try:
+            save_discovery_cache(genero, strategy, limit, artistas)
+        except OSError as e:
+            logger.warning('Falha ao gravar cache de descoberta: %s', e)
+    return artistas
+
+
 _METRICS = {'api_calls': 0, 'artists_processed': 0, 'tracks_processed': 0}
+_METRICS_LOCK = threading.Lock()
 
 
 def _inc_metric(name: str, amount: int = 1):
-    if name in _METRICS:
-        _METRICS[name] += amount
-    else:
-        _METRICS[name] = amount
+    with _METRICS_LOCK:
+        if name in _METRICS:
+            _METRICS[name] += amount
+        else:
+            _METRICS[name] = amount
+
+
+# latencia por endpoint: amostras recentes (percentis no JSON) + contagens por status/tentativa
+_LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_LATENCY_SAMPLES_MAX = 10000
+_API_LATENCY: dict = {}
+
+
+def _status_class(status: Optional[int]) -> str:
+    """'2xx'..'5xx'; 429 fica separado e excecoes de rede viram 'error'."""
+    if status is None:
+        return 'error'
+    if status == 429:
+        return '429'
+    return f'{status // 100}xx'
+
+
+def _record_api_call(endpoint: str, status: Optional[int], attempt: int, elapsed: float, nbytes: int = 0):
+    """Registra uma tentativa HTTP (histograma Prometheus + resumo do metrics JSON)."""
+    status_class = _status_class(status)
+    attempt_label = str(attempt) if attempt < 3 else '3+'
+    with _METRICS_LOCK:
+        stats = _API_LATENCY.get(endpoint)
+        if stats is None:
+            stats = _API_LATENCY[endpoint] = {
+                'count': 0, 'sum': 0.0, 'samples': deque(maxlen=_LATENCY_SAMPLES_MAX),
+                'by_status': {}, 'by_attempt': {}, 'retry_seconds': 0.0, 'bytes': 0}
+        stats['count'] += 1
+        stats['sum'] += elapsed
+        stats['bytes'] += nbytes
+        _METRICS['api_bytes'] = _METRICS.get('api_bytes', 0) + nbytes
+        stats['samples'].append(elapsed)
+        stats['by_status'][status_class] = stats['by_status'].get(status_class, 0) + 1
+        stats['by_attempt'][attempt_label] = stats['by_attempt'].get(attempt_label, 0) + 1
+        if attempt > 1:
+            stats['retry_seconds'] += elapsed
+    if PROMETHEUS_AVAILABLE:
+        PROM_API_LATENCY.labels(endpoint, status_class, attempt_label).observe(elapsed)
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    """Percentil pelo metodo nearest-rank (lista ja ordenada e nao vazia)."""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def api_latency_summary() -> dict:
+    """p50/p95/p99 (ms), contagem por classe de status e por tentativa, por endpoint."""
+    summary = {}
+    with _METRICS_LOCK:
+        items = [(k, dict(v, samples=sorted(v['samples']))) for k, v in _API_LATENCY.items()]
+    for endpoint, stats in items:
+        samples = stats['samples']
+        total = stats['count']
+        summary[endpoint] = {
+            'count': total,
+            'mean_ms': round(stats['sum'] / total * 1000, 1) if total else 0.0,
+            'p50_ms': round(_percentile(samples, 50) * 1000, 1) if samples else 0.0,
+            'p95_ms': round(_percentile(samples, 95) * 1000, 1) if samples else 0.0,
+            'p99_ms': round(_percentile(samples, 99) * 1000, 1) if samples else 0.0,
+            'by_status': stats['by_status'],
+            'by_attempt': stats['by_attempt'],
+            'retry_seconds': round(stats['retry_seconds'], 3),
+            'rate_429': round(stats['by_status'].get('429', 0) / total, 4) if total else 0.0,
+            'bytes': stats['bytes'],
+            'bytes_per_request': round(stats['bytes'] / total) if total else 0,
+        }
+    return summary
 
 
 def _save_metrics():
     ts = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
     path = os.path.join(DATA_DIR, f'metrics_{ts}.json')
     try:
+        with _METRICS_LOCK:
+            payload = dict(_METRICS)
+        payload['api_requests'] = api_latency_summary()
+        creds = credential_pool_stats()
+        if creds:
+            payload['credentials'] = creds
         with open(path, 'w', encoding='utf-8') as f:
-            json.dump(_METRICS, f, ensure_ascii=False, indent=2)
+            json.dump(payload, f, ensure_ascii=False, indent=2)
         logger.info('Metrics saved: %s', path)
     except Exception as e:
         logger.warning('Falha ao salvar metrics: %s', e)
@@ -171,7 +418,7 @@ def _save_metrics():
 
 # Prometheus integration (optional)
 try:
-    from prometheus_client import Counter, Gauge, start_http_server
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
     PROMETHEUS_AVAILABLE = True
 except Exception:
     PROMETHEUS_AVAILABLE = False
@@ -186,6 +433,23 @@ if PROMETHEUS_AVAILABLE:
         'spotify_tracks_processed_total', 'Tracks processed')
     PROM_LAST_RUN = Gauge('spotify_last_run_timestamp',
                           'Last run timestamp (unix)')
+    PROM_HTTP_POOL_HITS = Counter(
+        'spotify_http_pool_hits_total', 'HTTP requests served by a reused pooled connection')
+    PROM_HTTP_POOL_MISSES = Counter(
+        'spotify_http_pool_misses_total', 'HTTP requests that opened a new connection')
+    PROM_THROTTLED_SECONDS = Counter(
+        'spotify_throttled_seconds_total', 'Seconds spent waiting on the rate limiter')
+    PROM_WRITER_QUEUE_DEPTH = Gauge(
+        'spotify_writer_queue_depth', 'Jobs waiting in the background persistence queue')
+    PROM_WRITER_SECONDS = Histogram(
+        'spotify_writer_job_seconds', 'Time spent persisting one (artist, market) result',
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+    PROM_STAGE_SECONDS = Histogram(
+        'spotify_stage_seconds', 'Time per processing stage (normalize, validate, write, db) per artist',
+        ['stage'], buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0))
+    PROM_API_LATENCY = Histogram(
+        'spotify_api_request_seconds', 'Spotify API request latency per attempt',
+        ['endpoint', 'status_class', 'attempt'], buckets=_LATENCY_BUCKETS)
 
 
 def start_metrics_server(port: int = 8000):
@@ -203,34 +467,589 @@ def _export_metrics_prometheus():
     PROM_API_CALLS.inc(_METRICS.get('api_calls', 0))
     PROM_ARTISTS_PROCESSED.inc(_METRICS.get('artists_processed', 0))
     PROM_TRACKS_PROCESSED.inc(_METRICS.get('tracks_processed', 0))
+    PROM_HTTP_POOL_HITS.inc(_METRICS.get('http_pool_hits', 0))
+    PROM_HTTP_POOL_MISSES.inc(_METRICS.get('http_pool_misses', 0))
+    PROM_THROTTLED_SECONDS.inc(_METRICS.get('rate_limit_wait_seconds', 0) +
+                               _METRICS.get('rate_limit_pause_seconds', 0))
     try:
         PROM_LAST_RUN.set(int(datetime.now(timezone.utc).timestamp()))
     except Exception:
         pass
 
 
-def autenticar_spotify(client_id: str, client_secret: str) -> str:
-    """Autentica na API do Spotify usando Client Credentials.
+# --- HTTP session with connection pooling ------------------------------------------
+class _CountingPoolMixin:
+    """Conta conexoes reaproveitadas (hit) e abertas do zero (miss) pelo pool."""
 
-    Retorna o token de acesso (string) ou levanta RuntimeError se falhar.
-    """
-    if not client_id or not client_secret:
-        raise RuntimeError(
-            'SPOTIFY_CLIENT_ID e SPOTIFY_CLIENT_SECRET devem estar definidas como variaveis de ambiente')
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn._spotify_new_conn = True
+        return conn
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        if getattr(conn, '_spotify_new_conn', False):
+            conn._spotify_new_conn = False
+            _inc_metric('http_pool_misses', 1)
+        else:
+            _inc_metric('http_pool_hits', 1)
+        return conn
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter cujo PoolManager usa pools instrumentados (hit/miss)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+_HTTP_SESSION: Optional[requests.Session] = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+
+def _build_http_session() -> requests.Session:
+    session = requests.Session()
+    # pool_connections: quantos hosts mantemos em cache; pool_maxsize: conexoes por host
+    adapter = _PooledHTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS,
+                                 pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=HTTP_POOL_BLOCK)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not HTTP_KEEP_ALIVE:
+        session.headers['Connection'] = 'close'
+    return session
 
-    url = 'https://accounts.spotify.com/api/token'
+
+def _get_http_session() -> requests.Session:
+    """Retorna a sessao HTTP compartilhada (criada sob demanda)."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        with _HTTP_SESSION_LOCK:
+            if _HTTP_SESSION is None:
+                _HTTP_SESSION = _build_http_session()
+                logger.info('Sessao HTTP criada (pool_connections=%d, pool_maxsize=%d, keep_alive=%s)',
+                            HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_KEEP_ALIVE)
+    return _HTTP_SESSION
+
+
+def close_http_session():
+    """Fecha a sessao compartilhada e suas conexoes abertas."""
+    global _HTTP_SESSION
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION is not None:
+            _HTTP_SESSION.close()
+            _HTTP_SESSION = None
+
+
+def http_pool_stats() -> dict:
+    """Retorna contadores de reuso do pool de conexoes."""
+    hits = _METRICS.get('http_pool_hits', 0)
+    misses = _METRICS.get('http_pool_misses', 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': (hits / total) if total else 0.0}
+
+
+# --- token manager -----------------------------------------------------------------
+def _solicitar_token(client_id: str, client_secret: str) -> dict:
+    """Faz o client-credentials exchange e retorna o payload (access_token, expires_in)."""
+    url = f'{AUTH_BASE_URL}/api/token'
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
     data = {'grant_type': 'client_credentials'}
     resp = _request_with_retry(
         method='post', url=url, headers=headers, data=data, auth=(client_id, client_secret))
     if resp and resp.status_code == 200:
-        token = resp.json().get('access_token')
-        logger.info('Autenticado com sucesso.')
-        return token
+        payload = resp.json()
+        if payload.get('access_token'):
+            logger.info('Autenticado com sucesso.')
+            return payload
+    body = getattr(resp, 'text', '<no response>')
+    logger.error('Falha na autenticacao: %s', body)
+    raise RuntimeError('Falha na autenticacao Spotify')
+
+
+class TokenManager:
+    """Mantem o access token em cache e renova antes de expirar.
+
+    Se `cache_path` for informado o token tambem e persistido em disco (com lock),
+    permitindo que execucoes seguidas do cron reaproveitem o mesmo token.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, cache_path: Optional[str] = None,
+                 refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        self.client_id = client_id
+        self._client_secret = client_secret
+        self.cache_path = cache_path or None
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._rejected: set = set()
+        self._lock = threading.Lock()
+
+    def _valid(self, token: Optional[str], expires_at: float) -> bool:
+        return bool(token) and token not in self._rejected and \
+            time.time() < expires_at - self.refresh_margin
+
+    def _cache_key(self) -> str:
+        return hashlib.sha256(self.client_id.encode('utf-8')).hexdigest()[:16]
+
+    def _read_cache(self) -> Optional[dict]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('client') != self._cache_key():
+            return None
+        return entry
+
+    def _write_cache(self):
+        tmp = self.cache_path + '.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'client': self._cache_key(), 'access_token': self._token,
+                       'expires_at': self._expires_at}, f)
+        os.replace(tmp, self.cache_path)
+
+    def _fetch(self):
+        payload = _solicitar_token(self.client_id, self._client_secret)
+        self._token = payload['access_token']
+        self._expires_at = time.time() + int(payload.get('expires_in') or 3600)
+        _inc_metric('token_requests', 1)
+
+    def _refresh_with_disk_cache(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        with open(self.cache_path + '.lock', 'a') as lock_f:
+            # lock exclusivo: so um processo faz o exchange, os demais leem o resultado
+            if fcntl is not None:
+                fcntl.flock(lock_f, fcntl.LOCK_EX)
+            try:
+                entry = self._read_cache()
+                if entry and self._valid(entry.get('access_token'), entry.get('expires_at', 0)):
+                    self._token = entry['access_token']
+                    self._expires_at = entry['expires_at']
+                    logger.info('Token reaproveitado do cache em disco.')
+                    return
+                self._fetch()
+                try:
+                    self._write_cache()
+                except OSError as e:
+                    logger.warning('Falha ao gravar cache de token: %s', e)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_f, fcntl.LOCK_UN)
+
+    def get_token(self) -> str:
+        with self._lock:
+            if self._valid(self._token, self._expires_at):
+                _inc_metric('token_cache_hits', 1)
+                return self._token
+            if self.cache_path:
+                self._refresh_with_disk_cache()
+            else:
+                self._fetch()
+            return self._token
+
+    def owns(self, token: str) -> bool:
+        return token == self._token or token in self._rejected
+
+    def invalidate(self, token: str):
+        """Descarta `token` (ex.: apos um 401) para que o proximo get_token renove."""
+        with self._lock:
+            self._rejected.add(token)
+            if token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+
+_TOKEN_MANAGERS: dict = {}
+_TOKEN_MANAGERS_LOCK = threading.Lock()
+
+
+def _get_token_manager(client_id: str, client_secret: str) -> TokenManager:
+    with _TOKEN_MANAGERS_LOCK:
+        tm = _TOKEN_MANAGERS.get((client_id, client_secret))
+        if tm is None:
+            tm = TokenManager(client_id, client_secret, cache_path=TOKEN_CACHE_PATH)
+            _TOKEN_MANAGERS[(client_id, client_secret)] = tm
+        return tm
+
+
+def _refresh_bearer(headers: Optional[dict]) -> Optional[dict]:
+    """Apos um 401, renova o token do header Authorization e retorna novos headers."""
+    auth = (headers or {}).get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return None
+    stale = auth[len('Bearer '):]
+    with _TOKEN_MANAGERS_LOCK:
+        managers = list(_TOKEN_MANAGERS.values())
+    for tm in managers:
+        if tm.owns(stale):
+            tm.invalidate(stale)
+            new_headers = dict(headers)
+            new_headers['Authorization'] = f'Bearer {tm.get_token()}'
+            return new_headers
+    return None
+
+
+# --- rate limiting -----------------------------------------------------------------
+class RateLimiter:
+    """Token bucket compartilhado por todas as threads que chamam a API.
+
+    `pause(seconds)` (usado ao receber 429) bloqueia todos os chamadores ate o fim da
+    janela de Retry-After. Tempo esperado vai para as metricas
+    `rate_limit_wait_seconds` (bucket) e `rate_limit_pause_seconds` (429).
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Bloqueia ate haver capacidade; retorna o tempo esperado em segundos."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                metric = 'rate_limit_pause_seconds'
+                if delay <= 0:
+                    if self.rate <= 0:
+                        return waited
+                    self._tokens = min(self.burst, self._tokens +
+                                       (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+                    metric = 'rate_limit_wait_seconds'
+            time.sleep(delay)
+            waited += delay
+            _inc_metric(metric, delay)
+
+    def expected_wait(self) -> float:
+        """Segundos ate o proximo acquire ser liberado (0 = imediato), sem consumir capacidade."""
+        with self._lock:
+            now = time.monotonic()
+            paused = max(0.0, self._paused_until - now)
+            if paused or self.rate <= 0:
+                return paused
+            tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Suspende todos os chamadores por `seconds` (ex.: Retry-After de um 429)."""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                # recomeca com o bucket vazio para nao disparar uma rajada ao fim da pausa
+                self._tokens = 0.0
+                self._last = until
+        _inc_metric('rate_limit_pauses', 1)
+
+
+_RATE_LIMITER = RateLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+
+
+# --- credential pool ---------------------------------------------------------------
+class _Credential:
+    """Um par client id/secret do pool: token, bucket proprio e contadores de uso."""
+
+    def __init__(self, client_id: str, client_secret: str):
+        self.client_id = client_id
+        self.label = client_id[:8]
+        self.tokens = _get_token_manager(client_id, client_secret)
+        self.limiter = RateLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+        self.quarantined_until = 0.0
+        self.consecutive_429 = 0
+        self.stats = {'requests': 0, 'rate_limited': 0, 'throttled_seconds': 0.0, 'quarantines': 0}
+
+
+class CredentialPool:
+    """Distribui as requisicoes autenticadas entre varias credenciais (apps) do Spotify.
+
+    Cada requisicao vai para a credencial menos estrangulada (menor espera no proprio bucket,
+    depois a menos usada). `CREDENTIAL_QUARANTINE_429` respostas 429 seguidas tiram a
+    credencial de circulacao por `CREDENTIAL_QUARANTINE_SECONDS`; se todas estiverem em
+    quarentena, usa a que sai primeiro.
+    """
+
+    def __init__(self, pairs: List[tuple]):
+        self.members: List[_Credential] = []
+        for cid, secret in pairs:
+            if cid and secret and all(m.client_id != cid for m in self.members):
+                self.members.append(_Credential(cid, secret))
+        self._lock = threading.Lock()
+
+    def owns(self, token: str) -> bool:
+        return any(m.tokens.owns(token) for m in self.members)
+
+    def acquire(self) -> _Credential:
+        now = time.monotonic()
+        with self._lock:
+            livres = [m for m in self.members if m.quarantined_until <= now]
+            if livres:
+                escolhida = min(livres, key=lambda m: (m.limiter.expected_wait(), m.stats['requests']))
+            else:
+                escolhida = min(self.members, key=lambda m: m.quarantined_until)
+            escolhida.stats['requests'] += 1
+            return escolhida
+
+    def record_wait(self, cred: _Credential, seconds: float):
+        with self._lock:
+            cred.stats['throttled_seconds'] += seconds
+
+    def record_success(self, cred: _Credential):
+        with self._lock:
+            cred.consecutive_429 = 0
+
+    def record_429(self, cred: _Credential):
+        with self._lock:
+            cred.stats['rate_limited'] += 1
+            cred.consecutive_429 += 1
+            if cred.consecutive_429 < CREDENTIAL_QUARANTINE_429:
+                return
+        self.quarantine(cred, f'{CREDENTIAL_QUARANTINE_429} respostas 429 seguidas')
+
+    def quarantine(self, cred: _Credential, motivo: str):
+        with self._lock:
+            cred.consecutive_429 = 0
+            cred.quarantined_until = time.monotonic() + CREDENTIAL_QUARANTINE_SECONDS
+            cred.stats['quarantines'] += 1
+        _inc_metric('credential_quarantines', 1)
+        logger.warning('Credencial %s em quarentena por %.0fs: %s',
+                       cred.label, CREDENTIAL_QUARANTINE_SECONDS, motivo)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {m.label: dict(m.stats, throttled_seconds=round(m.stats['throttled_seconds'], 3),
+                                  quarantined=m.quarantined_until > now)
+                    for m in self.members}
+
+
+_CREDENTIAL_POOL: Optional[CredentialPool] = None
+_CREDENTIAL_POOL_LOCK = threading.Lock()
+
+
+def _get_credential_pool() -> Optional[CredentialPool]:
+    """Pool com CLIENT_ID + SPOTIFY_CREDENTIALS; None quando ha uma credencial so."""
+    global _CREDENTIAL_POOL
+    if not CREDENTIALS:
+        return None
+    with _CREDENTIAL_POOL_LOCK:
+        if _CREDENTIAL_POOL is None:
+            pairs = [(CLIENT_ID, CLIENT_SECRET)] + list(CREDENTIALS)
+            _CREDENTIAL_POOL = CredentialPool(pairs)
+        return _CREDENTIAL_POOL if len(_CREDENTIAL_POOL.members) > 1 else None
+
+
+def credential_pool_stats() -> dict:
+    """Uso por credencial (requisicoes, 429, tempo estrangulado, quarentenas)."""
+    pool = _get_credential_pool()
+    return pool.stats() if pool else {}
+
+
+# --- circuit breakers and backoff ---------------------------------------------------
+def _endpoint_name(url: str) -> str:
+    """Nome normalizado do endpoint (sem IDs), usado em breakers e metricas."""
+    path = url.split('://', 1)[-1].split('?', 1)[0]
+    path = path.split('/', 1)[1] if '/' in path else ''
+    if path.endswith('api/token'):
+        return 'token'
+    if path.startswith('v1/search'):
+        return 'search'
+    if path.startswith('v1/artists/') and path.endswith('/top-tracks'):
+        return 'top-tracks'
+    if path.startswith('v1/playlists/') and path.endswith('/tracks'):
+        return 'playlist-tracks'
+    if path.rstrip('/') == 'v1/artists':
+        return 'artists'
+    if path.startswith('v1/recommendations/available-genre-seeds'):
+        return 'genre-seeds'
+    return 'other'
+
+
+class CircuitBreaker:
+    """Breaker closed -> open -> half-open por endpoint.
+
+    Abre apos `failure_threshold` falhas seguidas (5xx / erro de conexao); aberto,
+    rejeita chamadas ate `reset_timeout` e entao libera uma unica chamada de prova
+    (half-open). Sucesso na prova fecha o breaker, falha reabre.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES,
+                 reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half_open'
+                self._probing = False
+                logger.info('Circuit breaker %s half-open; enviando prova', self.name)
+            # half-open: apenas uma chamada de prova por vez (uma prova perdida expira)
+            if self._probing and time.monotonic() - self._probe_started < self.reset_timeout:
+                return False
+            self._probing = True
+            self._probe_started = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info('Circuit breaker %s fechado', self.name)
+            self.state = 'closed'
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == 'half_open' or \
+                    (self.state == 'closed' and self._failures >= self.failure_threshold):
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                logger.warning('Circuit breaker %s aberto por %.0fs apos %d falhas',
+                               self.name, self.reset_timeout, self._failures)
+                _inc_metric('circuit_breaker_opened', 1)
+
+
+class CircuitOpenError(RuntimeError):
+    """Chamada rejeitada sem ir a rede porque o breaker do endpoint esta aberto."""
+
+
+_CIRCUIT_BREAKERS: dict = {}
+
+
+def _get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    with _HTTP_SESSION_LOCK:
+        breaker = _CIRCUIT_BREAKERS.get(endpoint)
+        if breaker is None:
+            breaker = _CIRCUIT_BREAKERS[endpoint] = CircuitBreaker(endpoint)
+        return breaker
+
+
+def _decorrelated_jitter(base: float, previous: float, cap: Optional[float] = None) -> float:
+    """Backoff "decorrelated jitter": uniforme entre base e 3x o sleep anterior, com teto."""
+    cap = BACKOFF_CAP_SECONDS if cap is None else cap
+    return min(cap, random.uniform(base, max(base, previous * 3)))
+
+
+def _parse_retry_after(value) -> Optional[float]:
+    """Converte Retry-After em segundos; aceita inteiro/decimal ou HTTP-date."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
     else:
-        body = getattr(resp, 'text', '<no response>')
-        logger.error('Falha na autenticacao: %s', body)
-        raise RuntimeError('Falha na autenticacao Spotify')
+        # 'inf'/'nan' passam no float(); sem isso o limiter pausaria para sempre
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# --- HTTP response cache -----------------------------------------------------------
+_RESPONSE_CACHES: dict = {}
+
+
+def _get_response_cache() -> Optional[ResponseCache]:
+    """Cache em DATA_DIR/http_cache (um por DATA_DIR, que pode mudar nos testes)."""
+    if not HTTP_CACHE_ENABLED:
+        return None
+    cache_dir = os.path.join(DATA_DIR, 'http_cache')
+    with _HTTP_SESSION_LOCK:
+        cache = _RESPONSE_CACHES.get(cache_dir)
+        if cache is None:
+            cache = ResponseCache(cache_dir, HTTP_CACHE_MAX_MB * 1024 * 1024)
+            _RESPONSE_CACHES[cache_dir] = cache
+        return cache
+
+
+def _response_from_cache(cache: ResponseCache, meta: dict, url: str) -> Optional[requests.Response]:
+    """Monta um Response 200 a partir do body em cache; json() reaproveita o parse anterior."""
+    key = meta['key']
+    body = cache.read_body(key)
+    if body is None:
+        return None
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = body
+    resp.headers = CaseInsensitiveDict(meta.get('headers') or {})
+    resp.url = url
+    resp.encoding = 'utf-8'
+
+    def _json(**kwargs):
+        data = cache.get_parsed(key)
+        if data is None:
+            data = json.loads(body)
+            cache.put_parsed(key, data)
+        return data
+    resp.json = _json
+    return resp
+
+
+def _store_in_cache(cache: ResponseCache, method: str, url: str, resp):
+    etag = resp.headers.get('ETag')
+    last_modified = resp.headers.get('Last-Modified')
+    etag = etag if isinstance(etag, str) else None
+    last_modified = last_modified if isinstance(last_modified, str) else None
+    if not (etag or last_modified) or not isinstance(resp.content, bytes):
+        return
+    keep = {k: v for k, v in resp.headers.items() if k.lower() in ('content-type', 'etag', 'last-modified')}
+    try:
+        cache.store(method, url, keep, resp.content, etag, last_modified)
+    except OSError as e:
+        logger.warning('Falha ao gravar cache HTTP: %s', e)
+
+
+def autenticar_spotify(client_id: str, client_secret: str) -> str:
+    """Autentica na API do Spotify usando Client Credentials.
+
+    O token fica em cache (TokenManager) ate perto de expirar, entao chamadas repetidas
+    nao refazem o exchange. Retorna o token de acesso (string) ou levanta RuntimeError se falhar.
+    """
+    if not client_id or not client_secret:
+        raise RuntimeError(
+            'SPOTIFY_CLIENT_ID e SPOTIFY_CLIENT_SECRET devem estar definidas como variaveis de ambiente')
+    return _get_token_manager(client_id, client_secret).get_token()
 
 
 def get_available_genres(token: str) -> List[str]:
@@ -238,7 +1057,7 @@ def get_available_genres(token: str) -> List[str]:
 
     Se falhar, retorna lista vazia.
     """
-    url = 'https://api.spotify.com/v1/recommendations/available-genre-seeds'
+    url = f'{API_BASE_URL}/v1/recommendations/available-genre-seeds'
     headers = {'Authorization': f'Bearer {token}'}
     try:
         resp = _request_with_retry(method='get', url=url, headers=headers)
@@ -249,28 +1068,72 @@ def get_available_genres(token: str) -> List[str]:
     return []
 
 
-def buscar_artistas_por_genero(genero: str, token: str, limit: int = 10, page_size: int = 50) -> List[dict]:
+def _buscar_pagina_artistas(genero: str, headers: dict, offset: int, size: int) -> Optional[List[dict]]:
+    """Uma pagina da busca por genero; None se a requisicao falhar."""
+    url = f'{API_BASE_URL}/v1/search?q=genre:%22{genero}%22&type=artist&limit={size}&offset={offset}'
+    try:
+        resp = _request_with_retry(method='get', url=url, headers=headers)
+    except CircuitOpenError:
+        return None
+    if not resp:
+        logger.warning(
+            'Falha na requisicao para buscar artistas, interrompendo paginação')
+        return None
+    if resp.status_code != 200:
+        logger.warning('Erro ao buscar artistas: %s',
+                       getattr(resp, 'text', '<no response>'))
+        return None
+    return resp.json().get('artists', {}).get('items', [])
+
+
+def _planejar_janelas(limit: int, page_size: int) -> List[tuple]:
+    """Janelas (offset, limit) da busca respeitando o page size e o offset maximo da API."""
+    page_size = max(1, min(page_size, SEARCH_PAGE_MAX))
+    janelas = []
+    offset = 0
+    while offset < limit and offset < SEARCH_MAX_OFFSET:
+        size = min(page_size, limit - offset, SEARCH_MAX_OFFSET - offset)
+        janelas.append((offset, size))
+        offset += size
+    return janelas
+
+
+def _dedupe_por_id(artistas: List[dict]) -> List[dict]:
+    vistos = set()
+    unicos = []
+    for a in artistas:
+        aid = a.get('id')
+        if aid in vistos:
+            continue
+        vistos.add(aid)
+        unicos.append(a)
+    return unicos
+
+
+def buscar_artistas_por_genero(genero: str, token: str, limit: int = 10, page_size: int = 50,
+                               workers: int = 1) -> Optional[List[dict]]:
     """Search artists by genre with pagination to collect up to `limit` artists.
 
     Spotify search supports `limit` and `offset`. We request up to `page_size` per call and loop
-    until we have `limit` artists or no more results.
+    until we have `limit` artists or no more results. With `workers > 1` the offset windows are
+    planned up front and fetched concurrently; once a short (or failed) page shows the result set
+    is exhausted, windows after it that have not started are cancelled.
+
+    Returns None if a page request fails, so a partial list is never mistaken for the full result.
     """
     headers = {'Authorization': f'Bearer {token}'}
+    janelas = _planejar_janelas(limit, page_size)
+    if workers > 1 and len(janelas) > 1:
+        artistas = _buscar_janelas_em_paralelo(genero, headers, janelas, workers)
+        return artistas[:limit] if artistas is not None else None
+
     collected = []
     offset = 0
-    while len(collected) < limit:
-        to_request = min(page_size, limit - len(collected))
-        url = f'https://api.spotify.com/v1/search?q=genre:%22{genero}%22&type=artist&limit={to_request}&offset={offset}'
-        resp = _request_with_retry(method='get', url=url, headers=headers)
-        if not resp:
-            logger.warning(
-                'Falha na requisicao para buscar artistas, interrompendo paginação')
-            break
-        if resp.status_code != 200:
-            logger.warning('Erro ao buscar artistas: %s',
-                           getattr(resp, 'text', '<no response>'))
-            break
-        items = resp.json().get('artists', {}).get('items', [])
+    while len(collected) < limit and offset < SEARCH_MAX_OFFSET:
+        to_request = min(page_size, SEARCH_PAGE_MAX, limit - len(collected), SEARCH_MAX_OFFSET - offset)
+        items = _buscar_pagina_artistas(genero, headers, offset, to_request)
+        if items is None:
+            return None
         if not items:
             break
         collected.extend(items)
@@ -279,108 +1142,338 @@ def buscar_artistas_por_genero(genero: str, token: str, limit: int = 10, page_si
         # if returned less than requested, no more pages
         if len(items) < to_request:
             break
-    return collected[:limit]
-
-
-def buscar_artistas_por_playlist(keyword: str, token: str, artist_limit: int = 10) -> List[dict]:
-    """Busca artistas extraindo-os de playlists populares que correspondem a uma palavra-chave."""
+    return _dedupe_por_id(collected)[:limit]
+
+
+def _buscar_janelas_em_paralelo(genero: str, headers: dict, janelas: List[tuple],
+                                workers: int) -> Optional[List[dict]]:
+    paginas = {}
+    falhas = set()
+    fim = None  # offset da primeira pagina curta/falha: nada depois dela e valido
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search') as pool:
+        futures = {pool.submit(_buscar_pagina_artistas, genero, headers, o, n): (o, n) for o, n in janelas}
+        for fut in as_completed(futures):
+            if fut.cancelled():
+                continue
+            offset, size = futures[fut]
+            items = fut.result()
+            paginas[offset] = items or []
+            if items is None:
+                falhas.add(offset)
+            if items is None or len(items) < size:
+                if fim is None or offset < fim:
+                    fim = offset
+                    cancelados = sum(f.cancel() for f, (o, _) in futures.items() if o > offset)
+                    if cancelados:
+                        _inc_metric('search_pages_skipped', cancelados)
+    if fim in falhas:
+        # falha antes do fim real da busca: o resultado estaria truncado
+        return None
+    collected = []
+    for offset, _ in janelas:
+        if fim is not None and offset > fim:
+            break
+        collected.extend(paginas.get(offset, []))
+    return _dedupe_por_id(collected)
+
+
+def _com_fields(url: str, endpoint: str) -> str:
+    """Acrescenta `fields=` (projecao de campos) para endpoints que aceitam o parametro."""
+    fields = API_FIELDS.get(endpoint)
+    if not fields or 'fields=' in url:
+        return url
+    sep = '&' if '?' in url else '?'
+    return f'{url}{sep}fields={quote(fields, safe="")}'
+
+
+def _artistas_da_playlist(playlist_id: str, headers: dict, max_pages: int) -> Optional[List[dict]]:
+    """Percorre as paginas de `/playlists/{id}/tracks` seguindo `next` e retorna os artistas
+    (com repeticao: um item por track em que o artista aparece); None se uma pagina falhar."""
+    url = f'{API_BASE_URL}/v1/playlists/{playlist_id}/tracks?limit=100'
+    artistas = []
+    pages = 0
+    while url and pages < max_pages:
+        # o `next` devolvido pela API nem sempre preserva o `fields`
+        url = _com_fields(url, 'playlist-tracks')
+        try:
+            resp = _request_with_retry(method='get', url=url, headers=headers)
+        except CircuitOpenError:
+            resp = None
+        if not resp or resp.status_code != 200:
+            logger.warning('Não foi possível obter tracks da playlist ID: %s', playlist_id)
+            return None
+        pages += 1
+        body = resp.json()
+        for item in body.get('items', []):
+            if not item or not item.get('track') or not item['track'].get('artists'):
+                continue
+            for artist_obj in item['track']['artists']:
+                if artist_obj and artist_obj.get('id'):
+                    artistas.append(artist_obj)
+        url = body.get('next')
+    return artistas
+
+
+def buscar_artistas_por_playlist(keyword: str, token: str, artist_limit: int = 10,
+                                 max_playlists: int = PLAYLIST_MAX, max_pages: int = PLAYLIST_MAX_PAGES,
+                                 ordenar_por_frequencia: bool = True) -> Optional[List[dict]]:
+    """Busca artistas extraindo-os de playlists populares que correspondem a uma palavra-chave.
+
+    Agrega as `max_playlists` primeiras playlists da busca, lendo todas as paginas de cada
+    uma (ate `max_pages`) em paralelo. Com `ordenar_por_frequencia` os artistas que aparecem
+    em mais tracks/playlists vem primeiro; senao, ordem de primeira aparicao.
+    Retorna None se a busca de playlists ou a leitura de alguma delas falhar.
+    """
     headers = {'Authorization': f'Bearer {token}'}
     # 1. Buscar playlists com a palavra-chave
     logger.info('Buscando playlists com a palavra-chave: %s', keyword)
-    search_url = f'https://api.spotify.com/v1/search?q={keyword.replace(" ", "+")}&type=playlist&limit=5'
-    resp = _request_with_retry(method='get', url=search_url, headers=headers)
+    search_url = f'{API_BASE_URL}/v1/search?q={keyword.replace(" ", "+")}&type=playlist&limit=5'
+    try:
+        resp = _request_with_retry(method='get', url=search_url, headers=headers)
+    except CircuitOpenError:
+        resp = None
     if not resp or resp.status_code != 200:
         logger.warning('Não foi possível buscar playlists para a palavra-chave: %s', keyword)
-        return []
+        return None
 
-    playlists = resp.json().get('playlists', {}).get('items', [])
+    # a busca pode trazer itens nulos (playlists removidas)
+    playlists = [p for p in resp.json().get('playlists', {}).get('items', []) if p and p.get('id')]
     if not playlists:
         logger.warning('Nenhuma playlist encontrada para: %s', keyword)
         return []
 
-    # 2. Usar a primeira playlist (geralmente a mais relevante) para extrair tracks
-    playlist_id = playlists[0]['id']
-    logger.info('Extraindo artistas da playlist ID: %s (%s)', playlist_id, playlists[0]['name'])
-    tracks_url = f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks'
-    resp = _request_with_retry(method='get', url=tracks_url, headers=headers)
-    if not resp or resp.status_code != 200:
-        logger.warning('Não foi possível obter tracks da playlist ID: %s', playlist_id)
-        return []
+    # 2. Extrair tracks das playlists mais relevantes, uma thread por playlist
+    playlists = playlists[:max(1, max_playlists)]
+    for pl in playlists:
+        logger.info('Extraindo artistas da playlist ID: %s (%s)', pl['id'], pl.get('name'))
+    with ThreadPoolExecutor(max_workers=len(playlists), thread_name_prefix='playlist') as pool:
+        por_playlist = list(pool.map(
+            lambda pl: _artistas_da_playlist(pl['id'], headers, max_pages), playlists))
+    if any(artistas is None for artistas in por_playlist):
+        return None
 
-    # 3. Compilar uma lista de artistas únicos a partir das tracks
-    tracks = resp.json().get('items', [])
+    # 3. Compilar artistas únicos, contando em quantas tracks cada um aparece
     artistas_encontrados = {}
-    for item in tracks:
-        if not item.get('track') or not item['track'].get('artists'):
-            continue
-        for artist_obj in item['track']['artists']:
-            if artist_obj and artist_obj.get('id'):
-                artistas_encontrados[artist_obj['id']] = artist_obj
+    frequencia = {}
+    for artistas in por_playlist:
+        for artist_obj in artistas:
+            artistas_encontrados.setdefault(artist_obj['id'], artist_obj)
+            frequencia[artist_obj['id']] = frequencia.get(artist_obj['id'], 0) + 1
 
     # Retornar a lista de artistas únicos, respeitando o limite
     lista_final = list(artistas_encontrados.values())
-    logger.info('Encontrados %d artistas únicos da playlist. Retornando até %d.', len(lista_final), artist_limit)
+    if ordenar_por_frequencia:
+        # sort estavel: empates mantem a ordem de primeira aparicao
+        lista_final.sort(key=lambda a: frequencia[a['id']], reverse=True)
+    logger.info('Encontrados %d artistas únicos em %d playlists. Retornando até %d.',
+                len(lista_final), len(playlists), artist_limit)
     return lista_final[:artist_limit]
 
 
+def hidratar_artistas(artistas: List[dict], token: str, batch_size: int = 50) -> List[dict]:
+    """Troca objetos de artista simplificados (sem popularity/followers/genres) pelos completos.
+
+    Usa o endpoint multi-ID `/v1/artists?ids=` com ate 50 IDs por requisicao. Artistas
+    que ja vem completos (ex.: da busca por genero) ou que falharem ficam como estao.
+    """
+    faltando = [str(a['id']) for a in artistas if a.get('id') and 'popularity' not in a]
+    if not faltando:
+        return artistas
+    headers = {'Authorization': f'Bearer {token}'}
+    completos = {}
+    batch_size = max(1, min(batch_size, 50))
+    for i in range(0, len(faltando), batch_size):
+        ids = faltando[i:i + batch_size]
+        url = f'{API_BASE_URL}/v1/artists?ids={",".join(ids)}'
+        try:
+            resp = _request_with_retry(method='get', url=url, headers=headers)
+        except CircuitOpenError as e:
+            # breaker aberto: os lotes seguintes tambem seriam rejeitados
+            logger.warning('Hidratacao interrompida: %s', e)
+            break
+        if not resp or resp.status_code != 200:
+            logger.warning('Falha ao hidratar artistas (%d ids): %s',
+                           len(ids), getattr(resp, 'text', '<no response>'))
+            continue
+        for full in resp.json().get('artists', []):
+            if full and full.get('id'):
+                completos[full['id']] = full
+    _inc_metric('artists_hydrated', len(completos))
+    logger.info('Hidratados %d/%d artistas em %d requisicoes',
+                len(completos), len(faltando), -(-len(faltando) // batch_size))
+    return [completos.get(str(a.get('id')), a) for a in artistas]
+
 
 def buscar_top_tracks(artist_id: str, token: str, market: str = 'BR') -> List[dict]:
-    url = f'https://api.spotify.com/v1/artists/{artist_id}/top-tracks?market={market}'
+    """Top tracks do artista no market.
+
+    Levanta RuntimeError se a requisicao falhar (sem resposta, 4xx/5xx ou retries esgotados),
+    para nao confundir a falha com um artista que realmente nao tem tracks (lista vazia).
+    """
+    url = f'{API_BASE_URL}/v1/artists/{artist_id}/top-tracks?market={market}'
     headers = {'Authorization': f'Bearer {token}'}
     resp = _request_with_retry(method='get', url=url, headers=headers)
     if resp and resp.status_code == 200:
         return resp.json().get('tracks', [])
+    status = getattr(resp, 'status_code', None)
     body = getattr(resp, 'text', '<no response>')
     logger.warning('Erro ao buscar top tracks para %s: %s', artist_id, body)
-    return []
+    raise RuntimeError(f'Falha ao buscar top tracks de {artist_id} ({market}): status {status}')
 
 
-def _request_with_retry(method: str, url: str, headers: Optional[dict] = None, data: Optional[dict] = None, auth: Optional[tuple] = None, max_retries: int = 3, backoff_factor: float = 0.5, timeout: int = 10):
-    """Simple retry wrapper for requests to handle 429/5xx with exponential backoff.
+_ULTIMA_RESPOSTA = threading.local()
+
+
+def _ultima_resposta() -> dict:
+    """URL e status da ultima resposta recebida por esta thread (envelope do arquivo raw)."""
+    return {'url': getattr(_ULTIMA_RESPOSTA, 'url', None), 'status': getattr(_ULTIMA_RESPOSTA, 'status', None)}
 
-    Returns the Response object on success or the last Response/None on failure.
+
+def _request_with_retry(method: str, url: str, headers: Optional[dict] = None, data: Optional[dict] = None, auth: Optional[tuple] = None, max_retries: int = 3, backoff_factor: float = 0.5, timeout: int = 10):
+    """Simple retry wrapper for requests to handle 429/5xx with jittered backoff.
+
+    - All calls go through the shared pooled session (`_get_http_session`), so TCP/TLS
+      connections are reused across requests.
+    - GETs are revalidated against the on-disk ResponseCache (If-None-Match /
+      If-Modified-Since) and a 304 is served from disk.
+    - A 401 on a Bearer request managed by a TokenManager triggers a single token
+      refresh and replay.
+    - Every attempt first takes a slot from the process-wide RateLimiter; a 429 pauses
+      the limiter (all threads) for the Retry-After window (seconds or HTTP-date).
+    - With a CredentialPool (SPOTIFY_CREDENTIALS), Bearer requests are re-signed on each
+      attempt with the least-throttled credential and use that credential's own limiter,
+      so a 429 only pauses (and eventually quarantines) the credential that received it.
+    - Each endpoint has a CircuitBreaker: while it is open calls fail fast with
+      CircuitOpenError, and 5xx/connection errors use decorrelated-jitter backoff
+      instead of lockstep sleeps.
+
+    Returns the Response object on success or the last Response/None on failure; raises
+    CircuitOpenError if the breaker rejects an attempt.
     """
     attempt = 0
+    auth_refreshed = False
+    resp = None
+    sleep = backoff_factor
+    endpoint = _endpoint_name(url)
+    breaker = _get_circuit_breaker(endpoint)
+    cache = _get_response_cache() if method.lower() == 'get' else None
+    cached = cache.lookup(method, url) if cache else None
+    if cached:
+        headers = dict(headers or {}, **cache.conditional_headers(cached))
+    pool = _get_credential_pool()
+    auth_header = (headers or {}).get('Authorization', '')
+    if pool and not (auth_header.startswith('Bearer ') and pool.owns(auth_header[len('Bearer '):])):
+        pool = None
+    cred = None
+    # repeticao interna (troca de credencial, 304 sem body, 401 renovado): a chamada ja foi
+    # liberada pelo breaker e pode estar com a prova half-open; nao pede de novo
+    reenvio = False
     while attempt < max_retries:
+        if reenvio:
+            reenvio = False
+        elif not breaker.allow():
+            _inc_metric('circuit_open_rejections', 1)
+            logger.warning('Circuit breaker aberto para %s; falhando rapido em %s %s',
+                           breaker.name, method.upper(), url)
+            raise CircuitOpenError(f'Circuit breaker aberto para {breaker.name}')
         try:
             attempt += 1
-            resp = requests.request(
-                method=method, url=url, headers=headers, data=data, auth=auth, timeout=timeout)
+            limiter = _RATE_LIMITER
+            if pool:
+                cred = pool.acquire()
+                try:
+                    headers = dict(headers, Authorization=f'Bearer {cred.tokens.get_token()}')
+                except RuntimeError as e:
+                    # exchange falhou para esta credencial: tira do pool e tenta outra
+                    pool.quarantine(cred, str(e))
+                    reenvio = True
+                    continue
+                limiter = cred.limiter
+            waited = limiter.acquire()
+            if cred:
+                pool.record_wait(cred, waited)
+            started = time.perf_counter()
+            try:
+                resp = _get_http_session().request(
+                    method=method, url=url, headers=headers, data=data, auth=auth, timeout=timeout)
+            except requests.RequestException:
+                _record_api_call(endpoint, None, attempt, time.perf_counter() - started)
+                raise
+            body = resp.content
+            _record_api_call(endpoint, resp.status_code, attempt, time.perf_counter() - started,
+                             len(body) if isinstance(body, bytes) else 0)
+            _ULTIMA_RESPOSTA.url, _ULTIMA_RESPOSTA.status = url, resp.status_code
+            if cred and resp.status_code != 429:
+                pool.record_success(cred)
+            # Nao modificado -> serve do cache em disco
+            if resp.status_code == 304 and cached:
+                hit = _response_from_cache(cache, cached, url)
+                if hit is not None:
+                    _ULTIMA_RESPOSTA.status = hit.status_code
+                    breaker.record_success()
+                    _inc_metric('api_calls', 1)
+                    _inc_metric('http_cache_hits', 1)
+                    return hit
+                # body saiu do cache (eviction concorrente): repete sem validadores
+                headers = {k: v for k, v in headers.items()
+                           if k not in ('If-None-Match', 'If-Modified-Since')}
+                cached = None
+                attempt -= 1
+                reenvio = True
+                continue
             # Successful
             if resp.status_code < 400:
+                breaker.record_success()
                 _inc_metric('api_calls', 1)
+                if cache and resp.status_code == 200:
+                    _store_in_cache(cache, method, url, resp)
                 return resp
             # Rate limited
             if resp.status_code == 429:
-                retry_after = resp.headers.get('Retry-After')
-                wait = int(retry_after) if retry_after and retry_after.isdigit(
-                ) else backoff_factor * (2 ** (attempt - 1))
-                logger.warning(
-                    'Rate limited (429). Waiting %s seconds before retry (attempt %d/%d)', wait, attempt, max_retries)
-                time.sleep(wait)
+                breaker.record_success()
+                wait = _parse_retry_after(resp.headers.get('Retry-After'))
+                if wait is None:
+                    wait = sleep = _decorrelated_jitter(backoff_factor, sleep)
+                if cred:
+                    logger.warning('Rate limited (429) na credencial %s. Pausing it for %s seconds (attempt %d/%d)',
+                                   cred.label, wait, attempt, max_retries)
+                    pool.record_429(cred)
+                else:
+                    logger.warning(
+                        'Rate limited (429). Pausing all callers for %s seconds (attempt %d/%d)', wait, attempt, max_retries)
+                limiter.pause(wait)
                 continue
             # Server error -> retry
             if 500 <= resp.status_code < 600:
-                wait = backoff_factor * (2 ** (attempt - 1))
-                logger.warning('Server error %d on %s. Waiting %s seconds before retry (attempt %d/%d)',
+                breaker.record_failure()
+                wait = sleep = _decorrelated_jitter(backoff_factor, sleep)
+                logger.warning('Server error %d on %s. Waiting %.2f seconds before retry (attempt %d/%d)',
                                resp.status_code, url, wait, attempt, max_retries)
                 time.sleep(wait)
                 continue
+            # 4xx: a API respondeu, o endpoint esta saudavel
+            breaker.record_success()
+            # Token expirado/revogado -> renova uma unica vez e repete
+            if resp.status_code == 401 and not auth_refreshed:
+                new_headers = _refresh_bearer(headers)
+                if new_headers:
+                    logger.warning('401 em %s; token renovado, repetindo requisicao', url)
+                    headers = new_headers
+                    auth_refreshed = True
+                    reenvio = True
+                    continue
             # Client error that won't be retried
             return resp
         except requests.RequestException as e:
-            wait = backoff_factor * (2 ** (attempt - 1))
+            breaker.record_failure()
+            wait = sleep = _decorrelated_jitter(backoff_factor, sleep)
             logger.warning(
-                'Request exception: %s. Waiting %s seconds before retry (attempt %d/%d)', e, wait, attempt, max_retries)
+                'Request exception: %s. Waiting %.2f seconds before retry (attempt %d/%d)', e, wait, attempt, max_retries)
             time.sleep(wait)
-            last_exc = e
             continue
     # exhausted retries
     logger.error('Exhausted retries for %s %s', method.upper(), url)
-    try:
-        return resp
-    except NameError:
-        return None
+    return resp
 
 
 def salvar_json_raw(prefix: str, obj: object) -> str:
@@ -391,29 +1484,254 @@ def salvar_json_raw(prefix: str, obj: object) -> str:
     # if prefix contains genre-like suffix e.g. artist_{id}, save under misc partition
     part_dir = _ensure_partition_dirs(RAW_DIR, 'misc')
     path = os.path.join(part_dir, filename)
+    # mesma chave duas vezes no mesmo segundo: nao sobrescreve (o indice de dedupe aponta para ela)
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(part_dir, f"{prefix}_{ts}_{n}.json")
+        n += 1
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(obj, f, ensure_ascii=False, indent=2)
     logger.info('Salvo raw: %s', path)
     return path
 
 
-def validar_com_schema(obj: object, schema_path: str = SCHEMA_PATH) -> bool:
+_RAW_ARCHIVE: Optional[RawArchive] = None
+_RAW_DEDUPE: Optional[DedupeIndex] = None
+_RAW_ARCHIVE_LOCK = threading.Lock()
+
+
+def _get_raw_archive() -> RawArchive:
+    global _RAW_ARCHIVE
+    with _RAW_ARCHIVE_LOCK:
+        if _RAW_ARCHIVE is None or _RAW_ARCHIVE.base_dir != RAW_DIR:
+            if _RAW_ARCHIVE is not None:
+                _RAW_ARCHIVE.close()
+            _RAW_ARCHIVE = RawArchive(RAW_DIR, RAW_COMPRESSION, RAW_SEGMENT_MB * 1024 * 1024)
+        return _RAW_ARCHIVE
+
+
+def _get_dedupe_index() -> Optional[DedupeIndex]:
+    global _RAW_DEDUPE
+    if not RAW_DEDUPE:
+        return None
+    path = os.path.join(RAW_DIR, 'dedupe_index.json')
+    with _RAW_ARCHIVE_LOCK:
+        if _RAW_DEDUPE is None or _RAW_DEDUPE.path != path:
+            if _RAW_DEDUPE is not None:
+                _RAW_DEDUPE.save()
+            _RAW_DEDUPE = DedupeIndex(path)
+        return _RAW_DEDUPE
+
+
+def fechar_raw_archive(genero: Optional[str] = None):
+    """Fecha (fsync) os segmentos raw abertos e grava o indice de deduplicacao."""
+    if _RAW_ARCHIVE is not None:
+        _RAW_ARCHIVE.close(genero)
+    if _RAW_DEDUPE is not None:
+        _RAW_DEDUPE.save()
+
+
+atexit.register(fechar_raw_archive)
+
+
+def _salvar_ref_json(prefix: str, ref: dict) -> str:
+    ts = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(_ensure_partition_dirs(RAW_DIR, 'misc'), f'{prefix}_{ts}.ref.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'payload_ref': ref}, f, ensure_ascii=False)
+    logger.info('Salvo raw (referencia): %s', path)
+    return path
+
+
+def salvar_raw(genero: str, entity: str, entity_id: str, obj: object, url: Optional[str] = None,
+               status: Optional[int] = None, market: Optional[str] = None) -> str:
+    """Grava uma resposta raw no formato configurado (SPOTIFY_RAW_FORMAT).
+
+    Com SPOTIFY_RAW_DEDUPE, um payload identico ao ultimo gravado para (entity, id, market)
+    vira so uma referencia ao arquivo/segmento que ja tem a copia completa.
+    """
+    prefix = f'{entity}_{entity_id}_{market}' if market else f'{entity}_{entity_id}'
+    extra = {'market': market} if market else {}
+    dedupe = _get_dedupe_index()
+    sha = None
+    if dedupe is not None:
+        sha, size = payload_sha256(obj)
+        key = DedupeIndex.key(entity, entity_id, market)
+        prev = dedupe.lookup(key, sha)
+        if prev is not None:
+            ref = {'sha256': sha, 'path': prev['path'], 'fetched_at': prev['fetched_at']}
+            if RAW_FORMAT != 'ndjson':
+                path = _salvar_ref_json(prefix, ref)
+            else:
+                path = _get_raw_archive().append(genero, entity, entity_id, None, url=url, status=status,
+                                                 ref=ref, **extra)
+            _inc_metric('raw_dedupe_hits', 1)
+            _inc_metric('raw_dedupe_bytes_saved', max(0, size - len(json.dumps(ref))))
+            return path
+        extra['sha256'] = sha
+    if RAW_FORMAT != 'ndjson':
+        path = salvar_json_raw(prefix, obj)
+    else:
+        path = _get_raw_archive().append(genero, entity, entity_id, obj, url=url, status=status, **extra)
+    if dedupe is not None:
+        dedupe.remember(key, sha, path, datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'))
+    return path
+
+
+class _SchemaValidator:
+    """Schema compilado uma vez: valida o lote inteiro e, se falhar, linha a linha."""
+
+    def __init__(self, schema: dict):
+        items = schema.get('items') if schema.get('type') == 'array' else None
+        if fastjsonschema is not None:
+            self.engine = 'fastjsonschema'
+            self._lote = self._fast(fastjsonschema.compile(schema))
+            self._linha = self._fast(fastjsonschema.compile(items)) if isinstance(items, dict) else None
+        else:
+            self.engine = 'jsonschema'
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            self._lote = self._generico(cls(schema))
+            self._linha = self._generico(cls(items)) if isinstance(items, dict) else None
+
+    @staticmethod
+    def _fast(fn):
+        def _validar(obj) -> Optional[str]:
+            try:
+                fn(obj)
+                return None
+            except fastjsonschema.JsonSchemaException as e:
+                return str(e)
+        return _validar
+
+    @staticmethod
+    def _generico(validator):
+        def _validar(obj) -> Optional[str]:
+            if validator.is_valid(obj):
+                return None
+            return next(iter(validator.iter_errors(obj))).message
+        return _validar
+
+    def validar(self, obj) -> Optional[str]:
+        """Mensagem do primeiro erro, ou None se `obj` for valido."""
+        return self._lote(obj)
+
+    def validar_lote(self, rows: list) -> tuple:
+        """Separa (indices validos, [(indice, erro)]) de um lote de linhas.
+
+        Sem subschema de item (`items`) nao da para isolar as linhas culpadas: um lote
+        reprovado e rejeitado inteiro.
+        """
+        erro = self._lote(rows)
+        if erro is None:
+            return list(range(len(rows))), []
+        if self._linha is None:
+            return [], [(i, erro) for i in range(len(rows))]
+        validos, rejeitados = [], []
+        for i, row in enumerate(rows):
+            erro = self._linha(row)
+            if erro is None:
+                validos.append(i)
+            else:
+                rejeitados.append((i, erro))
+        return validos, rejeitados
+
+
+_SCHEMA_VALIDATORS: dict = {}
+_SCHEMA_VALIDATORS_LOCK = threading.Lock()
+
+
+def _get_schema_validator(schema_path: str = SCHEMA_PATH) -> Optional[_SchemaValidator]:
+    """Validador compilado e em cache por arquivo (recompila se o schema mudar no disco)."""
     try:
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            schema = json.load(f)
-        validate(instance=obj, schema=schema)
-        return True
-    except FileNotFoundError:
-        logger.warning(
-            'Schema nao encontrado: %s. Pulando validacao.', schema_path)
+        mtime = os.path.getmtime(schema_path)
+    except OSError:
+        mtime = None
+    with _SCHEMA_VALIDATORS_LOCK:
+        cached = _SCHEMA_VALIDATORS.get(schema_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        validator = None
+        if mtime is None:
+            logger.warning('Schema nao encontrado: %s. Pulando validacao.', schema_path)
+        else:
+            # JSON malformado ou schema invalido (SchemaError): mesmo tratamento de schema ausente
+            try:
+                with open(schema_path, 'r', encoding='utf-8') as f:
+                    validator = _SchemaValidator(json.load(f))
+                logger.info('Schema compilado (%s): %s', validator.engine, schema_path)
+            except Exception as e:
+                logger.warning('Schema invalido %s: %s. Pulando validacao.', schema_path, e)
+        _SCHEMA_VALIDATORS[schema_path] = (mtime, validator)
+        return validator
+
+
+def validar_com_schema(obj: object, schema_path: str = SCHEMA_PATH) -> bool:
+    validator = _get_schema_validator(schema_path)
+    if validator is None:
         return False
-    except ValidationError as e:
-        logger.error('Validacao falhou: %s', e)
+    erro = validator.validar(obj)
+    if erro is not None:
+        logger.error('Validacao falhou: %s', erro)
         return False
+    return True
+
+
+def _registrar_etapa(etapa: str, elapsed: float):
+    _inc_metric(f'stage_{etapa}_seconds', elapsed)
+    if PROMETHEUS_AVAILABLE:
+        PROM_STAGE_SECONDS.labels(stage=etapa).observe(elapsed)
+
+
+def _salvar_rejeitados(genero: str, market: Optional[str], artista_obj: dict, rejeitados: list,
+                       quando: Optional[datetime]) -> str:
+    """Anexa as linhas reprovadas no schema em rejects/<genero>/[market=XX/]YYYY/MM/DD/rejects.ndjson."""
+    part_dir = _ensure_partition_dirs(os.path.join(DATA_DIR, 'rejects'), genero, market, when=quando)
+    path = os.path.join(part_dir, 'rejects.ndjson')
+    ts = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    with open(path, 'a', encoding='utf-8') as f:
+        for row, erro in rejeitados:
+            f.write(json.dumps({'rejected_at': ts, 'artist_id': str(artista_obj.get('id') or ''),
+                                'genero': genero, 'market': market, 'erro': erro, 'row': row},
+                               ensure_ascii=False) + '\n')
+    logger.warning('%d linhas reprovadas no schema (artista %s); gravadas em %s', len(rejeitados),
+                   artista_obj.get('id'), path)
+    return path
 
 
-def processar_e_salvar(artista_obj: dict, tracks: list, genero: str) -> str:
-    """Normaliza a saida e salva arquivo processado por artista."""
+_PROCESSED_SINK: Optional[ParquetSink] = None
+_PROCESSED_SINK_LOCK = threading.Lock()
+
+
+def _get_processed_sink() -> ParquetSink:
+    global _PROCESSED_SINK
+    with _PROCESSED_SINK_LOCK:
+        if _PROCESSED_SINK is None or _PROCESSED_SINK.base_dir != PROCESSED_DIR:
+            if _PROCESSED_SINK is not None:
+                _PROCESSED_SINK.close()
+            _PROCESSED_SINK = ParquetSink(PROCESSED_DIR, PARQUET_ROW_GROUP)
+        return _PROCESSED_SINK
+
+
+def fechar_processed_sink(genero: Optional[str] = None):
+    """Grava os row groups pendentes e publica os Parquet processados abertos."""
+    if _PROCESSED_SINK is not None:
+        _PROCESSED_SINK.close(genero)
+
+
+atexit.register(fechar_processed_sink)
+
+
+def processar_e_salvar(artista_obj: dict, tracks: list, genero: str, market: Optional[str] = None,
+                       coletado_em: Optional[datetime] = None, lote_db: Optional[list] = None) -> str:
+    """Normaliza a saida e salva arquivo processado por artista (particionado por market, se informado).
+
+    `coletado_em` fixa a particao de data (replay de dados antigos). Com `lote_db` o item do DB
+    (artista, tracks validas, genero, market, collected_at) e anexado a lista em vez de gravado,
+    para o chamador gravar em lote. Com SPOTIFY_PROCESSED_FORMAT=parquet as linhas vao para o
+    buffer do sink e o retorno e o Parquet que vai recebe-las.
+    """
+    started = time.perf_counter()
     nome = artista_obj.get('name') or 'unknown_artist'
     processed = []
     for t in tracks:
@@ -425,66 +1743,530 @@ def processar_e_salvar(artista_obj: dict, tracks: list, genero: str) -> str:
             'id': t.get('id'),
             'duracao_ms': t.get('duration_ms')
         })
-
-    out_name = f"{nome.replace(' ', '_')}_{genero}.json"
-    part_dir = _ensure_partition_dirs(PROCESSED_DIR, genero)
-    out_path = os.path.join(part_dir, out_name)
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(processed, f, ensure_ascii=False, indent=2)
-    logger.info('Salvo processado: %s (%d tracks)', out_path, len(processed))
+    _registrar_etapa('normalize', time.perf_counter() - started)
+
+    validator = _get_schema_validator() if SCHEMA_VALIDATION else None
+    if validator is not None:
+        started = time.perf_counter()
+        validos, rejeitados = validator.validar_lote(processed)
+        if rejeitados:
+            _salvar_rejeitados(genero, market, artista_obj, [(processed[i], e) for i, e in rejeitados],
+                               coletado_em)
+            _inc_metric('rows_rejected', len(rejeitados))
+            processed = [processed[i] for i in validos]
+            tracks = [tracks[i] for i in validos]
+        _registrar_etapa('validate', time.perf_counter() - started)
+
+    started = time.perf_counter()
+    if PROCESSED_FORMAT == 'parquet':
+        quando = coletado_em or datetime.now(timezone.utc)
+        extra = {'artist_id': str(artista_obj.get('id') or ''), 'genero': genero,
+                 'coletado_em': quando.strftime('%Y-%m-%dT%H:%M:%SZ')}
+        out_path = _get_processed_sink().append(genero, market, [dict(r, **extra) for r in processed], quando)
+    else:
+        out_name = f"{nome.replace(' ', '_')}_{genero}.json"
+        part_dir = _ensure_partition_dirs(PROCESSED_DIR, genero, market, when=coletado_em)
+        out_path = os.path.join(part_dir, out_name)
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(processed, f, ensure_ascii=False, indent=2)
+        logger.info('Salvo processado: %s (%d tracks)', out_path, len(processed))
+    _registrar_etapa('write', time.perf_counter() - started)
     # write into sqlite DB for analytics
-    try:
-        db_path = os.path.join(DATA_DIR, 'spotify.db')
-        insert_artist_tracks(db_path, artista_obj, tracks, genero)
-    except Exception as e:
-        logger.warning('Falha ao gravar no DB: %s', e)
+    if lote_db is not None:
+        quando = coletado_em or datetime.now(timezone.utc)
+        lote_db.append((artista_obj, tracks, genero, market or DEFAULT_MARKET, quando.strftime('%Y-%m-%dT%H:%M:%SZ')))
+    else:
+        started = time.perf_counter()
+        try:
+            db_path = os.path.join(DATA_DIR, 'spotify.db')
+            insert_artist_tracks(db_path, artista_obj, tracks, genero, market=market or DEFAULT_MARKET)
+        except Exception as e:
+            logger.warning('Falha ao gravar no DB: %s', e)
+        _registrar_etapa('db', time.perf_counter() - started)
     _inc_metric('artists_processed', 1)
     _inc_metric('tracks_processed', len(processed))
     return out_path
 
 
-def coletar_por_genero(genero: str = GENERO, qtd_artistas: int = QTD_ARTISTAS, market: str = 'BR'):
+# --- coalescencia de top-tracks entre generos ----------------------------------------
+class _TopTracksCoalescer:
+    """Memo + mapa in-flight por (artist_id, market) valido durante uma execucao.
+
+    A primeira chamada para uma chave faz o fetch; chamadas concorrentes esperam o mesmo
+    resultado e chamadas posteriores (outros generos) recebem o valor memorizado.
+    Falhas nao sao memorizadas, para que a proxima chamada tente de novo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: dict = {}
+        self.saved = 0
+
+    def get(self, artist_id: str, market: str, fetch):
+        key = (artist_id, market)
+        with self._lock:
+            fut = self._futures.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._futures[key] = fut
+        if not owner:
+            result = fut.result()
+            with self._lock:
+                self.saved += 1
+            _inc_metric('top_tracks_calls_saved', 1)
+            return result
+        try:
+            result = fetch()
+        except Exception as e:
+            with self._lock:
+                self._futures.pop(key, None)
+            fut.set_exception(e)
+            raise
+        fut.set_result(result)
+        return result
+
+
+_COALESCER: Optional[_TopTracksCoalescer] = None
+
+
+@contextmanager
+def execucao_coalescida():
+    """Ativa a coalescencia de top-tracks para todos os generos coletados dentro do bloco."""
+    global _COALESCER
+    anterior = _COALESCER
+    _COALESCER = coalescer = _TopTracksCoalescer()
+    try:
+        yield coalescer
+    finally:
+        _COALESCER = anterior
+        logger.info('Coalescencia de top-tracks: %d chamadas economizadas', coalescer.saved)
+
+
+def _buscar_top_tracks_em_paralelo(tarefas: List[tuple], token: str, workers: int = 1):
+    """Busca top tracks de cada par (artista, market) com ate `workers` requisicoes simultaneas.
+
+    Gera tuplas (artista, market, tracks, resposta, erro) na ordem em que as respostas chegam,
+    onde `resposta` e {'url', 'status'} da chamada; com workers <= 1 as chamadas sao feitas em
+    sequencia, na ordem de `tarefas`. Depois do primeiro CircuitOpenError as buscas que ainda nao
+    comecaram sao canceladas e saem com esse mesmo erro; as que ja estavam em andamento terminam
+    normalmente. Fechar o gerador tambem cancela o que nao comecou.
+    """
+    coalescer = _COALESCER
+
+    def _fetch(artista, market):
+        artist_id = str(artista.get('id') or '')
+
+        def _buscar():
+            _ULTIMA_RESPOSTA.url = _ULTIMA_RESPOSTA.status = None
+            # falha levanta excecao: o coalescer so memoriza buscas bem-sucedidas
+            tracks = buscar_top_tracks(artist_id, token, market=market)
+            return tracks, _ultima_resposta()
+        if coalescer is None:
+            return _buscar()
+        # artista ja buscado para outro genero nesta execucao -> reaproveita
+        return coalescer.get(artist_id, market, _buscar)
+
+    aberto = None  # primeiro CircuitOpenError visto
+    if workers <= 1 or len(tarefas) <= 1:
+        for artista, market in tarefas:
+            if aberto is not None:
+                yield artista, market, None, None, aberto
+                continue
+            try:
+                yield (artista, market) + _fetch(artista, market) + (None,)
+            except CircuitOpenError as e:
+                aberto = e
+                yield artista, market, None, None, e
+            except Exception as e:
+                yield artista, market, None, None, e
+        return
+
+    if workers > HTTP_POOL_MAXSIZE:
+        logger.info('workers=%d maior que SPOTIFY_HTTP_POOL_MAXSIZE=%d; conexoes extras nao serao reaproveitadas',
+                    workers, HTTP_POOL_MAXSIZE)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='toptracks') as pool:
+        futures = {pool.submit(_fetch, a, m): (a, m) for a, m in tarefas}
+        try:
+            for fut in as_completed(futures):
+                artista, market = futures[fut]
+                if fut.cancelled():
+                    yield artista, market, None, None, aberto
+                    continue
+                try:
+                    yield (artista, market) + fut.result() + (None,)
+                except CircuitOpenError as e:
+                    if aberto is None:
+                        aberto = e
+                        # endpoint fora do ar: o que nao comecou nao roda
+                        for pendente in futures:
+                            pendente.cancel()
+                    yield artista, market, None, None, e
+                except Exception as e:
+                    yield artista, market, None, None, e
+        finally:
+            # consumidor parou (erro/interrupcao): o que nao comecou nao roda
+            for fut in futures:
+                fut.cancel()
+
+
+def _parse_markets(value: Optional[str]) -> List[str]:
+    """'BR, pt,US' -> ['BR', 'PT', 'US'] (sem repetir, na ordem informada)."""
+    markets = []
+    for m in (value or '').split(','):
+        m = m.strip().upper()
+        if m and m not in markets:
+            markets.append(m)
+    return markets
+
+
+def _novo_writer() -> BackgroundWriter:
+    return BackgroundWriter(WRITER_QUEUE, name='persist', on_depth=_writer_depth, on_job=_writer_job)
+
+
+def _writer_depth(depth: int):
+    if PROMETHEUS_AVAILABLE:
+        PROM_WRITER_QUEUE_DEPTH.set(depth)
+
+
+def _writer_job(elapsed: float):
+    if PROMETHEUS_AVAILABLE:
+        PROM_WRITER_SECONDS.observe(elapsed)
+
+
+def _registrar_writer(writer: BackgroundWriter):
+    """Soma as estatisticas do writer em _METRICS (fila, latencia de escrita, backpressure)."""
+    st = writer.stats()
+    _inc_metric('writer_jobs', st['jobs'])
+    _inc_metric('writer_errors', st['errors'])
+    _inc_metric('writer_write_seconds', st['write_seconds'])
+    _inc_metric('writer_blocked_seconds', st['blocked_seconds'])
+    with _METRICS_LOCK:
+        _METRICS['writer_queue_max_depth'] = max(_METRICS.get('writer_queue_max_depth', 0), st['max_depth'])
+        _METRICS['writer_write_p50'] = st['write_p50']
+        _METRICS['writer_write_p95'] = st['write_p95']
+    logger.info('Writer: %d jobs, fila max %d, %.2fs escrevendo, %.2fs de backpressure',
+                st['jobs'], st['max_depth'], st['write_seconds'], st['blocked_seconds'])
+
+
+def _aplicar_retencao():
+    """Poda incremental do DATA_DIR (mais antigo primeiro) e soma o que foi liberado em _METRICS."""
+    try:
+        relatorio = aplicar_retencao(DATA_DIR)
+    except Exception as e:
+        logger.warning('Falha na retencao: %s', e)
+        return
+    for tier, r in relatorio.items():
+        _inc_metric('retention_files_removed', r['files_removed'])
+        _inc_metric('retention_bytes_freed', r['bytes_freed'])
+        _inc_metric(f'retention_{tier}_bytes_freed', r['bytes_freed'])
+
+
+def coletar_por_genero(genero: str = GENERO, qtd_artistas: int = QTD_ARTISTAS, market: str = 'BR',
+                       workers: int = WORKERS, markets: Optional[List[str]] = None):
+    """Coleta top tracks dos artistas de um genero para um ou mais markets.
+
+    A descoberta de artistas roda uma vez; com `markets` (ex.: ['BR', 'PT', 'US']) cada par
+    (artista, market) vira uma busca de top tracks e os processados sao particionados por market.
+    """
+    markets = list(markets) if markets else [market]
     # valida e chama autenticao
     cid = str(CLIENT_ID or os.getenv('SPOTIFY_CLIENT_ID') or '')
     csecret = str(CLIENT_SECRET or os.getenv('SPOTIFY_CLIENT_SECRET') or '')
     token = autenticar_spotify(cid, csecret)
     
-    # Tenta a busca direta por gênero primeiro
-    artistas = buscar_artistas_por_genero(genero, token, limit=qtd_artistas)
+    # Tenta a busca direta por gênero primeiro (resultado fica em cache por DISCOVERY_TTL_HOURS,
+    # inclusive quando vazio, para nao repetir a busca que ja sabemos que nao traz nada;
+    # falhas de requisicao nao entram no cache)
+    artistas = _descobrir_com_cache(genero, 'genre', qtd_artistas,
+                                    lambda: buscar_artistas_por_genero(genero, token, limit=qtd_artistas,
+                                                                       workers=workers))
 
     # Se a busca por gênero falhar, tenta a nova estratégia por playlist
     if not artistas:
         logger.warning("Busca por gênero não retornou artistas. Tentando estratégia de busca por playlist.")
-        artistas = buscar_artistas_por_playlist(genero, token, artist_limit=qtd_artistas)
+        # artistas de playlist vem simplificados; completa em lotes de 50
+        def _por_playlist():
+            encontrados = buscar_artistas_por_playlist(genero, token, artist_limit=qtd_artistas)
+            return hidratar_artistas(encontrados, token) if encontrados is not None else None
+        artistas = _descobrir_com_cache(genero, 'playlist', qtd_artistas, _por_playlist)
 
     if not artistas:
         logger.error("Nenhum artista encontrado para o gênero '%s' com ambas as estratégias. Abortando.", genero)
         return []
 
-    # load checkpoint
+    # load checkpoint: `processed_markets` guarda os pares (artista, market) ja coletados e e a
+    # unica fonte de verdade; checkpoint antigo (so `processed_artists`) vale para o market padrao
     checkpoint = load_checkpoint(genero)
     processed_ids = set(checkpoint.get('processed_artists', []))
-    resultado = []
+    if 'processed_markets' in checkpoint:
+        por_market = {m: set(ids) for m, ids in checkpoint['processed_markets'].items()}
+    else:
+        por_market = {DEFAULT_MARKET: set(processed_ids)} if processed_ids else {}
+    pendentes = []
     for artista in artistas:
         artist_id = str(artista.get('id') or '')
-        if artist_id in processed_ids:
+        faltando = [m for m in markets if artist_id not in por_market.get(m, set())]
+        if not faltando:
             logger.info('Pulando artista ja processado: %s', artist_id)
             continue
-        logger.info('Coletando artista: %s', artista.get('name'))
-        salvar_json_raw(f"artist_{artist_id}", artista)
-        top_tracks = buscar_top_tracks(artist_id, token, market=market)
-        salvar_json_raw(f"toptracks_{artist_id}", top_tracks)
-        proc_path = processar_e_salvar(artista, top_tracks, genero)
-        resultado.append({'artist_id': artist_id, 'processed_path': proc_path})
-        # update checkpoint
-        processed_ids.add(artist_id)
+        pendentes.extend((artista, m) for m in faltando)
+
+    resultado = []
+    falhas = 0
+    raw_salvos = set()
+    # no modo parquet as linhas ficam no buffer do sink ate o fechamento do genero: os pares
+    # so entram no checkpoint depois que o arquivo for publicado (um kill antes disso os refaz)
+    aguardando_parquet = []
+
+    def _marcar_processados(pares):
+        for artist_id, mkt in pares:
+            por_market.setdefault(mkt, set()).add(artist_id)
+            if all(artist_id in por_market.get(m, set()) for m in markets):
+                processed_ids.add(artist_id)
         checkpoint['processed_artists'] = list(processed_ids)
+        checkpoint['processed_markets'] = {m: list(ids) for m, ids in por_market.items()}
         save_checkpoint(genero, checkpoint)
+
+    def _persistir(artista, mkt, top_tracks, resposta):
+        # roda na thread do writer: raw, processado, DB e checkpoint em ordem; se algo falhar
+        # o par (artista, market) nao entra no checkpoint e volta na proxima execucao
+        artist_id = str(artista.get('id') or '')
+        if artist_id not in raw_salvos:
+            salvar_raw(genero, 'artist', artist_id, artista)
+            raw_salvos.add(artist_id)
+        salvar_raw(genero, 'toptracks', artist_id, top_tracks, url=resposta['url'], status=resposta['status'],
+                   market=mkt)
+        proc_path = processar_e_salvar(artista, top_tracks, genero, market=mkt)
+        resultado.append({'artist_id': artist_id, 'market': mkt, 'processed_path': proc_path})
+        if PROCESSED_FORMAT == 'parquet':
+            aguardando_parquet.append((artist_id, mkt))
+        else:
+            _marcar_processados([(artist_id, mkt)])
+
+    # rede em paralelo (workers); persistencia e checkpoint numa thread de escrita com fila limitada
+    writer = _novo_writer()
+    buscas = _buscar_top_tracks_em_paralelo(pendentes, token, workers)
+    adiados = 0
+    breaker_aberto = None
+    try:
+        for artista, mkt, top_tracks, resposta, erro in buscas:
+            artist_id = str(artista.get('id') or '')
+            if isinstance(erro, CircuitOpenError):
+                # rejeitado pelo breaker ou cancelado por causa dele: fica para a proxima execucao;
+                # buscas ja em andamento continuam chegando e sao gravadas normalmente
+                adiados += 1
+                breaker_aberto = erro
+                continue
+            if erro is not None:
+                # nao marca no checkpoint: o artista volta na proxima execucao
+                falhas += 1
+                logger.warning('Falha ao coletar artista %s (%s): %s', artist_id, mkt, erro)
+                continue
+            logger.info('Coletando artista: %s (%s)', artista.get('name'), mkt)
+            writer.submit(_persistir, artista, mkt, top_tracks, resposta)
+    finally:
+        buscas.close()
+        # flush + join mesmo em erro/interrupcao: o que ja foi buscado e gravado
+        writer.close()
+        _registrar_writer(writer)
+        fechar_raw_archive(genero)
+        fechar_processed_sink(genero)
+        if aguardando_parquet:
+            _marcar_processados(aguardando_parquet)
+    falhas += writer.stats()['errors']
+    if adiados:
+        _inc_metric('pairs_deferred_circuit_open', adiados)
+        logger.warning('%s; %d coletas (artista, market) do genero %s adiadas para a proxima execucao',
+                       breaker_aberto, adiados, genero)
+    if _METRICS.get('raw_dedupe_hits'):
+        logger.info('Raw dedupe: %d payloads repetidos viraram referencia, %.1f KB economizados',
+                    _METRICS['raw_dedupe_hits'], _METRICS.get('raw_dedupe_bytes_saved', 0) / 1024)
+    if falhas:
+        logger.warning('%d coletas (artista, market) falharam no genero %s; serao retomadas na proxima execucao',
+                       falhas, genero)
     # save metrics summary
+    pool = http_pool_stats()
+    logger.info('HTTP pool: %d hits, %d misses (hit ratio %.2f)',
+                pool['hits'], pool['misses'], pool['hit_ratio'])
+    logger.info('Rate limiter: %.1fs aguardando bucket, %.1fs em pausa por 429',
+                _METRICS.get('rate_limit_wait_seconds', 0), _METRICS.get('rate_limit_pause_seconds', 0))
+    logger.info('Etapas: normalize %.3fs, validate %.3fs, write %.3fs, db %.3fs; %d linhas rejeitadas no schema',
+                _METRICS.get('stage_normalize_seconds', 0), _METRICS.get('stage_validate_seconds', 0),
+                _METRICS.get('stage_write_seconds', 0), _METRICS.get('stage_db_seconds', 0),
+                _METRICS.get('rows_rejected', 0))
+    if RETENTION_ENABLED:
+        _aplicar_retencao()
     _save_metrics()
     return resultado
 
 
+# --- multi-genre collection -------------------------------------------------------
+def _salvar_ranking_genero(g: str, market: str, por_market: bool):
+    """Ranking simples: top 20 tracks por popularidade dos processados de hoje do genero/market."""
+    part_dir = _ensure_partition_dirs(PROCESSED_DIR, g, market)
+    # processados de hoje do genero: Parquet do sink ou JSON por artista (sem pandas aqui)
+    ranked = []
+    for fn in os.listdir(part_dir):
+        if fn.endswith('.parquet') and not fn.startswith('_'):
+            try:
+                ranked.extend(pq.read_table(os.path.join(part_dir, fn), columns=[
+                    'artista', 'musica', 'popularidade', 'preview_url', 'id', 'duracao_ms']).to_pylist())
+            except Exception:
+                continue
+        elif fn.endswith(f'_{g}.json'):
+            p = os.path.join(part_dir, fn)
+            try:
+                with open(p, 'r', encoding='utf-8') as f:
+                    arr = json.load(f)
+                    for item in arr:
+                        ranked.append(item)
+            except Exception:
+                continue
+    # rankear por popularidade desc
+    ranked = [r for r in ranked if r.get(
+        'popularidade') is not None]
+    ranked.sort(key=lambda x: x.get(
+        'popularidade', 0), reverse=True)
+    # limitar a top 20
+    ranked = ranked[:20]
+    ts = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    nome = f'top_tracks_{g}_{market}_{ts}.json' if por_market else f'top_tracks_{g}_{ts}.json'
+    out_path = os.path.join(PROCESSED_DIR, nome)
+    try:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(ranked, f, ensure_ascii=False, indent=2)
+        logger.info('Ranking salvo: %s (top %d)',
+                    out_path, len(ranked))
+    except Exception as e:
+        logger.warning('Falha ao salvar ranking para %s: %s', g, e)
+
+
+def coletar_todos_generos(max_per_genre: int = 20, market: str = 'BR', force_each: bool = False,
+                          workers: int = WORKERS, markets: Optional[List[str]] = None):
+    """Coleta para todos os generos retornados por get_available_genres.
+
+    Para cada genero: coleta até `max_per_genre` artistas e salva resultados.
+    Gera um arquivo de ranking por genero em `data/processed/top_tracks_{genero}_{ts}.json`
+    (`top_tracks_{genero}_{market}_{ts}.json` quando ha mais de um market).
+    """
+    markets = list(markets) if markets else [market]
+    cid = str(CLIENT_ID or os.getenv('SPOTIFY_CLIENT_ID') or '')
+    csecret = str(CLIENT_SECRET or os.getenv(
+        'SPOTIFY_CLIENT_SECRET') or '')
+    if not cid or not csecret:
+        raise RuntimeError(
+            'Credenciais ausentes para coletar todos generos')
+    token = autenticar_spotify(cid, csecret)
+    genres = get_available_genres(token)
+    if not genres:
+        logger.warning(
+            'Nenhum genero retornado pela API; abortando coleta por generos')
+        return
+    with execucao_coalescida():
+        for g in genres:
+            logger.info('Iniciando coleta para genero: %s', g)
+            # opcao de forcar por genero
+            if force_each:
+                cp = _checkpoint_path_for_genre(g)
+                if os.path.exists(cp):
+                    try:
+                        shutil.move(cp, cp + '.bak')
+                        logger.info(
+                            'Checkpoint movido para %s (forcando reprocessamento)', cp + '.bak')
+                    except Exception as e:
+                        logger.warning(
+                            'Falha ao mover checkpoint para genero %s: %s', g, e)
+            try:
+                # coletar e processar
+                resultado = coletar_por_genero(
+                    g, max_per_genre, market, workers=workers, markets=markets)
+                for mkt in markets:
+                    _salvar_ranking_genero(g, mkt, len(markets) > 1)
+            except Exception as e:
+                logger.warning('Erro no genero %s: %s', g, e)
+
+
+# --- Batch rotation support -------------------------------------------------
+def _load_rotation_state(path: str) -> dict:
+    if not os.path.exists(path):
+        return {'genres': [], 'index': 0}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {'genres': [], 'index': 0}
+
+
+def _save_rotation_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def _fallback_genres() -> List[str]:
+    # lista com generos comuns e alguns generos brasileiros
+    return [
+        'rock', 'pop', 'hiphop', 'electronic', 'jazz', 'classical', 'metal', 'reggae', 'blues', 'folk',
+        'country', 'latin', 'soul', 'punk', 'disco', 'funk', 'rnb', 'indie', 'dance', 'samba', 'mpb', 'sertanejo', 'forro', 'pagode', 'bossa nova'
+    ]
+
+
+def run_batch_genres(batch_size: int, rotation_path: str, market: str = 'BR', force_each: bool = False,
+                     workers: int = WORKERS, markets: Optional[List[str]] = None):
+    """Processa `batch_size` generos por execucao, mantendo estado em rotation_path."""
+    if batch_size <= 0:
+        return
+    cid = str(CLIENT_ID or os.getenv('SPOTIFY_CLIENT_ID') or '')
+    csecret = str(CLIENT_SECRET or os.getenv(
+        'SPOTIFY_CLIENT_SECRET') or '')
+    genres = []
+    if cid and csecret:
+        try:
+            token = autenticar_spotify(cid, csecret)
+            genres = get_available_genres(token)
+        except Exception:
+            genres = []
+    if not genres:
+        genres = _fallback_genres()
+
+    state = _load_rotation_state(rotation_path)
+    # if state genres empty, initialize
+    if not state.get('genres'):
+        state['genres'] = genres
+        state['index'] = 0
+
+    current = state.get('index', 0)
+    total = len(state['genres'])
+    if total == 0:
+        logger.warning('Nenhum genero disponivel para rotacao')
+        return
+
+    to_process = []
+    for i in range(batch_size):
+        idx = (current + i) % total
+        to_process.append(state['genres'][idx])
+
+    # processar cada genero
+    with execucao_coalescida():
+        for g in to_process:
+            logger.info('Batch coletando genero: %s', g)
+            try:
+                if force_each:
+                    cp = _checkpoint_path_for_genre(g)
+                    if os.path.exists(cp):
+                        shutil.move(cp, cp + '.bak')
+                coletar_por_genero(g, QTD_ARTISTAS, market, workers=workers, markets=markets)
+            except Exception as e:
+                logger.warning('Erro ao processar genero %s: %s', g, e)
+
+    # advance index
+    state['index'] = (current + batch_size) % total
+    _save_rotation_state(rotation_path, state)
+    logger.info('Rotacao atualizada: index=%d total_genres=%d',
+                state['index'], total)
+
+
 if __name__ == '__main__':
     # Execucao via linha de comando com suporte a prompt interativo e flags
     def _prompt_filters() -> dict:
@@ -555,9 +2337,17 @@ if __name__ == '__main__':
                         help='Coletar todos os generos disponiveis (ate --qtd por genero)')
     parser.add_argument('--batch-genres', type=int, default=0,
                         help='Processar este numero de generos nesta execucao (rota em lista de generos)')
+    parser.add_argument('--markets', type=_parse_markets, default=None,
+                        help='Varios markets em uma passada, separados por virgula (ex: BR,PT,US); sobrepoe --market')
+    parser.add_argument('--workers', '-w', type=int, default=WORKERS,
+                        help='Requisicoes de top-tracks simultaneas por genero (default: SPOTIFY_WORKERS ou 1)')
+    parser.add_argument('--discovery-ttl', type=float, default=None,
+                        help='Horas para reaproveitar artistas descobertos por genero (0 = sempre buscar)')
     parser.add_argument('--rotation-file', default=os.path.join(DATA_DIR, 'checkpoints',
                         'genre_rotation.json'), help='Arquivo para guardar estado da rotacao de generos')
     args = parser.parse_args()
+    if args.discovery_ttl is not None:
+        DISCOVERY_TTL_HOURS = args.discovery_ttl
 
     # decidir parametros: flags > env vars/defaults > interactive
     if args.no_interactive:
@@ -591,154 +2381,12 @@ if __name__ == '__main__':
             except Exception as e:
                 logger.warning('Falha ao mover checkpoint: %s', e)
 
-    def coletar_todos_generos(max_per_genre: int = 20, market: str = 'BR', force_each: bool = False):
-        """Coleta para todos os generos retornados por get_available_genres.
-
-        Para cada genero: coleta até `max_per_genre` artistas e salva resultados.
-        Gera um arquivo de ranking por genero em `data/processed/top_tracks_{genero}_{ts}.parquet`.
-        """
-        cid = str(CLIENT_ID or os.getenv('SPOTIFY_CLIENT_ID') or '')
-        csecret = str(CLIENT_SECRET or os.getenv(
-            'SPOTIFY_CLIENT_SECRET') or '')
-        if not cid or not csecret:
-            raise RuntimeError(
-                'Credenciais ausentes para coletar todos generos')
-        token = autenticar_spotify(cid, csecret)
-        genres = get_available_genres(token)
-        if not genres:
-            logger.warning(
-                'Nenhum genero retornado pela API; abortando coleta por generos')
-            return
-        for g in genres:
-            logger.info('Iniciando coleta para genero: %s', g)
-            # opcao de forcar por genero
-            if force_each:
-                cp = _checkpoint_path_for_genre(g)
-                if os.path.exists(cp):
-                    try:
-                        shutil.move(cp, cp + '.bak')
-                        logger.info(
-                            'Checkpoint movido para %s (forcando reprocessamento)', cp + '.bak')
-                    except Exception as e:
-                        logger.warning(
-                            'Falha ao mover checkpoint para genero %s: %s', g, e)
-            try:
-                # coletar e processar
-                resultado = coletar_por_genero(g, max_per_genre, market)
-                # criar ranking simples: agregando arquivos processados por esse genero hoje
-                part_dir = _ensure_partition_dirs(PROCESSED_DIR, g)
-                # coletar todos jsons recentes para esse genero (não usar pandas para evitar dependência extra aqui)
-                ranked = []
-                for fn in os.listdir(part_dir):
-                    if fn.endswith(f'_{g}.json'):
-                        p = os.path.join(part_dir, fn)
-                        try:
-                            with open(p, 'r', encoding='utf-8') as f:
-                                arr = json.load(f)
-                                for item in arr:
-                                    ranked.append(item)
-                        except Exception:
-                            continue
-                # rankear por popularidade desc
-                ranked = [r for r in ranked if r.get(
-                    'popularidade') is not None]
-                ranked.sort(key=lambda x: x.get(
-                    'popularidade', 0), reverse=True)
-                # limitar a top 20
-                ranked = ranked[:20]
-                ts = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
-                out_path = os.path.join(
-                    PROCESSED_DIR, f'top_tracks_{g}_{ts}.json')
-                try:
-                    with open(out_path, 'w', encoding='utf-8') as f:
-                        json.dump(ranked, f, ensure_ascii=False, indent=2)
-                    logger.info('Ranking salvo: %s (top %d)',
-                                out_path, len(ranked))
-                except Exception as e:
-                    logger.warning('Falha ao salvar ranking para %s: %s', g, e)
-            except Exception as e:
-                logger.warning('Erro no genero %s: %s', g, e)
-
     try:
-        coletar_por_genero(genero, qtd, market)
+        coletar_por_genero(genero, qtd, market, workers=args.workers, markets=args.markets)
     except Exception as e:
         logger.exception('Erro durante a coleta: %s', e)
 
-    # --- Batch rotation support -------------------------------------------------
-    def _load_rotation_state(path: str) -> dict:
-        if not os.path.exists(path):
-            return {'genres': [], 'index': 0}
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return {'genres': [], 'index': 0}
-
-    def _save_rotation_state(path: str, state: dict):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
-
-    def _fallback_genres() -> List[str]:
-        # lista com generos comuns e alguns generos brasileiros
-        return [
-            'rock', 'pop', 'hiphop', 'electronic', 'jazz', 'classical', 'metal', 'reggae', 'blues', 'folk',
-            'country', 'latin', 'soul', 'punk', 'disco', 'funk', 'rnb', 'indie', 'dance', 'samba', 'mpb', 'sertanejo', 'forro', 'pagode', 'bossa nova'
-        ]
-
-    def run_batch_genres(batch_size: int, rotation_path: str, market: str = 'BR', force_each: bool = False):
-        """Processa `batch_size` generos por execucao, mantendo estado em rotation_path."""
-        if batch_size <= 0:
-            return
-        cid = str(CLIENT_ID or os.getenv('SPOTIFY_CLIENT_ID') or '')
-        csecret = str(CLIENT_SECRET or os.getenv(
-            'SPOTIFY_CLIENT_SECRET') or '')
-        genres = []
-        if cid and csecret:
-            try:
-                token = autenticar_spotify(cid, csecret)
-                genres = get_available_genres(token)
-            except Exception:
-                genres = []
-        if not genres:
-            genres = _fallback_genres()
-
-        state = _load_rotation_state(rotation_path)
-        # if state genres empty, initialize
-        if not state.get('genres'):
-            state['genres'] = genres
-            state['index'] = 0
-
-        current = state.get('index', 0)
-        total = len(state['genres'])
-        if total == 0:
-            logger.warning('Nenhum genero disponivel para rotacao')
-            return
-
-        to_process = []
-        for i in range(batch_size):
-            idx = (current + i) % total
-            to_process.append(state['genres'][idx])
-
-        # processar cada genero
-        for g in to_process:
-            logger.info('Batch coletando genero: %s', g)
-            try:
-                if force_each:
-                    cp = _checkpoint_path_for_genre(g)
-                    if os.path.exists(cp):
-                        shutil.move(cp, cp + '.bak')
-                coletar_por_genero(g, QTD_ARTISTAS, market)
-            except Exception as e:
-                logger.warning('Erro ao processar genero %s: %s', g, e)
-
-        # advance index
-        state['index'] = (current + batch_size) % total
-        _save_rotation_state(rotation_path, state)
-        logger.info('Rotacao atualizada: index=%d total_genres=%d',
-                    state['index'], total)
-
     # se o usuario solicitou processamento em batch, executa e sai
     if args.batch_genres and args.batch_genres > 0:
         run_batch_genres(args.batch_genres, args.rotation_file,
-                         market=market, force_each=force)
+                         market=market, force_each=force, workers=args.workers, markets=args.markets)
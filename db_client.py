@@ -1,8 +1,12 @@
+import json
 import os
 import sqlite3
 from datetime import datetime, timezone
 from typing import Dict, List
 
+# market das linhas gravadas antes da coluna existir (o coletor sempre usou BR por default)
+DEFAULT_MARKET = 'BR'
+
 
 def init_db(db_path: str):
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
@@ -13,33 +17,106 @@ def init_db(db_path: str):
         artist_id TEXT,
         artist_name TEXT,
         genre TEXT,
+        market TEXT,
         track_id TEXT,
         track_name TEXT,
         popularity INTEGER,
         preview_url TEXT,
         duration_ms INTEGER,
         collected_at TEXT,
-        PRIMARY KEY (artist_id, track_id)
+        PRIMARY KEY (artist_id, track_id, market)
+    )
+    ''')
+    _migrate_tracks_market(cur)
+    cur.execute('''
+    CREATE TABLE IF NOT EXISTS artists (
+        artist_id TEXT PRIMARY KEY,
+        artist_name TEXT,
+        popularity INTEGER,
+        followers INTEGER,
+        genres TEXT,
+        collected_at TEXT
     )
     ''')
     conn.commit()
     conn.close()
 
 
-def insert_artist_tracks(db_path: str, artista: Dict, tracks: List[Dict], genero: str):
-    init_db(db_path)
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    collected_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+def _migrate_tracks_market(cur):
+    """Bancos antigos: recria `tracks` com a coluna market na chave primaria."""
+    cols = [row[1] for row in cur.execute('PRAGMA table_info(tracks)')]
+    if 'market' in cols:
+        return
+    legacy = ['artist_id', 'artist_name', 'genre', 'track_id', 'track_name', 'popularity',
+              'preview_url', 'duration_ms', 'collected_at']
+    cur.execute('ALTER TABLE tracks RENAME TO tracks_legacy')
+    cur.execute('''
+    CREATE TABLE tracks (
+        artist_id TEXT,
+        artist_name TEXT,
+        genre TEXT,
+        market TEXT,
+        track_id TEXT,
+        track_name TEXT,
+        popularity INTEGER,
+        preview_url TEXT,
+        duration_ms INTEGER,
+        collected_at TEXT,
+        PRIMARY KEY (artist_id, track_id, market)
+    )
+    ''')
+    cur.execute(f'''
+        INSERT INTO tracks ({', '.join(legacy)}, market)
+        SELECT {', '.join(legacy)}, ? FROM tracks_legacy
+    ''', (DEFAULT_MARKET,))
+    cur.execute('DROP TABLE tracks_legacy')
+
+
+def _write_artist_tracks(cur, artista: Dict, tracks: List[Dict], genero: str, market: str, collected_at: str):
     artist_id = str(artista.get('id') or '')
     artist_name = artista.get('name') or ''
     rows = []
     for t in tracks:
-        rows.append((artist_id, artist_name, genero, t.get('id'), t.get('name'), t.get(
+        rows.append((artist_id, artist_name, genero, market, t.get('id'), t.get('name'), t.get(
             'popularity'), t.get('preview_url'), t.get('duration_ms'), collected_at))
     cur.executemany('''
-        INSERT OR REPLACE INTO tracks (artist_id, artist_name, genre, track_id, track_name, popularity, preview_url, duration_ms, collected_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT OR REPLACE INTO tracks (artist_id, artist_name, genre, market, track_id, track_name, popularity, preview_url, duration_ms, collected_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', rows)
+    # artistas completos (busca por genero ou hidratados via /v1/artists) ganham linha propria
+    if artist_id and 'popularity' in artista:
+        cur.execute('''
+            INSERT OR REPLACE INTO artists (artist_id, artist_name, popularity, followers, genres, collected_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (artist_id, artist_name, artista.get('popularity'), (artista.get('followers') or {}).get('total'),
+              json.dumps(artista.get('genres') or [], ensure_ascii=False), collected_at))
+    return len(rows)
+
+
+def insert_artist_tracks(db_path: str, artista: Dict, tracks: List[Dict], genero: str,
+                         market: str = DEFAULT_MARKET):
+    init_db(db_path)
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    collected_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    _write_artist_tracks(cur, artista, tracks, genero, market, collected_at)
     conn.commit()
     conn.close()
+
+
+def insert_many_artist_tracks(db_path: str, items: List[tuple]) -> int:
+    """Grava varios (artista, tracks, genero, market, collected_at) numa unica transacao.
+
+    Retorna o numero de linhas de tracks gravadas.
+    """
+    init_db(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.cursor()
+        total = 0
+        for artista, tracks, genero, market, collected_at in items:
+            total += _write_artist_tracks(cur, artista, tracks, genero, market or DEFAULT_MARKET, collected_at)
+        conn.commit()
+    finally:
+        conn.close()
+    return total
@@ -4,9 +4,9 @@ Uso: copiar `.env.template` -> `.env` com suas credenciais Spotify e rodar:
   python explore_spotify.py
 
 O script:
- - chama `coleta_spotify.coletar_por_genero` para obter raw + processados (por artista)
- - combina arquivos JSON em `data/processed/` em um único Parquet com timestamp
- - gera `data/processed/manifest_{ts}.json` com contagens
+ - chama `coleta_spotify.coletar_por_genero` com o sink Parquet (SPOTIFY_PROCESSED_FORMAT=parquet):
+   os processados ja saem em `data/processed/<genero>/market=XX/YYYY/MM/DD/part_*.parquet`
+ - gera `data/processed/manifest_{genero}_{ts}.json` com contagens lidas dos footers
 """
 import glob
 import json
@@ -14,7 +14,7 @@ import logging
 import os
 from datetime import datetime
 
-import pandas as pd
+import pyarrow.parquet as pq
 
 import coleta_spotify as cs
 
@@ -23,43 +23,31 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 
-def combinar_processados(genero: str) -> str:
-    files = glob.glob(os.path.join(cs.PROCESSED_DIR, f'*_{genero}.json'))
+def resumir_dataset(genero: str) -> str:
+    """Grava o manifest do dataset Parquet do genero a partir dos footers (sem reler as linhas)."""
+    base = os.path.join(cs.PROCESSED_DIR, genero)
+    files = sorted(glob.glob(os.path.join(base, '**', '*.parquet'), recursive=True))
+    files = [f for f in files if not os.path.basename(f).startswith('_')]
     if not files:
         logger.warning(
-            'Nenhum arquivo processado encontrado para o genero: %s', genero)
+            'Nenhum Parquet processado encontrado para o genero: %s', genero)
         return ''
 
-    rows = []
+    rows = 0
+    row_groups = 0
     for f in files:
-        try:
-            with open(f, 'r', encoding='utf-8') as fh:
-                data = json.load(fh)
-            for r in data:
-                r['_source_file'] = os.path.basename(f)
-                rows.append(r)
-        except Exception as e:
-            logger.exception('Falha ao ler %s: %s', f, e)
-
-    if not rows:
-        logger.warning('Nenhuma linha combinada para %s', genero)
-        return ''
-
-    df = pd.DataFrame(rows)
+        meta = pq.read_metadata(f)
+        rows += meta.num_rows
+        row_groups += meta.num_row_groups
     ts = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-    out_path = os.path.join(
-        cs.PROCESSED_DIR, f'top_tracks_{genero}_{ts}.parquet')
-    df.to_parquet(out_path, index=False)
-    logger.info('Parquet gerado: %s (linhas=%d)', out_path, len(df))
-    # salvar manifest
-    manifest = {'generated_at': ts, 'genre': genero, 'rows': len(
-        df), 'files': [os.path.basename(x) for x in files]}
+    manifest = {'generated_at': ts, 'genre': genero, 'dataset': base, 'rows': rows,
+                'row_groups': row_groups, 'files': [os.path.relpath(x, base) for x in files]}
     manifest_path = os.path.join(
         cs.PROCESSED_DIR, f'manifest_{genero}_{ts}.json')
     with open(manifest_path, 'w', encoding='utf-8') as mf:
         json.dump(manifest, mf, ensure_ascii=False, indent=2)
-    logger.info('Manifest salvo: %s', manifest_path)
-    return out_path
+    logger.info('Manifest salvo: %s (linhas=%d, arquivos=%d)', manifest_path, rows, len(files))
+    return base
 
 
 def main():
@@ -67,17 +55,17 @@ def main():
     qtd = int(os.getenv('SPOTIFY_QTD_ARTISTAS', '10'))
     logger.info('Iniciando snapshot: genero=%s qtd_artistas=%d', genero, qtd)
 
-    # coleta (salva raw + processed por artista)
+    # coleta (salva raw + processados direto em Parquet, particionado por market/dia)
+    cs.PROCESSED_FORMAT = 'parquet'
     try:
         cs.coletar_por_genero(genero, qtd, market='BR')
     except Exception as e:
         logger.exception('Coleta falhou: %s', e)
         return
 
-    # combina processados em parquet
-    out = combinar_processados(genero)
+    out = resumir_dataset(genero)
     if out:
-        logger.info('Snapshot completo. Parquet: %s', out)
+        logger.info('Snapshot completo. Dataset Parquet: %s (pandas.read_parquet)', out)
     else:
         logger.warning('Snapshot finalizado sem parquet gerado.')
 
@@ -0,0 +1,342 @@
+"""Stand-in local da API do Spotify para benchmarks e testes offline.
+
+Serve token, busca (artistas por genero e playlists), tracks de playlist, top-tracks,
+multi-artista e genre seeds a partir de um catalogo sintetico deterministico, com
+latencia configuravel e injecao de 429/5xx.
+
+Uso:
+  python fake_spotify_api.py --port 8765 --artists 2000 --genres 11 --latency-ms 40
+  SPOTIFY_API_BASE_URL=http://127.0.0.1:8765 SPOTIFY_AUTH_BASE_URL=http://127.0.0.1:8765 \\
+    SPOTIFY_CLIENT_ID=x SPOTIFY_CLIENT_SECRET=y python coleta_spotify.py --no-interactive -g genre000
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+LATENCY_DISTS = ('fixed', 'uniform', 'lognormal')
+
+
+class FakeCatalog:
+    """Catalogo sintetico: `artists` artistas distribuidos em `genres` generos.
+
+    Cada artista pertence a um genero principal (i % genres); uma fracao `shared` tambem
+    aparece no genero seguinte, para exercitar artistas repetidos entre generos.
+    """
+
+    def __init__(self, artists: int = 1000, genres: int = 11, tracks_per_artist: int = 10,
+                 playlists_per_genre: int = 5, playlist_size: int = 250, shared: float = 0.1,
+                 seed: int = 42):
+        self.genres = [f'genre{g:03d}' for g in range(genres)]
+        self.tracks_per_artist = tracks_per_artist
+        self.playlist_size = playlist_size
+        rng = random.Random(seed)
+        self.artists = {}
+        self.by_genre = {g: [] for g in self.genres}
+        for i in range(artists):
+            aid = f'art{i:06d}'
+            genre = self.genres[i % genres]
+            member_of = [genre]
+            if genres > 1 and rng.random() < shared:
+                member_of.append(self.genres[(i + 1) % genres])
+            self.artists[aid] = {
+                'id': aid, 'name': f'Artist {i}', 'type': 'artist', 'uri': f'spotify:artist:{aid}',
+                'popularity': rng.randint(0, 100), 'followers': {'href': None, 'total': rng.randint(0, 10 ** 6)},
+                'genres': member_of,
+            }
+            for g in member_of:
+                self.by_genre[g].append(aid)
+        # playlists: amostras (com repeticao) dos artistas do genero
+        self.playlists = {}
+        for g in self.genres:
+            pool = self.by_genre[g] or list(self.artists)[:1]
+            for k in range(playlists_per_genre):
+                pid = f'pl-{g}-{k}'
+                self.playlists[pid] = {'id': pid, 'name': f'Top {g} #{k}', 'genre': g,
+                                       'artists': [rng.choice(pool) for _ in range(playlist_size)]}
+
+    def simplified(self, aid: str) -> dict:
+        a = self.artists[aid]
+        return {'id': a['id'], 'name': a['name'], 'type': 'artist', 'uri': a['uri']}
+
+    def top_tracks(self, aid: str, market: str) -> List[dict]:
+        a = self.artists[aid]
+        rng = random.Random(f'{aid}:{market}')
+        return [{
+            'id': f'{aid}-t{n:02d}', 'name': f'{a["name"]} song {n}', 'popularity': rng.randint(0, 100),
+            'preview_url': None, 'duration_ms': rng.randint(90000, 360000),
+            'artists': [self.simplified(aid)],
+            'album': {'id': f'{aid}-al', 'name': f'{a["name"]} album', 'images': []},
+        } for n in range(self.tracks_per_artist)]
+
+
+class FakeSpotifyServer:
+    """Servidor HTTP local (thread) servindo um FakeCatalog.
+
+    latency_ms/latency_dist controlam o atraso por requisicao; error_rate e rate_limit_rate
+    sao probabilidades de responder 5xx ou 429 (com Retry-After = retry_after segundos).
+    Tokens carregam o client id que os pediu: `client_stats` conta as chamadas por client e
+    os clients em `throttled_clients` recebem sempre 429. Top tracks dos artistas em
+    `failing_artists` respondem sempre 503.
+    """
+
+    def __init__(self, catalog: Optional[FakeCatalog] = None, host: str = '127.0.0.1', port: int = 0,
+                 latency_ms: float = 0.0, latency_dist: str = 'fixed', latency_jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: int = 1,
+                 etags: bool = True, throttled_clients=(), failing_artists=(), seed: int = 7):
+        if latency_dist not in LATENCY_DISTS:
+            raise ValueError(f'latency_dist deve ser um de {LATENCY_DISTS}')
+        self.catalog = catalog or FakeCatalog()
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.etags = etags
+        self.throttled_clients = set(throttled_clients)
+        self.failing_artists = set(failing_artists)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.client_stats = {}
+        self._tokens = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeSpotifyServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def _client_for(self, authorization: Optional[str]) -> str:
+        """Client id do header Authorization (Basic no token, Bearer nas demais chamadas)."""
+        kind, _, value = (authorization or '').partition(' ')
+        if kind == 'Basic':
+            try:
+                return base64.b64decode(value).decode('utf-8').split(':', 1)[0]
+            except (ValueError, UnicodeDecodeError):
+                return ''
+        with self._lock:
+            return self._tokens.get(value, '')
+
+    def _delay(self) -> float:
+        with self._lock:
+            rng_value = self._rng.random()
+            gauss = self._rng.gauss(0, 1)
+        base = self.latency_ms
+        if self.latency_dist == 'uniform':
+            ms = base + (rng_value * 2 - 1) * self.latency_jitter_ms
+        elif self.latency_dist == 'lognormal':
+            # mediana = latency_ms, cauda longa controlada pelo jitter (sigma ~ jitter/base)
+            sigma = (self.latency_jitter_ms / base) if base else 0.0
+            ms = base * math.exp(sigma * gauss)
+        else:
+            ms = base
+        return max(0.0, ms) / 1000.0
+
+    def _fault(self) -> Optional[int]:
+        with self._lock:
+            r = self._rng.random()
+        if r < self.rate_limit_rate:
+            return 429
+        if r < self.rate_limit_rate + self.error_rate:
+            return 503
+        return None
+
+    # --- roteamento ----------------------------------------------------------------
+    def route(self, method: str, path: str, qs: dict, client: str = ''):
+        """Retorna (endpoint, status, payload)."""
+        cat = self.catalog
+        if method == 'POST' and path == '/api/token':
+            with self._lock:
+                token = f'fake-{client}-{len(self._tokens)}'
+                self._tokens[token] = client
+            return 'token', 200, {'access_token': token, 'token_type': 'Bearer', 'expires_in': 3600}
+        if method != 'GET':
+            return 'other', 405, {'error': {'status': 405, 'message': 'Method not allowed'}}
+        if path == '/v1/recommendations/available-genre-seeds':
+            return 'genre-seeds', 200, {'genres': cat.genres}
+        if path == '/v1/search':
+            return 'search', 200, self._search(qs)
+        parts = path.strip('/').split('/')
+        if len(parts) == 4 and parts[:2] == ['v1', 'artists'] and parts[3] == 'top-tracks':
+            if parts[2] not in cat.artists:
+                return 'top-tracks', 404, {'error': {'status': 404, 'message': 'Not found'}}
+            if parts[2] in self.failing_artists:
+                return 'top-tracks', 503, {'error': {'status': 503, 'message': 'Service unavailable'}}
+            return 'top-tracks', 200, {'tracks': cat.top_tracks(parts[2], qs.get('market', ['BR'])[0])}
+        if path == '/v1/artists':
+            ids = qs.get('ids', [''])[0].split(',')
+            if len(ids) > 50:
+                return 'artists', 400, {'error': {'status': 400, 'message': 'Too many ids requested'}}
+            return 'artists', 200, {'artists': [cat.artists.get(i) for i in ids]}
+        if len(parts) == 4 and parts[:2] == ['v1', 'playlists'] and parts[3] == 'tracks':
+            return 'playlist-tracks', *self._playlist_tracks(parts[2], qs)
+        return 'other', 404, {'error': {'status': 404, 'message': 'Not found'}}
+
+    def _search(self, qs: dict) -> dict:
+        q = qs.get('q', [''])[0]
+        kind = qs.get('type', ['artist'])[0]
+        limit = min(50, int(qs.get('limit', ['20'])[0]))
+        offset = int(qs.get('offset', ['0'])[0])
+        cat = self.catalog
+        if kind == 'playlist':
+            keyword = q.replace('+', ' ').strip().lower()
+            items = [{'id': p['id'], 'name': p['name']} for p in cat.playlists.values()
+                     if p['genre'] == keyword]
+            return {'playlists': {'items': items[offset:offset + limit], 'total': len(items)}}
+        genre = q[len('genre:'):].strip('"') if q.startswith('genre:') else q
+        ids = cat.by_genre.get(genre, [])
+        return {'artists': {'items': [cat.artists[a] for a in ids[offset:offset + limit]],
+                            'total': len(ids), 'offset': offset, 'limit': limit}}
+
+    def _playlist_tracks(self, playlist_id: str, qs: dict):
+        pl = self.catalog.playlists.get(playlist_id)
+        if pl is None:
+            return 404, {'error': {'status': 404, 'message': 'Not found'}}
+        limit = min(100, int(qs.get('limit', ['100'])[0]))
+        offset = int(qs.get('offset', ['0'])[0])
+        window = pl['artists'][offset:offset + limit]
+        projected = 'fields' in qs
+        items = []
+        for n, aid in enumerate(window):
+            track = {'artists': [self.catalog.simplified(aid)]}
+            if not projected:
+                # payload "cheio" como o da API real, para medir o ganho do `fields`
+                track.update({'id': f'{playlist_id}-{offset + n}', 'name': f'Track {offset + n}',
+                              'album': {'id': f'{aid}-al', 'name': 'Album', 'images': [
+                                  {'url': f'https://i.example/{aid}/{s}', 'height': s, 'width': s}
+                                  for s in (640, 300, 64)]},
+                              'popularity': 50, 'duration_ms': 200000})
+            items.append({'track': track} if projected else {'added_at': '2025-01-01T00:00:00Z', 'track': track})
+        nxt = None
+        if offset + limit < len(pl['artists']):
+            extra = f'&fields={qs["fields"][0]}' if projected else ''
+            nxt = f'{self.base_url}/v1/playlists/{playlist_id}/tracks?offset={offset + limit}&limit={limit}{extra}'
+        body = {'items': items, 'next': nxt}
+        if not projected:
+            body.update({'total': len(pl['artists']), 'offset': offset, 'limit': limit})
+        return 200, body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers e body num unico envio, sem Nagle: evita ~40ms de delayed ACK por resposta
+            disable_nagle_algorithm = True
+            wbufsize = -1
+
+            def _serve(self, method: str):
+                if method == 'POST':
+                    length = int(self.headers.get('Content-Length') or 0)
+                    if length:
+                        self.rfile.read(length)
+                parsed = urlparse(self.path)
+                qs = parse_qs(parsed.query)
+                delay = server._delay()
+                if delay:
+                    time.sleep(delay)
+                client = server._client_for(self.headers.get('Authorization'))
+                endpoint, status, payload = server.route(method, parsed.path, qs, client)
+                headers = {'Content-Type': 'application/json; charset=utf-8'}
+                fault = server._fault() if endpoint != 'other' else None
+                if endpoint != 'token':
+                    if client in server.throttled_clients:
+                        fault = 429
+                    with server._lock:
+                        server.client_stats[client] = server.client_stats.get(client, 0) + 1
+                if fault == 429:
+                    status, payload = 429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}}
+                    headers['Retry-After'] = str(server.retry_after)
+                elif fault:
+                    status, payload = fault, {'error': {'status': fault, 'message': 'Service unavailable'}}
+                body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+                if status == 200 and server.etags and method == 'GET':
+                    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                    headers['ETag'] = etag
+                    if self.headers.get('If-None-Match') == etag:
+                        status, body = 304, b''
+                server._count(f'{endpoint}:{status}')
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in local da API do Spotify')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--artists', type=int, default=1000, help='Tamanho do catalogo sintetico')
+    parser.add_argument('--genres', type=int, default=11)
+    parser.add_argument('--shared', type=float, default=0.1,
+                        help='Fracao de artistas que tambem aparecem no genero seguinte')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--latency-dist', choices=LATENCY_DISTS, default='fixed')
+    parser.add_argument('--latency-jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probabilidade de 503')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Probabilidade de 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--no-etags', action='store_true')
+    args = parser.parse_args()
+
+    catalog = FakeCatalog(artists=args.artists, genres=args.genres, shared=args.shared)
+    server = FakeSpotifyServer(catalog, host=args.host, port=args.port, latency_ms=args.latency_ms,
+                               latency_dist=args.latency_dist, latency_jitter_ms=args.latency_jitter_ms,
+                               error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                               retry_after=args.retry_after, etags=not args.no_etags)
+    print(f'Fake Spotify API em {server.base_url} ({len(catalog.artists)} artistas, '
+          f'{len(catalog.genres)} generos). Ctrl+C para sair.')
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -145,7 +145,7 @@ def criar_dashboard_avancado():
         # --- Coletar Estatísticas ---
         print("Coletando estatísticas do banco de dados...")
         stats = {}
-        stats['total_tracks'] = pd.read_sql_query("SELECT COUNT(*) FROM tracks", con).iloc[0,0]
+        stats['total_tracks'] = pd.read_sql_query("SELECT COUNT(DISTINCT track_id) FROM tracks", con).iloc[0,0]
         stats['total_artists'] = pd.read_sql_query("SELECT COUNT(DISTINCT artist_id) FROM tracks", con).iloc[0,0]
         stats['total_genres'] = pd.read_sql_query("SELECT COUNT(DISTINCT genre) FROM tracks", con).iloc[0,0]
         min_date_str = pd.read_sql_query("SELECT MIN(collected_at) FROM tracks", con).iloc[0,0]
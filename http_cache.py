@@ -0,0 +1,143 @@
+"""Cache em disco de respostas HTTP com revalidacao condicional (ETag / Last-Modified).
+
+Cada resposta fica em dois arquivos dentro de `cache_dir`: `<key>.meta.json` (url,
+validadores, headers) e `<key>.body` (bytes crus). O indice fica em memoria e o uso
+mais recente e refletido no mtime do body, entao a ordem LRU sobrevive entre execucoes.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class ResponseCache:
+    """Cache LRU limitado por tamanho (bytes) para respostas GET da API."""
+
+    def __init__(self, cache_dir: str, max_bytes: int, memo_size: int = 256):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memo_size = memo_size
+        self._index: Optional[OrderedDict] = None
+        self._total_bytes = 0
+        self._memo: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(method: str, url: str) -> str:
+        # market e demais parametros fazem parte da URL
+        return hashlib.sha256(f'{method.upper()} {url}'.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + '.meta.json', base + '.body'
+
+    def _load_index(self):
+        """Varre o diretorio uma vez e monta o indice ordenado por ultimo uso."""
+        if self._index is not None:
+            return
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for fn in files:
+                    if not fn.endswith('.meta.json'):
+                        continue
+                    key = fn[:-len('.meta.json')]
+                    meta_path, body_path = self._paths(key)
+                    try:
+                        with open(meta_path, 'r', encoding='utf-8') as f:
+                            meta = json.load(f)
+                        st = os.stat(body_path)
+                    except (OSError, ValueError):
+                        continue
+                    meta['size'] = st.st_size + os.path.getsize(meta_path)
+                    entries.append((st.st_mtime, key, meta))
+        entries.sort(key=lambda e: e[0])
+        self._index = OrderedDict((key, meta) for _, key, meta in entries)
+        self._total_bytes = sum(m['size'] for m in self._index.values())
+
+    def lookup(self, method: str, url: str) -> Optional[dict]:
+        """Retorna os metadados (etag, last_modified, headers) se houver entrada."""
+        key = self.key(method, url)
+        with self._lock:
+            self._load_index()
+            meta = self._index.get(key)
+            return dict(meta, key=key) if meta else None
+
+    def conditional_headers(self, meta: dict) -> dict:
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def read_body(self, key: str) -> Optional[bytes]:
+        """Le o body e marca a entrada como usada agora (LRU)."""
+        _, body_path = self._paths(key)
+        try:
+            with open(body_path, 'rb') as f:
+                body = f.read()
+            os.utime(body_path, None)
+        except OSError:
+            return None
+        with self._lock:
+            if self._index is not None and key in self._index:
+                self._index.move_to_end(key)
+        return body
+
+    def store(self, method: str, url: str, headers: dict, body: bytes,
+              etag: Optional[str], last_modified: Optional[str]):
+        key = self.key(method, url)
+        meta_path, body_path = self._paths(key)
+        meta = {'url': url, 'etag': etag, 'last_modified': last_modified,
+                'headers': headers, 'stored_at': time.time()}
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        with open(body_path + '.tmp', 'wb') as f:
+            f.write(body)
+        os.replace(body_path + '.tmp', body_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        meta['size'] = len(body) + os.path.getsize(meta_path)
+        with self._lock:
+            self._load_index()
+            old = self._index.pop(key, None)
+            if old:
+                self._total_bytes -= old['size']
+            self._index[key] = meta
+            self._total_bytes += meta['size']
+            self._memo.pop(key, None)
+            self._evict()
+
+    def _evict(self):
+        """Remove as entradas menos usadas ate caber em max_bytes (chamado com lock)."""
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, meta = self._index.popitem(last=False)
+            self._total_bytes -= meta['size']
+            self._memo.pop(key, None)
+            for p in self._paths(key):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    def get_parsed(self, key: str):
+        """JSON ja decodificado de um hit anterior (somente leitura para o chamador)."""
+        with self._lock:
+            data = self._memo.get(key)
+            if data is not None:
+                self._memo.move_to_end(key)
+            return data
+
+    def put_parsed(self, key: str, data):
+        with self._lock:
+            self._memo[key] = data
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_index()
+            return {'entries': len(self._index), 'bytes': self._total_bytes}
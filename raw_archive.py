@@ -0,0 +1,227 @@
+"""Arquivo raw append-only em segmentos NDJSON comprimidos (gzip ou zstd).
+
+Cada registro e uma linha JSON compacta com envelope:
+  {"entity": "toptracks", "id": "...", "fetched_at": "...Z", "url": "...", "status": 200, "payload": ...}
+
+Com deduplicacao (DedupeIndex), um payload igual ao ultimo gravado para a mesma chave
+(entidade, id, market) vira um registro com `payload_ref` (sha256 + caminho do segmento que
+tem o payload completo) em vez de uma nova copia.
+
+Os segmentos ficam em `<base_dir>/<genero>/YYYY/MM/DD/segment_<HHMMSS>_<pid>_<n>.ndjson.gz`
+(ou `.ndjson.zst`). Enquanto aberto, o segmento tem sufixo `.part`; na rotacao (tamanho,
+troca de dia ou close) ele e fechado, fsync'ado e renomeado, entao um `.part` que sobrar
+indica uma execucao interrompida (os registros completos continuam legiveis).
+"""
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd e opcional; sem o pacote usa gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst'}
+
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Segment:
+    def __init__(self, path: str, compression: str):
+        self.final_path = path
+        self.path = path + '.part'
+        self.compression = compression
+        self.bytes_in = 0
+        self.records = 0
+        self._raw = open(self.path, 'wb')
+        if compression == 'zstd':
+            self._stream = zstandard.ZstdCompressor(level=3).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6)
+
+    def write(self, line: bytes):
+        self._stream.write(line)
+        self.bytes_in += len(line)
+        self.records += 1
+
+    def close(self) -> str:
+        """Fecha o stream, faz fsync e publica o segmento com o nome final."""
+        self._stream.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(self.path, self.final_path)
+        _fsync_dir(os.path.dirname(self.final_path))
+        return self.final_path
+
+
+class RawArchive:
+    """Escreve registros raw em um segmento aberto por (genero, dia), rotacionando por tamanho."""
+
+    def __init__(self, base_dir: str, compression: str = 'gzip', max_segment_bytes: int = 64 * 1024 * 1024):
+        if compression not in EXTENSIONS:
+            raise ValueError(f'compression deve ser um de {sorted(EXTENSIONS)}')
+        if compression == 'zstd' and zstandard is None:
+            logger.warning('zstandard nao instalado; arquivo raw usando gzip')
+            compression = 'gzip'
+        self.base_dir = base_dir
+        self.compression = compression
+        self.max_segment_bytes = max_segment_bytes
+        self._open: dict = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _new_segment(self, genero: str, now: datetime) -> _Segment:
+        day_dir = os.path.join(self.base_dir, genero, f'{now.year}', f'{now.month:02d}', f'{now.day:02d}')
+        os.makedirs(day_dir, exist_ok=True)
+        self._seq += 1
+        name = f'segment_{now.strftime("%H%M%S")}_{os.getpid()}_{self._seq}{EXTENSIONS[self.compression]}'
+        return _Segment(os.path.join(day_dir, name), self.compression)
+
+    def append(self, genero: str, entity: str, entity_id: str, payload, url: Optional[str] = None,
+               status: Optional[int] = None, ref: Optional[dict] = None, **extra) -> str:
+        """Grava um registro e retorna o caminho (final) do segmento que o recebeu.
+
+        Com `ref`, o registro leva `payload_ref` no lugar do payload.
+        """
+        now = datetime.now(timezone.utc)
+        record = {'entity': entity, 'id': entity_id, 'fetched_at': now.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                  'url': url, 'status': status}
+        record.update(extra)
+        if ref is not None:
+            record['payload_ref'] = ref
+        else:
+            record['payload'] = payload
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        day = now.date()
+        with self._lock:
+            current = self._open.get(genero)
+            if current and (current[0] != day or current[1].bytes_in >= self.max_segment_bytes):
+                self._rotate(genero)
+                current = None
+            if current is None:
+                current = (day, self._new_segment(genero, now))
+                self._open[genero] = current
+            current[1].write(line)
+            return current[1].final_path
+
+    def _rotate(self, genero: str):
+        """Fecha o segmento aberto do genero (chamado com lock)."""
+        _, seg = self._open.pop(genero)
+        path = seg.close()
+        logger.info('Segmento raw fechado: %s (%d registros)', path, seg.records)
+
+    def close(self, genero: Optional[str] = None):
+        """Fecha (fsync + rename) os segmentos abertos, de um genero ou de todos."""
+        with self._lock:
+            for g in ([genero] if genero else list(self._open)):
+                if g in self._open:
+                    self._rotate(g)
+
+
+def canonical_bytes(obj) -> bytes:
+    """Serializacao canonica (chaves ordenadas, sem espacos) usada no hash do payload."""
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def payload_sha256(obj) -> tuple:
+    data = canonical_bytes(obj)
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+
+class DedupeIndex:
+    """Ultimo hash gravado por chave, com o caminho de quem guarda o payload completo.
+
+    Persistido como JSON em `path` (gravacao atomica em `save`).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def key(entity: str, entity_id: str, market: Optional[str] = None) -> str:
+        return f'{entity}:{entity_id}:{market or ""}'
+
+    def lookup(self, key: str, sha: str) -> Optional[dict]:
+        """Entrada anterior se o hash for o mesmo e o arquivo com o payload ainda existir."""
+        with self._lock:
+            prev = self._entries.get(key)
+        if not prev or prev.get('sha256') != sha:
+            return None
+        path = prev.get('path') or ''
+        if not (os.path.exists(path) or os.path.exists(path + '.part')):
+            return None
+        return prev
+
+    def remember(self, key: str, sha: str, path: str, fetched_at: str):
+        with self._lock:
+            self._entries[key] = {'sha256': sha, 'path': path, 'fetched_at': fetched_at}
+            self._dirty = True
+
+    def repoint(self, mapping: dict):
+        """Troca o caminho das entradas cujo arquivo foi movido (ex.: compactado em Parquet)."""
+        with self._lock:
+            for entry in self._entries.values():
+                novo = mapping.get(entry.get('path'))
+                if novo:
+                    entry['path'] = novo
+                    self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, self.path)
+
+
+def iter_records(path: str) -> Iterator[dict]:
+    """Le os registros de um segmento (.gz/.zst, inclusive `.part` de execucao interrompida)."""
+    name = path[:-len('.part')] if path.endswith('.part') else path
+    with open(path, 'rb') as raw:
+        if name.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f'zstandard necessario para ler {path}')
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+        reader = io.TextIOWrapper(stream, encoding='utf-8')
+        try:
+            for line in reader:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, json.JSONDecodeError):
+            # segmento truncado: os registros completos ja foram entregues
+            logger.warning('Segmento raw truncado: %s', path)
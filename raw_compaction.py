@@ -0,0 +1,311 @@
+"""Compactacao do arquivo raw: um Parquet por (genero, dia) no lugar de milhares de arquivos.
+
+Cada particao fechada `raw/<genero>/YYYY/MM/DD/` (segmentos NDJSON do arquivo raw ou, em
+`raw/misc/`, os JSON por resposta do formato `json`) vira:
+
+  compacted.parquet   uma linha por registro: entity, id, market, fetched_at, url, status,
+                      sha256, payload (JSON canonico), inlined_ref e source (arquivo de origem)
+  manifest.json       contagens, sha256 do Parquet e de cada arquivo de origem
+
+`payload_ref` da deduplicacao e resolvido na compactacao (o payload entra inline), entao o
+Parquet e autocontido. Depois de gravar e conferir o Parquet, os arquivos pequenos sao
+removidos e as entradas do indice de dedupe que apontavam para eles passam a apontar para o
+Parquet. Particoes do dia corrente, ou com arquivos modificados ha menos de `grace_seconds`,
+sao consideradas abertas e ficam de fora.
+
+Uso:
+  python raw_compaction.py                        # todas as particoes fechadas
+  python raw_compaction.py --genres rock --until 2024-05-31 --keep-sources
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import date, datetime, timezone
+from typing import Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from raw_archive import DedupeIndex, _fsync_dir, canonical_bytes, iter_records, payload_sha256
+
+logger = logging.getLogger(__name__)
+
+COMPACTED_NAME = 'compacted.parquet'
+MANIFEST_NAME = 'manifest.json'
+SOURCE_PATTERNS = ('segment_*.ndjson.gz', 'segment_*.ndjson.zst', 'segment_*.ndjson.gz.part',
+                   'segment_*.ndjson.zst.part', '*.json')
+
+SCHEMA = pa.schema([
+    ('entity', pa.string()), ('id', pa.string()), ('market', pa.string()), ('fetched_at', pa.string()),
+    ('url', pa.string()), ('status', pa.int32()), ('sha256', pa.string()), ('payload', pa.string()),
+    ('inlined_ref', pa.bool_()), ('source', pa.string()),
+])
+
+# nomes do formato json: <entity>_<id>[_<MARKET>]_<YYYYMMDDTHHMMSSZ>[_n][.ref].json
+_JSON_NAME = re.compile(r'^(?P<entity>[a-z]+)_(?P<id>[^_]+)(?:_(?P<market>[A-Z]{2}))?'
+                        r'_(?P<ts>\d{8}T\d{6}Z)(?:_\d+)?(?P<ref>\.ref)?\.json$')
+
+
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _registro_json(path: str) -> dict:
+    """Converte um arquivo raw do formato `json` (raw/misc) no envelope dos segmentos."""
+    with open(path, 'r', encoding='utf-8') as f:
+        obj = json.load(f)
+    m = _JSON_NAME.match(os.path.basename(path))
+    rec = {'entity': m.group('entity') if m else 'unknown', 'id': m.group('id') if m else None,
+           'fetched_at': None, 'url': None, 'status': None}
+    if m:
+        rec['fetched_at'] = datetime.strptime(m.group('ts'), '%Y%m%dT%H%M%SZ').strftime('%Y-%m-%dT%H:%M:%SZ')
+        if m.group('market'):
+            rec['market'] = m.group('market')
+    if isinstance(obj, dict) and set(obj) == {'payload_ref'}:
+        rec['payload_ref'] = obj['payload_ref']
+    else:
+        rec['payload'] = obj
+    return rec
+
+
+def iter_compacted(path: str) -> Iterator[dict]:
+    """Le um Parquet compactado devolvendo registros no mesmo envelope dos segmentos."""
+    table = pq.read_table(path)
+    for row in table.to_pylist():
+        rec = {k: row[k] for k in ('entity', 'id', 'fetched_at', 'url', 'status', 'sha256', 'source',
+                                   'inlined_ref')}
+        if row['market']:
+            rec['market'] = row['market']
+        if row['payload'] is not None:
+            rec['payload'] = json.loads(row['payload'])
+        yield rec
+
+
+def iter_source_records(path: str) -> Iterator[dict]:
+    """Registros de qualquer arquivo do arquivo raw: segmento, JSON (misc) ou Parquet compactado."""
+    if path.endswith('.parquet'):
+        yield from iter_compacted(path)
+    elif path.endswith('.json'):
+        yield _registro_json(path)
+    else:
+        yield from iter_records(path)
+
+
+class RefResolver:
+    """Busca o payload completo de um `payload_ref` (sha256 + arquivo), com cache por arquivo.
+
+    Se o arquivo de origem ja foi compactado, procura o hash no Parquet da mesma particao.
+    """
+
+    def __init__(self):
+        self._cache: dict = {}
+
+    def _carregar(self, path: str) -> dict:
+        payloads = {}
+        for rec in iter_source_records(path):
+            if 'payload' in rec:
+                payloads[rec.get('sha256') or payload_sha256(rec['payload'])[0]] = rec['payload']
+        return payloads
+
+    def _localizar(self, path: str) -> Optional[str]:
+        for candidate in (path, path + '.part', os.path.join(os.path.dirname(path), COMPACTED_NAME)):
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def resolver(self, ref: dict):
+        path = self._localizar(ref.get('path') or '')
+        if path is None:
+            return None
+        if path not in self._cache:
+            try:
+                self._cache[path] = self._carregar(path)
+            except (OSError, ValueError) as e:
+                logger.warning('Referencia raw inacessivel %s: %s', path, e)
+                self._cache[path] = {}
+        return self._cache[path].get(ref.get('sha256'))
+
+    def esquecer(self, paths):
+        for p in paths:
+            self._cache.pop(p, None)
+
+
+def listar_fontes(day_dir: str) -> List[str]:
+    """Arquivos pequenos da particao que ainda nao estao no Parquet (ver --keep-sources)."""
+    fontes = {p for pat in SOURCE_PATTERNS for p in glob.glob(os.path.join(day_dir, pat))}
+    fontes.discard(os.path.join(day_dir, MANIFEST_NAME))
+    try:
+        with open(os.path.join(day_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            ja = {(s['name'], s['bytes']) for s in json.load(f).get('sources', [])}
+    except (OSError, ValueError):
+        ja = set()
+    return sorted(p for p in fontes if (os.path.basename(p), os.path.getsize(p)) not in ja)
+
+
+def _hoje_utc() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def listar_particoes_fechadas(raw_dir: str, generos: Optional[List[str]] = None, ate: Optional[date] = None,
+                              grace_seconds: float = 3600) -> List[tuple]:
+    """(genero, dia, day_dir, fontes) das particoes anteriores a hoje (UTC) sem escrita recente."""
+    hoje = _hoje_utc()
+    agora = time.time()
+    particoes = []
+    if not os.path.isdir(raw_dir):
+        return particoes
+    for genero in sorted(os.listdir(raw_dir)):
+        if not os.path.isdir(os.path.join(raw_dir, genero)) or (generos and genero not in generos):
+            continue
+        for day_dir in sorted(glob.glob(os.path.join(raw_dir, genero, '[0-9]' * 4, '[0-9]' * 2, '[0-9]' * 2))):
+            y, m, d = day_dir.split(os.sep)[-3:]
+            dia = date(int(y), int(m), int(d))
+            if dia >= hoje or (ate and dia > ate):
+                continue
+            fontes = listar_fontes(day_dir)
+            if not fontes:
+                continue
+            if any(agora - os.path.getmtime(p) < grace_seconds for p in fontes):
+                logger.info('Particao %s ainda recebendo escrita; pulando', day_dir)
+                continue
+            particoes.append((genero, dia, day_dir, fontes))
+    return particoes
+
+
+def compactar_particao(genero: str, dia: date, day_dir: str, fontes: List[str], resolver: RefResolver,
+                       remover: bool = True) -> dict:
+    """Grava compacted.parquet + manifest.json da particao e (opcionalmente) remove as fontes."""
+    target = os.path.join(day_dir, COMPACTED_NAME)
+    manifest_path = os.path.join(day_dir, MANIFEST_NAME)
+    anterior = {}
+    entradas = list(fontes)
+    if os.path.exists(target):
+        # nova rodada sobre particao ja compactada: o Parquet antigo entra como fonte
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                anterior = json.load(f)
+        except (OSError, ValueError):
+            anterior = {}
+        entradas.insert(0, target)
+    cols = {name: [] for name in SCHEMA.names}
+    descricao = []
+    sem_payload = 0
+    for path in entradas:
+        n = 0
+        for rec in iter_source_records(path):
+            n += 1
+            payload = rec.get('payload')
+            inlined = 'payload' not in rec or bool(rec.get('inlined_ref'))
+            if 'payload' not in rec:
+                payload = resolver.resolver(rec.get('payload_ref') or {})
+                if payload is None:
+                    sem_payload += 1
+            sha = rec.get('sha256') or (rec.get('payload_ref') or {}).get('sha256')
+            if payload is not None and not sha:
+                sha = payload_sha256(payload)[0]
+            cols['entity'].append(rec.get('entity'))
+            cols['id'].append(None if rec.get('id') is None else str(rec.get('id')))
+            cols['market'].append(rec.get('market'))
+            cols['fetched_at'].append(rec.get('fetched_at'))
+            cols['url'].append(rec.get('url'))
+            cols['status'].append(rec.get('status'))
+            cols['sha256'].append(sha)
+            cols['payload'].append(None if payload is None else canonical_bytes(payload).decode('utf-8'))
+            cols['inlined_ref'].append(inlined and payload is not None)
+            cols['source'].append(rec.get('source') if path == target else os.path.basename(path))
+        if path != target:
+            descricao.append({'name': os.path.basename(path), 'bytes': os.path.getsize(path),
+                              'sha256': _sha256_file(path), 'records': n})
+    table = pa.table(cols, schema=SCHEMA)
+    table = table.take(pa.array(sorted(range(table.num_rows), key=lambda i: cols['fetched_at'][i] or '')))
+
+    tmp = target + '.tmp'
+    pq.write_table(table, tmp, compression='zstd')
+    with open(tmp, 'rb') as f:
+        os.fsync(f.fileno())
+    if pq.read_metadata(tmp).num_rows != table.num_rows:
+        os.remove(tmp)
+        raise RuntimeError(f'Parquet compactado inconsistente em {day_dir}')
+    os.replace(tmp, target)
+
+    entidades: dict = {}
+    for e in cols['entity']:
+        entidades[e] = entidades.get(e, 0) + 1
+    manifest = {
+        'genre': genero, 'day': dia.isoformat(),
+        'compacted_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'file': COMPACTED_NAME, 'rows': table.num_rows, 'bytes': os.path.getsize(target),
+        'sha256': _sha256_file(target), 'entities': entidades, 'unresolved_refs': sem_payload,
+        'sources': anterior.get('sources', []) + descricao,
+    }
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    if remover:
+        for path in fontes:
+            os.remove(path)
+    resolver.esquecer(fontes + [target])
+    _fsync_dir(day_dir)
+    manifest['source_bytes'] = sum(d['bytes'] for d in descricao)
+    logger.info('Particao %s compactada: %d arquivos (%.1f KB) -> %s (%d linhas, %.1f KB)', day_dir,
+                len(descricao), manifest['source_bytes'] / 1024, COMPACTED_NAME, table.num_rows,
+                manifest['bytes'] / 1024)
+    return manifest
+
+
+def compactar(raw_dir: str, generos: Optional[List[str]] = None, ate: Optional[date] = None,
+              remover: bool = True, grace_seconds: float = 3600) -> dict:
+    """Compacta as particoes fechadas do arquivo raw; retorna o resumo da rodada."""
+    resolver = RefResolver()
+    resumo = {'particoes': 0, 'arquivos': 0, 'linhas': 0, 'bytes_antes': 0, 'bytes_depois': 0}
+    redirecionar = {}
+    for genero, dia, day_dir, fontes in listar_particoes_fechadas(raw_dir, generos, ate, grace_seconds):
+        manifest = compactar_particao(genero, dia, day_dir, fontes, resolver, remover=remover)
+        resumo['particoes'] += 1
+        resumo['arquivos'] += len(fontes)
+        resumo['linhas'] += manifest['rows']
+        resumo['bytes_antes'] += manifest['source_bytes']
+        resumo['bytes_depois'] += manifest['bytes']
+        if remover:
+            target = os.path.join(day_dir, COMPACTED_NAME)
+            for path in fontes:
+                redirecionar[path[:-len('.part')] if path.endswith('.part') else path] = target
+    if redirecionar:
+        index = DedupeIndex(os.path.join(raw_dir, 'dedupe_index.json'))
+        index.repoint(redirecionar)
+        index.save()
+    logger.info('Compactacao: %d particoes, %d arquivos -> %d Parquet (%.1f KB -> %.1f KB)', resumo['particoes'],
+                resumo['arquivos'], resumo['particoes'], resumo['bytes_antes'] / 1024, resumo['bytes_depois'] / 1024)
+    return resumo
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    parser = argparse.ArgumentParser(description='Compacta particoes fechadas do arquivo raw em Parquet')
+    parser.add_argument('--raw-dir', default=os.path.join(os.getenv('DATA_DIR', 'data'), 'raw'))
+    parser.add_argument('--genres', help='Lista de generos separada por virgula (default: todos, inclusive misc)')
+    parser.add_argument('--until', type=lambda v: datetime.strptime(v, '%Y-%m-%d').date(),
+                        help='Ultimo dia a compactar (YYYY-MM-DD, inclusive); hoje nunca entra')
+    parser.add_argument('--grace-seconds', type=float, default=3600,
+                        help='Particoes com arquivo modificado ha menos que isso ficam de fora (default 3600)')
+    parser.add_argument('--keep-sources', action='store_true', help='Nao remove os arquivos compactados')
+    args = parser.parse_args()
+    generos = [g.strip() for g in args.genres.split(',') if g.strip()] if args.genres else None
+    resumo = compactar(args.raw_dir, generos, args.until, remover=not args.keep_sources,
+                       grace_seconds=args.grace_seconds)
+    print(f"{resumo['particoes']} particoes, {resumo['arquivos']} arquivos, {resumo['linhas']} linhas: "
+          f"{resumo['bytes_antes']} -> {resumo['bytes_depois']} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Replay offline: refaz processados e DB a partir do arquivo raw, sem chamar a API.
+
+Le os segmentos NDJSON de `raw/<genero>/YYYY/MM/DD/` (formato `SPOTIFY_RAW_FORMAT=ndjson`) e o
+`compacted.parquet` das particoes ja compactadas (`raw_compaction.py`), resolve os
+`payload_ref` da deduplicacao e roda de novo `processar_e_salvar` para cada (artista, market). Cada particao (genero, dia) vai para um processo do pool; o processo pai
+grava as linhas no DB em uma transacao por particao.
+
+Uso:
+  python replay_raw.py                                   # tudo
+  python replay_raw.py --genres rock,pop --since 2024-05-01 --until 2024-05-31 --workers 4
+
+Arquivos raw do formato `json` (`raw/misc/`) nao guardam o genero e nao entram no replay.
+"""
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+import coleta_spotify as cs
+from db_client import insert_many_artist_tracks
+from raw_compaction import COMPACTED_NAME, RefResolver, iter_source_records, listar_fontes
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+def _parse_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'data invalida (use YYYY-MM-DD): {value}')
+
+
+def listar_particoes(raw_dir: str, generos: Optional[List[str]] = None, desde: Optional[date] = None,
+                     ate: Optional[date] = None) -> List[tuple]:
+    """Lista (genero, dia, [segmentos]) do arquivo raw, filtrando por genero e intervalo de datas."""
+    particoes = []
+    if not os.path.isdir(raw_dir):
+        return particoes
+    for genero in sorted(os.listdir(raw_dir)):
+        if genero == 'misc' or not os.path.isdir(os.path.join(raw_dir, genero)):
+            continue
+        if generos and genero not in generos:
+            continue
+        for day_dir in sorted(glob.glob(os.path.join(raw_dir, genero, '[0-9]' * 4, '[0-9]' * 2, '[0-9]' * 2))):
+            y, m, d = day_dir.split(os.sep)[-3:]
+            dia = date(int(y), int(m), int(d))
+            if (desde and dia < desde) or (ate and dia > ate):
+                continue
+            # Parquet compactado primeiro, depois os segmentos que ainda nao entraram nele
+            compactado = os.path.join(day_dir, COMPACTED_NAME)
+            segmentos = ([compactado] if os.path.exists(compactado) else []) + \
+                [p for p in listar_fontes(day_dir) if not p.endswith('.json')]
+            if segmentos:
+                particoes.append((genero, dia, segmentos))
+    return particoes
+
+
+def _fetched_at(rec: dict) -> datetime:
+    try:
+        return datetime.strptime(rec['fetched_at'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    except (KeyError, ValueError):
+        return datetime.now(timezone.utc)
+
+
+def _replay_particao(args: tuple) -> dict:
+    """Processa uma particao (roda no pool). Retorna contagens e os itens para o DB."""
+    data_dir, genero, dia, segmentos = args
+    cs.DATA_DIR = data_dir
+    cs.RAW_DIR = os.path.join(data_dir, 'raw')
+    cs.PROCESSED_DIR = os.path.join(data_dir, 'processed')
+    started = time.perf_counter()
+    resolver = RefResolver()
+    artistas: dict = {}
+    top_tracks: dict = {}
+    registros = 0
+    sem_payload = 0
+    for seg in segmentos:
+        for rec in iter_source_records(seg):
+            registros += 1
+            payload = rec['payload'] if 'payload' in rec else resolver.resolver(rec.get('payload_ref') or {})
+            if payload is None:
+                sem_payload += 1
+                continue
+            if rec.get('entity') == 'artist':
+                artistas[str(rec.get('id'))] = payload
+            elif rec.get('entity') == 'toptracks':
+                # a ultima resposta do dia para (artista, market) prevalece, como no DB
+                top_tracks[(str(rec.get('id')), rec.get('market'))] = (payload, rec)
+    if cs.PROCESSED_FORMAT == 'parquet':
+        # o Parquet do dia e refeito inteiro (no modo json cada artista sobrescreve o proprio arquivo)
+        for path in glob.glob(os.path.join(cs.PROCESSED_DIR, genero, '**', dia.strftime('%Y/%m/%d'), '*.parquet'),
+                              recursive=True):
+            os.remove(path)
+    itens = []
+    linhas = 0
+    for (artist_id, market), (tracks, rec) in top_tracks.items():
+        artista = artistas.get(artist_id) or {'id': artist_id}
+        cs.processar_e_salvar(artista, tracks, genero, market=market, coletado_em=_fetched_at(rec), lote_db=itens)
+        linhas += len(itens[-1][1])
+    cs.fechar_processed_sink(genero)
+    if sem_payload:
+        logger.warning('%s %s: %d registros com payload_ref sem alvo foram ignorados', genero, dia, sem_payload)
+    return {'genero': genero, 'dia': dia.isoformat(), 'registros': registros, 'artistas': len(top_tracks),
+            'linhas': linhas, 'sem_payload': sem_payload, 'itens': itens,
+            'seconds': time.perf_counter() - started}
+
+
+def replay(generos: Optional[List[str]] = None, desde: Optional[date] = None, ate: Optional[date] = None,
+           workers: int = 1, gravar_db: bool = True) -> dict:
+    """Refaz processados (e DB) das particoes selecionadas; retorna o resumo com linhas/s."""
+    particoes = listar_particoes(cs.RAW_DIR, generos, desde, ate)
+    if not particoes:
+        logger.warning('Nenhuma particao raw encontrada em %s para os filtros informados', cs.RAW_DIR)
+    db_path = os.path.join(cs.DATA_DIR, 'spotify.db')
+    tarefas = [(cs.DATA_DIR, g, dia, segs) for g, dia, segs in particoes]
+    resumo = {'particoes': 0, 'registros': 0, 'artistas': 0, 'linhas': 0, 'sem_payload': 0}
+    started = time.perf_counter()
+
+    def _consumir(resultados):
+        for r in resultados:
+            if gravar_db and r['itens']:
+                insert_many_artist_tracks(db_path, r['itens'])
+            for k in ('registros', 'artistas', 'linhas', 'sem_payload'):
+                resumo[k] += r[k]
+            resumo['particoes'] += 1
+            rate = r['linhas'] / r['seconds'] if r['seconds'] else 0.0
+            logger.info('Replay %s %s: %d registros, %d artistas, %d linhas (%.0f linhas/s)',
+                        r['genero'], r['dia'], r['registros'], r['artistas'], r['linhas'], rate)
+
+    if workers > 1 and len(tarefas) > 1:
+        # spawn: cada processo importa o coletor do zero, sem herdar threads/sessoes do pai
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(tarefas)), mp_context=ctx) as pool:
+            _consumir(pool.map(_replay_particao, tarefas))
+    else:
+        _consumir(map(_replay_particao, tarefas))
+    elapsed = time.perf_counter() - started
+    resumo['seconds'] = round(elapsed, 3)
+    resumo['linhas_por_segundo'] = round(resumo['linhas'] / elapsed, 1) if elapsed else 0.0
+    logger.info('Replay concluido: %d particoes, %d linhas em %.2fs (%.0f linhas/s)',
+                resumo['particoes'], resumo['linhas'], elapsed, resumo['linhas_por_segundo'])
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refaz processados e DB a partir do arquivo raw (sem rede)')
+    parser.add_argument('--genres', help='Lista de generos separada por virgula (default: todos)')
+    parser.add_argument('--since', type=_parse_date, help='Primeiro dia (YYYY-MM-DD, inclusive)')
+    parser.add_argument('--until', type=_parse_date, help='Ultimo dia (YYYY-MM-DD, inclusive)')
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1,
+                        help='Processos para as particoes (default: numero de CPUs)')
+    parser.add_argument('--no-db', action='store_true', help='So refaz os arquivos processados')
+    args = parser.parse_args()
+
+    generos = [g.strip() for g in args.genres.split(',') if g.strip()] if args.genres else None
+    resumo = replay(generos, args.since, args.until, workers=args.workers, gravar_db=not args.no_db)
+    print(f"{resumo['particoes']} particoes, {resumo['registros']} registros, {resumo['linhas']} linhas "
+          f"em {resumo['seconds']}s ({resumo['linhas_por_segundo']} linhas/s)")
+
+
+if __name__ == '__main__':
+    main()
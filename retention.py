@@ -0,0 +1,334 @@
+"""Retencao do DATA_DIR: remove arquivos antigos por camada ate caber na politica.
+
+Camadas (`TIERS`) e o que cada uma cobre:
+  raw          raw/<genero>/YYYY/MM/DD/* (segmentos, Parquet compactado, JSON do formato json)
+  processed    processed/**: processados (JSON por artista ou Parquet do sink) e rankings top_tracks_*;
+               `_part_*.parquet` sem footer (processo morto com o sink aberto) sai apos a carencia
+  metrics      metrics_*.json na raiz do DATA_DIR
+  checkpoints  checkpoints/checkpoint_*.json.bak (backups do --force) e checkpoint_<genero>.json de
+               generos que sairam da rotacao; o checkpoint de um genero em rotacao e o progresso
+               dele e nunca e removido (nem a propria rotacao)
+
+Cada politica tem `days` (idade maxima), `gb` (teto de tamanho da camada) e `keep_last`
+(nunca remover o snapshot mais recente de cada artista/serie). A remocao e sempre do mais
+antigo para o mais novo: primeiro o que passou da idade, depois o necessario para caber no
+teto. No raw, `keep_last` protege os arquivos apontados pelo indice de dedupe, que guardam o
+ultimo payload de cada (entidade, id, market) e sao alvo das referencias novas; alem disso um
+arquivo raw nunca sai enquanto algum `payload_ref` de um arquivo que fica apontar para ele.
+
+Politicas vem de `SPOTIFY_RETENTION_<CAMADA>` no formato `days=30,gb=5,keep_last=1`
+(chaves omitidas usam o default; `0` desliga o limite).
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from raw_compaction import COMPACTED_NAME, iter_source_records
+
+logger = logging.getLogger(__name__)
+
+TIERS = ('raw', 'processed', 'metrics', 'checkpoints')
+DEFAULT_POLICIES = {
+    'raw': 'days=30,gb=5,keep_last=1',
+    'processed': 'days=30,gb=2,keep_last=1',
+    'metrics': 'days=14,gb=0.1,keep_last=1',
+    'checkpoints': 'days=30,gb=0,keep_last=0',
+}
+# arquivos .part mais novos que isso podem ser de uma coleta em andamento
+OPEN_GRACE_SECONDS = 3600
+
+_DATE_DIRS = re.compile(r'(^|/)(\d{4})/(\d{2})/(\d{2})(?=/)')
+_TIMESTAMP = re.compile(r'_(\d{8}T\d{6}Z)')
+# part_<HHMMSS>_<pid>_<n>.parquet do sink de processados
+_PART_SUFFIX = re.compile(r'^(part)_\d{6}_\d+_\d+')
+ROTATION_NAME = 'genre_rotation.json'
+
+
+class RetentionPolicy:
+    """Limites de uma camada: idade em dias, teto em bytes e se o ultimo snapshot e preservado."""
+
+    def __init__(self, days: float = 0, max_bytes: int = 0, keep_last: bool = False):
+        self.days = days
+        self.max_bytes = max_bytes
+        self.keep_last = keep_last
+
+    @classmethod
+    def parse(cls, spec: str, default: Optional['RetentionPolicy'] = None) -> 'RetentionPolicy':
+        base = default or cls()
+        days, max_bytes, keep_last = base.days, base.max_bytes, base.keep_last
+        for part in (spec or '').split(','):
+            if not part.strip():
+                continue
+            key, _, value = part.partition('=')
+            key = key.strip()
+            if key == 'days':
+                days = float(value)
+            elif key == 'gb':
+                max_bytes = int(float(value) * 1024 ** 3)
+            elif key == 'keep_last':
+                keep_last = value.strip() not in ('0', 'false', 'no', '')
+            else:
+                raise ValueError(f'chave de retencao desconhecida: {key}')
+        return cls(days, max_bytes, keep_last)
+
+    def __repr__(self):
+        return f'RetentionPolicy(days={self.days}, max_bytes={self.max_bytes}, keep_last={self.keep_last})'
+
+
+def policies_from_env() -> Dict[str, RetentionPolicy]:
+    return {tier: RetentionPolicy.parse(os.getenv(f'SPOTIFY_RETENTION_{tier.upper()}', ''),
+                                        RetentionPolicy.parse(DEFAULT_POLICIES[tier]))
+            for tier in TIERS}
+
+
+def _quando(rel_path: str, full_path: str) -> float:
+    """Momento do arquivo: data da particao no caminho, timestamp no nome ou mtime."""
+    m = _TIMESTAMP.search(os.path.basename(rel_path))
+    if m:
+        return datetime.strptime(m.group(1), '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc).timestamp()
+    m = _DATE_DIRS.search(rel_path.replace(os.sep, '/'))
+    if m:
+        # fim do dia da particao: um arquivo de hoje nunca parece mais velho do que e
+        dia = datetime(int(m.group(2)), int(m.group(3)), int(m.group(4)), tzinfo=timezone.utc)
+        return dia.timestamp() + 86399
+    return os.path.getmtime(full_path)
+
+
+def _serie(rel_path: str) -> str:
+    """Chave do 'mesmo snapshot' ao longo do tempo: caminho sem a data nem o timestamp."""
+    rel = _DATE_DIRS.sub(r'\1', rel_path.replace(os.sep, '/'))
+    head, _, name = rel.rpartition('/')
+    name = _PART_SUFFIX.sub(r'\1', _TIMESTAMP.sub('', name))
+    return f'{head}/{name}'
+
+
+def _listar(base: str, filtro=None) -> List[dict]:
+    arquivos = []
+    if not os.path.isdir(base):
+        return arquivos
+    for root, _, files in os.walk(base):
+        for fn in files:
+            full = os.path.join(root, fn)
+            rel = os.path.relpath(full, base)
+            if filtro and not filtro(rel, fn):
+                continue
+            try:
+                size = os.path.getsize(full)
+                when = _quando(rel, full)
+            except OSError:
+                continue
+            arquivos.append({'path': full, 'rel': rel, 'size': size, 'when': when})
+    return arquivos
+
+
+def _candidatos(tier: str, data_dir: str) -> List[dict]:
+    agora = time.time()
+    if tier == 'raw':
+        def _raw(rel, fn):
+            if os.sep not in rel or fn.endswith('.tmp') or fn == 'manifest.json':
+                return False  # dedupe_index.json e afins ficam na raiz do raw
+            if fn.endswith('.part') and agora - os.path.getmtime(os.path.join(data_dir, 'raw', rel)) < OPEN_GRACE_SECONDS:
+                return False
+            return True
+        return _listar(os.path.join(data_dir, 'raw'), _raw)
+    if tier == 'processed':
+        # `_part_*.parquet` e um Parquet ainda aberto pelo sink; passada a carencia e sobra de
+        # um processo que morreu antes do footer (ilegivel, os pares nao entraram no checkpoint)
+        def _processed(rel, fn):
+            if fn.endswith('.tmp'):
+                return False
+            return not fn.startswith('_') or \
+                agora - os.path.getmtime(os.path.join(data_dir, 'processed', rel)) >= OPEN_GRACE_SECONDS
+        return _listar(os.path.join(data_dir, 'processed'), _processed)
+    if tier == 'metrics':
+        return [a for a in _listar(data_dir, lambda rel, fn: os.sep not in rel and fn.startswith('metrics_')
+                                   and fn.endswith('.json'))]
+    if tier == 'checkpoints':
+        em_rotacao = _generos_em_rotacao(data_dir)
+
+        def _checkpoint(rel, fn):
+            if not fn.startswith('checkpoint_'):
+                return False
+            if fn.endswith('.bak'):
+                return True
+            # sem rotacao legivel nao da para saber quais generos ainda estao ativos
+            return fn.endswith('.json') and em_rotacao is not None and \
+                fn[len('checkpoint_'):-len('.json')] not in em_rotacao
+        return _listar(os.path.join(data_dir, 'checkpoints'), _checkpoint)
+    raise ValueError(f'camada desconhecida: {tier}')
+
+
+def _generos_em_rotacao(data_dir: str) -> Optional[set]:
+    """Generos de `checkpoints/genre_rotation.json`, ou None se a rotacao nao existir/for ilegivel."""
+    try:
+        with open(os.path.join(data_dir, 'checkpoints', ROTATION_NAME), 'r', encoding='utf-8') as f:
+            return set(json.load(f).get('genres') or [])
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _protegidos(tier: str, data_dir: str, arquivos: List[dict]) -> set:
+    """Arquivos que guardam o ultimo snapshot de cada serie (politica keep_last)."""
+    if tier == 'raw':
+        index_path = os.path.join(data_dir, 'raw', 'dedupe_index.json')
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        alvos = {os.path.abspath(e.get('path') or '') for e in entries.values()}
+        return {a['path'] for a in arquivos
+                if os.path.abspath(a['path']) in alvos
+                or os.path.abspath(a['path'][:-len('.part')]) in alvos}
+    ultimo: dict = {}
+    for a in arquivos:
+        if os.path.basename(a['rel']).startswith('_'):
+            continue  # Parquet orfao nunca e o ultimo snapshot valido
+        key = _serie(a['rel'])
+        if key not in ultimo or a['when'] >= ultimo[key]['when']:
+            ultimo[key] = a
+    return {a['path'] for a in ultimo.values()}
+
+
+def _alvos_de_refs(paths: List[str]) -> set:
+    """Arquivos (absolutos) que podem guardar o payload dos `payload_ref` gravados em `paths`."""
+    alvos = set()
+    for path in paths:
+        if path.endswith('.parquet'):
+            continue  # a compactacao ja resolveu as referencias (payload inline)
+        try:
+            for rec in iter_source_records(path):
+                ref = rec.get('payload_ref') or {}
+                if ref.get('path'):
+                    # mesmo criterio do RefResolver: o segmento, o `.part` ou o Parquet da particao
+                    alvo = os.path.abspath(ref['path'])
+                    alvos.update((alvo, alvo + '.part', os.path.join(os.path.dirname(alvo), COMPACTED_NAME)))
+        except (OSError, ValueError, EOFError) as e:
+            logger.warning('Retencao: falha ao ler referencias de %s: %s', path, e)
+    return alvos
+
+
+def _manter_alvos_de_refs(data_dir: str, remover: List[dict], restantes: List[dict]) -> tuple:
+    """Devolve para `restantes` os arquivos raw ainda referenciados por quem fica (ate estabilizar).
+
+    Quem fica inclui o que nem e candidato (ex.: `.part` de uma coleta em andamento).
+    """
+    por_path = {os.path.abspath(a['path']): a for a in remover}
+    novos = [a['path'] for a in _listar(os.path.join(data_dir, 'raw'),
+                                        lambda rel, fn: os.sep in rel and fn != 'manifest.json'
+                                        and not fn.endswith('.tmp'))
+             if os.path.abspath(a['path']) not in por_path]
+    while novos and por_path:
+        resgatados = [por_path.pop(alvo) for alvo in _alvos_de_refs(novos) if alvo in por_path]
+        restantes = restantes + resgatados
+        novos = [a['path'] for a in resgatados]
+    return [a for a in remover if os.path.abspath(a['path']) in por_path], restantes
+
+
+def _limpar_dirs_vazios(base: str):
+    for root, dirs, files in os.walk(base, topdown=False):
+        if root == base:
+            continue
+        restantes = os.listdir(root)
+        # manifest sem o Parquet que ele descreve tambem sai
+        if restantes == ['manifest.json']:
+            os.remove(os.path.join(root, 'manifest.json'))
+            restantes = []
+        if not restantes:
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+
+
+def aplicar_tier(tier: str, data_dir: str, policy: RetentionPolicy, dry_run: bool = False,
+                 now: Optional[float] = None) -> dict:
+    """Aplica a politica de uma camada; retorna arquivos/bytes removidos e o que sobrou."""
+    now = now or time.time()
+    arquivos = sorted(_candidatos(tier, data_dir), key=lambda a: a['when'])
+    protegidos = _protegidos(tier, data_dir, arquivos) if policy.keep_last else set()
+    total = sum(a['size'] for a in arquivos)
+    remover = []
+    restantes = []
+    cutoff = now - policy.days * 86400 if policy.days else None
+    for a in arquivos:
+        # Parquet orfao (ja passou da carencia em _candidatos) sai em qualquer particao, sem esperar `days`
+        orfao = tier == 'processed' and os.path.basename(a['path']).startswith('_')
+        if orfao or (cutoff is not None and a['when'] < cutoff and a['path'] not in protegidos):
+            remover.append(a)
+        else:
+            restantes.append(a)
+    if policy.max_bytes:
+        ocupado = total - sum(a['size'] for a in remover)
+        for a in list(restantes):  # ja em ordem do mais antigo
+            if ocupado <= policy.max_bytes:
+                break
+            if a['path'] in protegidos:
+                continue
+            remover.append(a)
+            restantes.remove(a)
+            ocupado -= a['size']
+    if tier == 'raw' and remover:
+        mantidos = len(restantes)
+        remover, restantes = _manter_alvos_de_refs(data_dir, remover, restantes)
+        if len(restantes) > mantidos:
+            logger.info('Retencao raw: %d arquivos mantidos por serem alvo de payload_ref',
+                        len(restantes) - mantidos)
+    freed = 0
+    for a in remover:
+        if not dry_run:
+            try:
+                os.remove(a['path'])
+            except OSError as e:
+                logger.warning('Retencao: falha ao remover %s: %s', a['path'], e)
+                continue
+        freed += a['size']
+    if remover and not dry_run and tier in ('raw', 'processed', 'checkpoints'):
+        _limpar_dirs_vazios(os.path.join(data_dir, tier))
+    return {'files_removed': len(remover), 'bytes_freed': freed,
+            'files_kept': len(restantes), 'bytes_kept': total - freed, 'protected': len(protegidos)}
+
+
+def aplicar(data_dir: str, policies: Optional[Dict[str, RetentionPolicy]] = None, dry_run: bool = False,
+            now: Optional[float] = None) -> dict:
+    """Aplica as politicas de todas as camadas e registra no log o que foi liberado."""
+    policies = policies or policies_from_env()
+    relatorio = {}
+    for tier in TIERS:
+        if tier not in policies:
+            continue
+        r = aplicar_tier(tier, data_dir, policies[tier], dry_run=dry_run, now=now)
+        relatorio[tier] = r
+        if r['files_removed']:
+            logger.info('Retencao %s: %d arquivos, %.1f MB liberados (%d arquivos, %.1f MB mantidos)%s', tier,
+                        r['files_removed'], r['bytes_freed'] / 1024 ** 2, r['files_kept'],
+                        r['bytes_kept'] / 1024 ** 2, ' [dry-run]' if dry_run else '')
+    return relatorio
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    parser = argparse.ArgumentParser(description='Aplica a politica de retencao ao DATA_DIR')
+    parser.add_argument('--data-dir', default=os.getenv('DATA_DIR', 'data'))
+    parser.add_argument('--dry-run', action='store_true', help='So mostra o que seria removido')
+    for tier in TIERS:
+        parser.add_argument(f'--{tier}', help=f'Politica da camada {tier} (ex: {DEFAULT_POLICIES[tier]})')
+    args = parser.parse_args()
+    policies = policies_from_env()
+    for tier in TIERS:
+        spec = getattr(args, tier)
+        if spec:
+            policies[tier] = RetentionPolicy.parse(spec, policies[tier])
+    relatorio = aplicar(args.data_dir, policies, dry_run=args.dry_run)
+    for tier, r in relatorio.items():
+        print(f"{tier}: {r['files_removed']} arquivos / {r['bytes_freed']} bytes removidos, "
+              f"{r['files_kept']} arquivos / {r['bytes_kept']} bytes mantidos")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 """Lightweight pre-commit secret scanner.
 
-Checks staged files for occurrences of SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET
-and long hex-like tokens (28-40 hex chars). Exit code 1 if finds potential secrets.
+Checks staged files for occurrences of SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET /
+SPOTIFY_CREDENTIALS and long hex-like tokens (28-40 hex chars). Exit code 1 if finds potential secrets.
 """
 import argparse
 import os
@@ -11,7 +11,7 @@ import subprocess
 import sys
 
 HEX_RE = re.compile(r"[A-Fa-f0-9]{28,40}")
-SPOT_RE = re.compile(r"SPOTIFY_CLIENT_(ID|SECRET)")
+SPOT_RE = re.compile(r"SPOTIFY_(CLIENT_(ID|SECRET)|CREDENTIALS)")
 SKIP_DIRS = ('venv', '.venv', 'data', 'tests', 'notebooks', '.git')
 SKIP_FILES = ('README.md', '.env.template', 'scripts/precommit_check.py')
 
@@ -60,11 +60,12 @@ def scan_file(path):
                 continue
             # check for literal assignment like SPOTIFY_CLIENT_ID=abcdef123...
             m = re.search(
-                r"SPOTIFY_CLIENT_(?:ID|SECRET)\s*=\s*([\"']?)([^\"'\s#]+)\1", line)
+                r"SPOTIFY_(CLIENT_(?:ID|SECRET)|CREDENTIALS)\s*=\s*([\"']?)([^\"'\s#]+)\2", line)
             if m:
-                rhs = m.group(2)
-                # if RHS looks like a token (alphanumeric, dashes, underscores, length>16), flag it
-                if re.match(r"^[A-Za-z0-9_\-]{16,}$", rhs):
+                rhs = m.group(3)
+                # if RHS looks like a token (alphanumeric, dashes, underscores, length>16), flag it;
+                # SPOTIFY_CREDENTIALS is a list of id:secret pairs
+                if re.match(r"^[A-Za-z0-9_\-]{16,}$", rhs) or (m.group(1) == 'CREDENTIALS' and ':' in rhs):
                     findings.append(
                         (path, 'SPOTIFY literal assignment', line.strip()))
     for m in HEX_RE.finditer(content):
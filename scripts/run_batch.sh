@@ -14,6 +14,12 @@ if [ -f "$DIR/.env" ]; then
   set +a
 fi
 
+# Reaproveita o token entre execucoes seguidas do cron (arquivo com lock, fora do git)
+export SPOTIFY_TOKEN_CACHE="${SPOTIFY_TOKEN_CACHE:-$DIR/data/.token_cache.json}"
+
+# Poda o DATA_DIR ao fim de cada genero (politicas SPOTIFY_RETENTION_<CAMADA>, ver retention.py)
+export SPOTIFY_RETENTION="${SPOTIFY_RETENTION:-1}"
+
 PY="$DIR/.venv/bin/python"
 SCRIPT="$DIR/coleta_spotify.py"
 ROTATION_FILE="$DIR/data/checkpoints/genre_rotation.json"
@@ -0,0 +1,41 @@
+import threading
+import time
+
+from background_writer import BackgroundWriter
+
+
+def test_jobs_run_in_order_and_close_drains():
+    feitos = []
+    writer = BackgroundWriter(maxsize=4)
+    for i in range(20):
+        writer.submit(feitos.append, i)
+    writer.close()
+    assert feitos == list(range(20))
+    st = writer.stats()
+    assert st['jobs'] == 20 and st['queue_depth'] == 0 and st['max_depth'] >= 1
+
+
+def test_full_queue_applies_backpressure():
+    liberar = threading.Event()
+    writer = BackgroundWriter(maxsize=1)
+    writer.submit(liberar.wait)          # ocupa a thread de escrita
+    writer.submit(lambda: None)          # enche a fila
+    threading.Timer(0.2, liberar.set).start()
+    started = time.perf_counter()
+    writer.submit(lambda: None)          # bloqueia ate o primeiro job terminar
+    assert time.perf_counter() - started >= 0.15
+    writer.close()
+    assert writer.stats()['blocked_seconds'] >= 0.15
+
+
+def test_errors_are_counted_and_sync_mode():
+    def boom():
+        raise OSError('disco cheio')
+
+    for maxsize in (0, 8):
+        feitos = []
+        with BackgroundWriter(maxsize=maxsize) as writer:
+            writer.submit(boom)
+            writer.submit(feitos.append, 1)
+        assert feitos == [1]
+        assert writer.stats()['errors'] == 1 and writer.stats()['jobs'] == 2
@@ -0,0 +1,39 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+import bench_coleta  # noqa: E402
+
+
+def test_build_scenarios_respects_genre_and_offset_limits():
+    scenarios = bench_coleta.build_scenarios({'modes': ['genero', 'batch'], 'artists': [10, 5000],
+                                              'genres': [1, 4], 'latency_ms': [0], 'workers': [1]})
+    keys = {bench_coleta.scenario_key(s) for s in scenarios}
+    assert keys == {'genero|artists=10|genres=1|latency=0|workers=1',
+                    'batch|artists=10|genres=4|latency=0|workers=1'}
+
+
+def test_tiny_scenario_and_compare(tmp_path, capsys):
+    result = bench_coleta.run_scenario({'mode': 'genero', 'artists': 3, 'genres': 1,
+                                        'latency_ms': 0, 'workers': 2})
+    assert result['artists_processed'] == 3
+    assert result['api_calls_per_artist'] > 0
+    assert result['bytes_written_per_artist'] > 0
+    assert result['peak_rss_mb'] > 0
+
+    baseline = tmp_path / 'baseline.json'
+    slower = dict(result, artists_per_sec=result['artists_per_sec'] * 2)
+    baseline.write_text(json.dumps({'results': [slower]}))
+    assert bench_coleta.compare([result], str(baseline), max_regression=0.2) == 1
+    assert bench_coleta.compare([result], str(baseline), max_regression=0.6) == 0
+
+
+def test_filho_que_morre_falha_o_cenario_sem_travar():
+    # workers invalido: o filho levanta TypeError antes de rodar o coletor
+    with pytest.raises(RuntimeError, match='codigo 1'):
+        bench_coleta.run_scenario({'mode': 'genero', 'artists': 3, 'genres': 1,
+                                   'latency_ms': 0, 'workers': 'x'})
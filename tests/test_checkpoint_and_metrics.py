@@ -41,3 +41,181 @@ def test_checkpoint_and_metrics(mock_auth, mock_top, mock_busca, tmp_path, monke
     res2 = cs.coletar_por_genero('rock', qtd_artistas=2, market='BR')
     # res2 should be empty because all were already processed
     assert res2 == []
+
+
+def test_parallel_workers_partial_failure_resumable(tmp_path, monkeypatch):
+    from fake_spotify_api import FakeCatalog, FakeSpotifyServer
+
+    catalog = FakeCatalog(artists=12, genres=2)
+    artistas = catalog.by_genre['genre000'][:6]
+    with FakeSpotifyServer(catalog, failing_artists={artistas[3]}) as server:
+        monkeypatch.setattr(cs, 'API_BASE_URL', server.base_url)
+        monkeypatch.setattr(cs, 'AUTH_BASE_URL', server.base_url)
+        monkeypatch.setattr(cs, 'CLIENT_ID', 'fake-id')
+        monkeypatch.setattr(cs, 'CLIENT_SECRET', 'fake-secret')
+        monkeypatch.setattr(cs, '_RATE_LIMITER', cs.RateLimiter(0))
+        monkeypatch.setattr(cs, '_CIRCUIT_BREAKERS', {})
+        monkeypatch.setattr(cs, '_decorrelated_jitter', lambda base, prev, cap=None: 0)
+        monkeypatch.setattr(cs, 'DISCOVERY_TTL_HOURS', 0)
+        cs.DATA_DIR = str(tmp_path)
+        cs.RAW_DIR = os.path.join(str(tmp_path), 'raw')
+        cs.PROCESSED_DIR = os.path.join(str(tmp_path), 'processed')
+
+        res1 = cs.coletar_por_genero('genre000', qtd_artistas=6, market='BR', workers=4)
+        assert {r['artist_id'] for r in res1} == set(artistas) - {artistas[3]}
+        # 503 em todas as tentativas: nada gravado nem marcado no checkpoint
+        assert server.stats['top-tracks:503'] == 3
+        data = cs.load_checkpoint('genre000')
+        assert artistas[3] not in data['processed_artists']
+        assert artistas[3] not in data['processed_markets']['BR']
+
+        # proxima execucao retoma somente o artista que falhou
+        server.failing_artists.clear()
+        res2 = cs.coletar_por_genero('genre000', qtd_artistas=6, market='BR', workers=4)
+        assert [r['artist_id'] for r in res2] == [artistas[3]]
+        assert len(cs.load_checkpoint('genre000')['processed_artists']) == 6
+    cs.close_http_session()
+
+
+@patch('coleta_spotify.hidratar_artistas')
+@patch('coleta_spotify.buscar_artistas_por_playlist')
+@patch('coleta_spotify.buscar_artistas_por_genero')
+@patch('coleta_spotify.buscar_top_tracks')
+@patch('coleta_spotify.autenticar_spotify')
+def test_discovery_cache_skips_search(mock_auth, mock_top, mock_busca, mock_playlist, mock_hidratar,
+                                      tmp_path, monkeypatch):
+    mock_auth.return_value = 'token'
+    mock_top.return_value = []
+    mock_busca.return_value = None  # busca por genero falhou
+    mock_playlist.return_value = [{'id': 'p1', 'name': 'P1'}]
+    mock_hidratar.side_effect = lambda artistas, token: artistas
+    cs.DATA_DIR = str(tmp_path)
+    cs.RAW_DIR = os.path.join(str(tmp_path), 'raw')
+    cs.PROCESSED_DIR = os.path.join(str(tmp_path), 'processed')
+    monkeypatch.setattr(cs, 'DISCOVERY_TTL_HOURS', 24)
+
+    cs.coletar_por_genero('sertanejo', qtd_artistas=5)
+    assert mock_busca.call_count == 1 and mock_playlist.call_count == 1
+
+    # segunda execucao: a falha nao foi cacheada (busca por genero de novo), playlist vem do cache
+    cs.coletar_por_genero('sertanejo', qtd_artistas=5)
+    assert mock_busca.call_count == 2 and mock_playlist.call_count == 1
+    assert cs.load_discovery_cache('sertanejo', 'genre', 5) is None
+    assert cs.load_discovery_cache('sertanejo', 'playlist', 3) == [{'id': 'p1', 'name': 'P1'}]
+    # limit maior que o cacheado exige nova descoberta
+    assert cs.load_discovery_cache('sertanejo', 'playlist', 10) is None
+
+    # TTL expirado -> busca de novo
+    monkeypatch.setattr(cs, 'DISCOVERY_TTL_HOURS', 0)
+    cs.coletar_por_genero('sertanejo', qtd_artistas=5)
+    assert mock_busca.call_count == 3 and mock_playlist.call_count == 2
+
+
+@patch('coleta_spotify.buscar_artistas_por_genero')
+@patch('coleta_spotify.buscar_top_tracks')
+@patch('coleta_spotify.autenticar_spotify')
+def test_top_tracks_coalesced_across_genres(mock_auth, mock_top, mock_busca, tmp_path, monkeypatch):
+    mock_auth.return_value = 'token'
+    mock_busca.side_effect = lambda genero, token, limit=10, **kwargs: [
+        {'id': 'shared', 'name': 'Shared'}, {'id': f'only_{genero}', 'name': genero}]
+    mock_top.return_value = [{'name': 't1', 'popularity': 10,
+                              'preview_url': None, 'id': 't1', 'duration_ms': 1000}]
+    cs.DATA_DIR = str(tmp_path)
+    cs.RAW_DIR = os.path.join(str(tmp_path), 'raw')
+    cs.PROCESSED_DIR = os.path.join(str(tmp_path), 'processed')
+    monkeypatch.setattr(cs, 'DISCOVERY_TTL_HOURS', 0)
+
+    with cs.execucao_coalescida() as coalescer:
+        res_pop = cs.coletar_por_genero('pop', qtd_artistas=2, workers=2)
+        res_funk = cs.coletar_por_genero('funk', qtd_artistas=2, workers=2)
+    # 'shared' buscado uma vez e atribuido aos dois generos
+    assert mock_top.call_count == 3
+    assert coalescer.saved == 1
+    assert 'shared' in {r['artist_id'] for r in res_pop}
+    assert 'shared' in {r['artist_id'] for r in res_funk}
+    assert cs._COALESCER is None
+
+
+def test_coalescer_nao_memoriza_falha(tmp_path, monkeypatch):
+    from fake_spotify_api import FakeCatalog, FakeSpotifyServer
+
+    catalog = FakeCatalog(artists=4, genres=1)
+    shared = catalog.by_genre['genre000'][0]
+    with FakeSpotifyServer(catalog, failing_artists={shared}) as server:
+        monkeypatch.setattr(cs, 'API_BASE_URL', server.base_url)
+        monkeypatch.setattr(cs, 'AUTH_BASE_URL', server.base_url)
+        monkeypatch.setattr(cs, 'CLIENT_ID', 'fake-id')
+        monkeypatch.setattr(cs, 'CLIENT_SECRET', 'fake-secret')
+        monkeypatch.setattr(cs, '_RATE_LIMITER', cs.RateLimiter(0))
+        monkeypatch.setattr(cs, '_CIRCUIT_BREAKERS', {})
+        monkeypatch.setattr(cs, '_decorrelated_jitter', lambda base, prev, cap=None: 0)
+        monkeypatch.setattr(cs, 'DISCOVERY_TTL_HOURS', 0)
+        cs.DATA_DIR = str(tmp_path)
+        cs.RAW_DIR = os.path.join(str(tmp_path), 'raw')
+        cs.PROCESSED_DIR = os.path.join(str(tmp_path), 'processed')
+
+        with cs.execucao_coalescida() as coalescer:
+            res1 = cs.coletar_por_genero('genre000', qtd_artistas=2, workers=2)
+            assert shared not in {r['artist_id'] for r in res1}
+            # outro genero com o mesmo artista na mesma execucao: busca de novo, agora com sucesso
+            server.failing_artists.clear()
+            monkeypatch.setattr(cs, 'buscar_artistas_por_genero',
+                                lambda genero, token, limit=10, **kwargs: [catalog.artists[shared]])
+            res2 = cs.coletar_por_genero('outro', qtd_artistas=1, workers=2)
+        assert [r['artist_id'] for r in res2] == [shared]
+        assert server.stats['top-tracks:503'] == 3 and server.stats['top-tracks:200'] == 2
+        assert coalescer.saved == 0
+    cs.close_http_session()
+
+
+@patch('coleta_spotify.buscar_artistas_por_genero')
+@patch('coleta_spotify.buscar_top_tracks')
+@patch('coleta_spotify.autenticar_spotify')
+def test_checkpoint_por_market(mock_auth, mock_top, mock_busca, tmp_path, monkeypatch):
+    mock_auth.return_value = 'token'
+    mock_busca.return_value = [{'id': 'a1', 'name': 'A1'}]
+    mock_top.return_value = [{'name': 't1', 'popularity': 10,
+                              'preview_url': None, 'id': 't1', 'duration_ms': 1000}]
+    cs.DATA_DIR = str(tmp_path)
+    cs.RAW_DIR = os.path.join(str(tmp_path), 'raw')
+    cs.PROCESSED_DIR = os.path.join(str(tmp_path), 'processed')
+    monkeypatch.setattr(cs, 'DISCOVERY_TTL_HOURS', 0)
+
+    # artista coletado so para PT: uma coleta de BR nao pode pula-lo
+    cs.save_checkpoint('rock', {'processed_artists': ['a1'], 'processed_markets': {'PT': ['a1']}})
+    assert [r['market'] for r in cs.coletar_por_genero('rock', qtd_artistas=1, market='BR')] == ['BR']
+    assert cs.coletar_por_genero('rock', qtd_artistas=1, market='PT') == []
+
+    # checkpoint antigo (sem processed_markets) vale apenas para o market padrao
+    cs.save_checkpoint('pop', {'processed_artists': ['a1']})
+    assert cs.coletar_por_genero('pop', qtd_artistas=1, market='BR') == []
+    assert [r['market'] for r in cs.coletar_por_genero('pop', qtd_artistas=1, market='US')] == ['US']
+    assert cs.load_checkpoint('pop')['processed_markets'] == {'BR': ['a1'], 'US': ['a1']}
+
+
+@patch('coleta_spotify.buscar_artistas_por_genero')
+@patch('coleta_spotify.buscar_top_tracks')
+@patch('coleta_spotify.autenticar_spotify')
+def test_breaker_aberto_conta_so_o_que_foi_adiado(mock_auth, mock_top, mock_busca, tmp_path, monkeypatch):
+    import time
+
+    mock_auth.return_value = 'token'
+    mock_busca.return_value = [{'id': f'a{i}', 'name': f'A{i}'} for i in range(6)]
+
+    def top_tracks(artist_id, token, market='BR'):
+        if artist_id == 'a1':
+            time.sleep(0.2)  # em andamento quando o breaker abre
+            return [{'name': 't1', 'popularity': 10, 'preview_url': None, 'id': 't1', 'duration_ms': 1000}]
+        raise cs.CircuitOpenError('Circuit breaker aberto para top-tracks')
+    mock_top.side_effect = top_tracks
+    cs.DATA_DIR = str(tmp_path)
+    cs.RAW_DIR = os.path.join(str(tmp_path), 'raw')
+    cs.PROCESSED_DIR = os.path.join(str(tmp_path), 'processed')
+    monkeypatch.setattr(cs, 'DISCOVERY_TTL_HOURS', 0)
+    before = cs._METRICS.get('pairs_deferred_circuit_open', 0)
+
+    res = cs.coletar_por_genero('pop', qtd_artistas=6, workers=2)
+    # a busca que ja estava em andamento e gravada; so as outras cinco sao adiadas
+    assert [r['artist_id'] for r in res] == ['a1']
+    assert cs._METRICS['pairs_deferred_circuit_open'] - before == 5
+    assert cs.load_checkpoint('pop')['processed_markets'] == {'BR': ['a1']}
@@ -16,7 +16,7 @@ def test_autenticar_spotify_missing_env(monkeypatch):
         cs.autenticar_spotify(None, None)
 
 
-@patch('coleta_spotify.requests.request')
+@patch('coleta_spotify.requests.Session.request')
 def test_autenticar_spotify_success(mock_request, monkeypatch):
     mock_resp = mock_request.return_value
     mock_resp.status_code = 200
@@ -30,3 +30,40 @@ def test_db_insert(tmp_path, monkeypatch):
     rows = cur.fetchall()
     conn.close()
     assert ('t1', 'Track 1') in rows
+
+
+def test_db_insert_artist_row(tmp_path):
+    from db_client import insert_artist_tracks
+
+    db_path = str(tmp_path / 'spotify.db')
+    artista = {'id': 'a2', 'name': 'Artist 2', 'popularity': 70,
+               'followers': {'total': 1234}, 'genres': ['pagode']}
+    insert_artist_tracks(db_path, artista, [], 'pagode')
+    # artista simplificado (sem popularity) nao gera linha em artists
+    insert_artist_tracks(db_path, {'id': 'a3', 'name': 'Artist 3'}, [], 'pagode')
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        'SELECT artist_id, popularity, followers, genres FROM artists').fetchall()
+    conn.close()
+    assert rows == [('a2', 70, 1234, json.dumps(['pagode']))]
+
+
+def test_db_migra_tabela_tracks_sem_market(tmp_path):
+    from db_client import insert_artist_tracks
+
+    db_path = str(tmp_path / 'spotify.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('''CREATE TABLE tracks (artist_id TEXT, artist_name TEXT, genre TEXT, track_id TEXT,
+        track_name TEXT, popularity INTEGER, preview_url TEXT, duration_ms INTEGER, collected_at TEXT,
+        PRIMARY KEY (artist_id, track_id))''')
+    conn.execute("INSERT INTO tracks VALUES ('a1', 'A', 'rock', 't1', 'T', 5, NULL, 1, '2025-01-01T00:00:00Z')")
+    conn.commit()
+    conn.close()
+
+    insert_artist_tracks(db_path, {'id': 'a1', 'name': 'A'}, [{'id': 't1', 'name': 'T', 'popularity': 9}],
+                         'rock', market='PT')
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT market, popularity FROM tracks ORDER BY market').fetchall()
+    conn.close()
+    # linha antiga vira BR; a mesma track em outro market e uma linha nova
+    assert rows == [('BR', 5), ('PT', 9)]
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+
+import pytest
+
+import coleta_spotify as cs
+from fake_spotify_api import FakeCatalog, FakeSpotifyServer
+
+
+@pytest.fixture
+def fake_api(tmp_path, monkeypatch):
+    catalog = FakeCatalog(artists=60, genres=3, playlists_per_genre=2, playlist_size=150)
+    with FakeSpotifyServer(catalog) as server:
+        monkeypatch.setattr(cs, 'API_BASE_URL', server.base_url)
+        monkeypatch.setattr(cs, 'AUTH_BASE_URL', server.base_url)
+        monkeypatch.setattr(cs, 'CLIENT_ID', 'fake-id')
+        monkeypatch.setattr(cs, 'CLIENT_SECRET', 'fake-secret')
+        monkeypatch.setattr(cs, '_RATE_LIMITER', cs.RateLimiter(0))
+        monkeypatch.setattr(cs, '_CIRCUIT_BREAKERS', {})
+        monkeypatch.setattr(cs, 'DISCOVERY_TTL_HOURS', 0)
+        cs.DATA_DIR = str(tmp_path)
+        cs.RAW_DIR = os.path.join(str(tmp_path), 'raw')
+        cs.PROCESSED_DIR = os.path.join(str(tmp_path), 'processed')
+        yield server
+    cs.close_http_session()
+
+
+def test_coleta_contra_api_local(fake_api):
+    res = cs.coletar_por_genero('genre001', qtd_artistas=15, market='BR', workers=4)
+    assert len(res) == 15
+    conn = sqlite3.connect(os.path.join(cs.DATA_DIR, 'spotify.db'))
+    n = conn.execute("SELECT COUNT(*) FROM tracks WHERE genre = 'genre001'").fetchone()[0]
+    conn.close()
+    assert n == 15 * 10
+    assert fake_api.stats['top-tracks:200'] == 15
+
+
+def test_coleta_multi_market_uma_descoberta(fake_api):
+    res = cs.coletar_por_genero('genre000', qtd_artistas=5, workers=4, markets=['BR', 'PT', 'US'])
+    assert len(res) == 15
+    # uma descoberta, uma busca de top tracks por (artista, market)
+    assert fake_api.stats['search:200'] == 1
+    assert fake_api.stats['top-tracks:200'] == 15
+    conn = sqlite3.connect(os.path.join(cs.DATA_DIR, 'spotify.db'))
+    rows = conn.execute('SELECT market, COUNT(*) FROM tracks GROUP BY market ORDER BY market').fetchall()
+    conn.close()
+    assert rows == [('BR', 50), ('PT', 50), ('US', 50)]
+    assert all(f"market={r['market']}" in r['processed_path'] for r in res)
+
+    # PT ja coletado: so MX e buscado na segunda execucao
+    res2 = cs.coletar_por_genero('genre000', qtd_artistas=5, workers=4, markets=['PT', 'MX'])
+    assert {r['market'] for r in res2} == {'MX'}
+    assert fake_api.stats['top-tracks:200'] == 20
+
+
+def test_breaker_aberto_adia_genero_sem_checkpoint(fake_api):
+    breaker = cs.CircuitBreaker('top-tracks', failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    cs._CIRCUIT_BREAKERS['top-tracks'] = breaker
+    before = cs._METRICS.get('pairs_deferred_circuit_open', 0)
+    assert cs.coletar_por_genero('genre001', qtd_artistas=6, workers=2) == []
+    assert 'top-tracks:200' not in fake_api.stats
+    assert cs._METRICS['pairs_deferred_circuit_open'] - before == 6
+    assert not cs.load_checkpoint('genre001').get('processed_markets')
+
+    # breaker fechado: a proxima execucao coleta o genero inteiro
+    breaker.record_success()
+    assert len(cs.coletar_por_genero('genre001', qtd_artistas=6, workers=2)) == 6
+
+
+def test_credential_pool_spreads_load_and_quarantines(fake_api, monkeypatch):
+    monkeypatch.setattr(cs, 'CREDENTIALS', [('cred-b', 'sb'), ('cred-bad', 'sx')])
+    monkeypatch.setattr(cs, '_CREDENTIAL_POOL', None)
+    monkeypatch.setattr(cs, '_TOKEN_MANAGERS', {})
+    monkeypatch.setattr(cs, 'RATE_LIMIT_RPS', 0)
+    monkeypatch.setattr(cs, 'CREDENTIAL_QUARANTINE_429', 2)
+    fake_api.throttled_clients = {'cred-bad'}
+    fake_api.retry_after = 0
+
+    res = cs.coletar_por_genero('genre002', qtd_artistas=12, workers=4)
+    assert len(res) == 12
+    stats = cs.credential_pool_stats()
+    assert stats['cred-bad']['quarantined'] and stats['cred-bad']['quarantines'] == 1
+    # threads concorrentes podem pegar a credencial antes da quarentena
+    assert stats['cred-bad']['rate_limited'] >= 2
+    # as duas credenciais saudaveis dividem o resto do trafego
+    assert fake_api.client_stats['fake-id'] >= 4 and fake_api.client_stats['cred-b'] >= 4
+    assert fake_api.client_stats['cred-bad'] == stats['cred-bad']['rate_limited']
+
+
+def test_playlist_strategy_and_hydration_against_fake(fake_api):
+    token = cs.autenticar_spotify('fake-id', 'fake-secret')
+    artistas = cs.buscar_artistas_por_playlist('genre002', token, artist_limit=8)
+    assert len(artistas) == 8 and 'popularity' not in artistas[0]
+    # 2 playlists x 2 paginas de 100 tracks cada
+    assert fake_api.stats['playlist-tracks:200'] == 4
+    completos = cs.hidratar_artistas(artistas, token)
+    assert all('popularity' in a for a in completos)
+    assert fake_api.stats['artists:200'] == 1
+
+
+def test_fake_server_injects_faults():
+    with FakeSpotifyServer(FakeCatalog(artists=5, genres=1), rate_limit_rate=1.0, retry_after=3) as server:
+        import requests
+        resp = requests.get(f'{server.base_url}/v1/artists/art000000/top-tracks?market=BR', timeout=5)
+        assert resp.status_code == 429
+        assert resp.headers['Retry-After'] == '3'
+
+
+def test_raw_archive_envelope_has_url_and_status(fake_api, monkeypatch):
+    import glob
+
+    from raw_archive import iter_records
+
+    monkeypatch.setattr(cs, 'RAW_FORMAT', 'ndjson')
+    cs.coletar_por_genero('genre001', qtd_artistas=4, workers=2)
+    segments = glob.glob(os.path.join(cs.RAW_DIR, 'genre001', '*', '*', '*', '*.ndjson.gz'))
+    tops = [r for seg in segments for r in iter_records(seg) if r['entity'] == 'toptracks']
+    assert len(tops) == 4
+    assert all(r['status'] == 200 and r['url'].endswith(f"/v1/artists/{r['id']}/top-tracks?market=BR")
+               for r in tops)
@@ -0,0 +1,102 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import coleta_spotify as cs
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_shared_session_reuses_connection():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _OkHandler)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    try:
+        cs.close_http_session()
+        before = cs.http_pool_stats()
+        url = f'http://127.0.0.1:{server.server_address[1]}/ping'
+        for _ in range(3):
+            resp = cs._request_with_retry('get', url)
+            assert resp.status_code == 200
+        after = cs.http_pool_stats()
+        # uma conexao nova e as demais reaproveitadas
+        assert after['misses'] - before['misses'] == 1
+        assert after['hits'] - before['hits'] == 2
+        assert cs._get_http_session() is cs._get_http_session()
+        # bytes por requisicao entram no resumo por endpoint
+        assert cs.api_latency_summary()['other']['bytes_per_request'] > 0
+    finally:
+        cs.close_http_session()
+        server.shutdown()
+        server.server_close()
+
+
+class _EtagHandler(_OkHandler):
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('ETag', '"v1"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'{"tracks": [{"id": "t1"}]}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_etag_revalidation_served_from_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, 'DATA_DIR', str(tmp_path))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _EtagHandler)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/v1/artists/x/top-tracks?market=BR'
+        first = cs._request_with_retry('get', url)
+        assert first.json() == {'tracks': [{'id': 't1'}]}
+        hits_before = cs._METRICS.get('http_cache_hits', 0)
+        second = cs._request_with_retry('get', url)
+        third = cs._request_with_retry('get', url)
+        assert second.status_code == 200
+        assert second.json() == {'tracks': [{'id': 't1'}]}
+        # segundo hit reaproveita o JSON ja decodificado
+        assert third.json() is second.json()
+        assert cs._METRICS['http_cache_hits'] - hits_before == 2
+        assert _EtagHandler.hits == 3
+        assert cs._get_response_cache().stats()['entries'] == 1
+    finally:
+        cs.close_http_session()
+        server.shutdown()
+        server.server_close()
+
+
+def test_response_cache_lru_eviction(tmp_path):
+    from http_cache import ResponseCache
+
+    cache = ResponseCache(str(tmp_path), max_bytes=700)
+    for i in range(5):
+        cache.store('get', f'http://x/{i}', {}, b'x' * 200, f'"e{i}"', None)
+    stats = cache.stats()
+    assert stats['bytes'] <= 700
+    assert cache.lookup('get', 'http://x/0') is None
+    assert cache.lookup('get', 'http://x/4')['etag'] == '"e4"'
+    # indice reconstruido a partir do disco mantem as mesmas entradas
+    assert ResponseCache(str(tmp_path), 700).stats() == stats
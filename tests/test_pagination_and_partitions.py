@@ -11,7 +11,7 @@ def make_artist(i):
     return {'id': f'id{i}', 'name': f'Artist {i}'}
 
 
-@patch('coleta_spotify.requests.request')
+@patch('coleta_spotify.requests.Session.request')
 def test_buscar_artistas_paginacao(mock_request, tmp_path):
     # simulate two pages: first returns 3 items, second 2 items
     page1 = {'artists': {'items': [make_artist(i) for i in range(3)]}}
@@ -51,3 +51,129 @@ def test_processar_e_salvar_particao(tmp_path, monkeypatch):
     # assert path contains genre partition
     assert os.path.join('processed', 'rock') in out.replace(
         '\\', '/') or 'rock' in out
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_hidratar_artistas_em_lotes(mock_request):
+    simples = [make_artist(i) for i in range(120)]
+    completo = {'id': 'full', 'name': 'Full', 'popularity': 80}
+
+    def responder(method, url, **kwargs):
+        ids = url.split('ids=', 1)[1].split(',')
+        resp = MagicMock()
+        resp.status_code = 200
+        resp.json.return_value = {'artists': [
+            dict(id=i, name=i, popularity=50, followers={'total': 7}, genres=['sertanejo']) for i in ids]}
+        return resp
+    mock_request.side_effect = responder
+
+    result = cs.hidratar_artistas(simples + [completo], token='t')
+    # 120 ids -> 3 requisicoes (50 + 50 + 20); o artista completo nao e reenviado
+    assert mock_request.call_count == 3
+    assert all('popularity' in a for a in result)
+    assert result[-1] is completo
+    assert [a['id'] for a in result[:120]] == [a['id'] for a in simples]
+
+
+def _track(*artist_ids):
+    return {'track': {'artists': [{'id': a, 'name': a} for a in artist_ids]}}
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_playlist_follows_next_and_ranks_by_frequency(mock_request):
+    pages = {
+        'search': {'playlists': {'items': [{'id': 'p1', 'name': 'Top 1'}, None, {'id': 'p2', 'name': 'Top 2'}]}},
+        'p1': {'items': [_track('x'), _track('y')], 'next': 'https://api.spotify.com/v1/playlists/p1/tracks?offset=100&limit=100'},
+        'p1-2': {'items': [_track('z', 'y'), None], 'next': None},
+        'p2': {'items': [_track('y'), _track('z')], 'next': None},
+    }
+
+    def responder(method, url, **kwargs):
+        if '/search' in url:
+            key = 'search'
+        elif 'offset=100' in url:
+            key = 'p1-2'
+        else:
+            key = url.split('/playlists/')[1].split('/')[0]
+        resp = MagicMock()
+        resp.status_code = 200
+        resp.json.return_value = pages[key]
+        return resp
+    mock_request.side_effect = responder
+
+    result = cs.buscar_artistas_por_playlist('sertanejo', token='t', artist_limit=10)
+    # y aparece 3x, z 2x, x 1x
+    assert [a['id'] for a in result] == ['y', 'z', 'x']
+    assert mock_request.call_count == 4
+    # paginas de playlist pedem so os campos usados (inclusive no `next`)
+    urls = [c.kwargs['url'] for c in mock_request.call_args_list if '/playlists/' in c.kwargs['url']]
+    assert len(urls) == 3
+    assert all('fields=items%28track%28artists%28id%2Cname%29%29%29%2Cnext' in u for u in urls)
+
+    mock_request.reset_mock()
+    result = cs.buscar_artistas_por_playlist(
+        'sertanejo', token='t', artist_limit=2, max_playlists=1, ordenar_por_frequencia=False)
+    assert [a['id'] for a in result] == ['x', 'y']
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_busca_concorrente_planeja_offsets_e_para_na_pagina_curta(mock_request):
+    import threading
+    from urllib.parse import parse_qs, urlparse
+
+    lock = threading.Lock()
+    pedidos = []
+
+    def responder(method, url, **kwargs):
+        qs = parse_qs(urlparse(url).query)
+        offset, limit = int(qs['offset'][0]), int(qs['limit'][0])
+        with lock:
+            pedidos.append((offset, limit))
+        # catalogo com 110 artistas; o id 0 tambem aparece na segunda pagina (duplicata)
+        ids = [i for i in range(offset, min(offset + limit, 110))]
+        if offset == 50:
+            ids[0] = 0
+        resp = MagicMock()
+        resp.status_code = 200
+        resp.json.return_value = {'artists': {'items': [make_artist(i) for i in ids]}}
+        return resp
+    mock_request.side_effect = responder
+
+    result = cs.buscar_artistas_por_genero('rock', token='t', limit=200, page_size=50, workers=2)
+    assert [a['id'] for a in result] == [f'id{i}' for i in range(110) if i != 50]
+    assert all(limit <= 50 for _, limit in pedidos)
+    assert {(0, 50), (50, 50), (100, 50)} <= set(pedidos)
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_busca_com_pagina_falha_retorna_none(mock_request, monkeypatch):
+    monkeypatch.setattr(cs, '_CIRCUIT_BREAKERS', {})
+    monkeypatch.setattr(cs, '_decorrelated_jitter', lambda base, prev, cap=None: 0)
+
+    def responder(method, url, **kwargs):
+        resp = MagicMock()
+        if 'offset=50' in url or '/playlists/p2/' in url:
+            resp.status_code, resp.text = 503, 'down'
+            return resp
+        resp.status_code = 200
+        if 'type=playlist' in url:
+            resp.json.return_value = {'playlists': {'items': [{'id': 'p1'}, {'id': 'p2'}]}}
+        elif '/playlists/' in url:
+            resp.json.return_value = {'items': [_track('x')], 'next': None}
+        else:
+            resp.json.return_value = {'artists': {'items': [make_artist(i) for i in range(50)]}}
+        return resp
+    mock_request.side_effect = responder
+
+    # pagina do meio falhou: lista truncada nao pode passar por resultado completo
+    assert cs.buscar_artistas_por_genero('rock', token='t', limit=100, page_size=50) is None
+    assert cs.buscar_artistas_por_genero('rock', token='t', limit=100, page_size=50, workers=2) is None
+    assert cs.buscar_artistas_por_playlist('rock', token='t') is None
+
+
+def test_planejar_janelas_respeita_offset_maximo():
+    janelas = cs._planejar_janelas(2000, 50)
+    assert janelas[0] == (0, 50)
+    assert janelas[-1] == (950, 50)
+    assert sum(n for _, n in janelas) == 1000
+    assert cs._planejar_janelas(120, 100) == [(0, 50), (50, 50), (100, 20)]
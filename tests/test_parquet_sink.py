@@ -0,0 +1,98 @@
+import glob
+import json
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import coleta_spotify as cs
+import replay_raw
+from parquet_sink import ParquetSink
+
+
+def _linha(i):
+    return {'artista': 'A', 'musica': f'm{i}', 'popularidade': i, 'preview_url': None, 'id': f't{i}',
+            'duracao_ms': 1000, 'artist_id': 'a1', 'genero': 'rock', 'coletado_em': '2024-01-01T00:00:00Z'}
+
+
+def test_sink_grava_row_groups_e_publica_no_close(tmp_path):
+    sink = ParquetSink(str(tmp_path), row_group_size=3)
+    path = sink.append('rock', 'BR', [_linha(i) for i in range(4)])
+    sink.append('rock', 'BR', [_linha(i) for i in range(4, 7)])
+    assert sink.buffered_rows() == 1
+    # aberto: so o arquivo com prefixo `_`, invisivel para quem le o dataset
+    assert not os.path.exists(path)
+    assert os.path.exists(os.path.join(os.path.dirname(path), '_' + os.path.basename(path)))
+    sink.close()
+    meta = pq.read_metadata(path)
+    assert meta.num_rows == 7
+    assert [meta.row_group(i).num_rows for i in range(meta.num_row_groups)] == [3, 3, 1]
+
+
+def test_coleta_com_sink_parquet_e_replay(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, 'PROCESSED_FORMAT', 'parquet')
+    monkeypatch.setattr(cs, 'RAW_FORMAT', 'ndjson')
+    monkeypatch.setattr(cs, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(cs, 'RAW_DIR', os.path.join(str(tmp_path), 'raw'))
+    monkeypatch.setattr(cs, 'PROCESSED_DIR', os.path.join(str(tmp_path), 'processed'))
+    monkeypatch.setattr(cs, '_descobrir_com_cache',
+                        lambda *a: [{'id': 'a1', 'name': 'A1'}, {'id': 'a2', 'name': 'A2'}])
+    monkeypatch.setattr(cs, 'autenticar_spotify', lambda *a: 'tok')
+    monkeypatch.setattr(cs, 'buscar_top_tracks', lambda aid, token, market='BR': [
+        {'id': f'{aid}-{market}', 'name': 'T', 'popularity': 10 if market == 'BR' else 20}])
+
+    cs.coletar_por_genero('rock', qtd_artistas=2, markets=['BR', 'PT'])
+    dataset = os.path.join(str(tmp_path), 'processed', 'rock')
+    assert not glob.glob(os.path.join(dataset, '**', '*.json'), recursive=True)
+    df = pd.read_parquet(dataset)
+    assert len(df) == 4
+    assert sorted(df['id']) == ['a1-BR', 'a1-PT', 'a2-BR', 'a2-PT']
+    assert set(df['market'].astype(str)) == {'BR', 'PT'} and set(df['genero']) == {'rock'}
+
+    cs._salvar_ranking_genero('rock', 'PT', True)
+    ranking = glob.glob(os.path.join(str(tmp_path), 'processed', 'top_tracks_rock_PT_*.json'))[0]
+    with open(ranking, 'r', encoding='utf-8') as f:
+        assert [r['popularidade'] for r in json.load(f)] == [20, 20]
+
+    # replay refaz os Parquet do dia sem duplicar linhas
+    replay_raw.replay(workers=1, gravar_db=False)
+    assert len(pd.read_parquet(dataset)) == 4
+
+
+def test_checkpoint_so_depois_do_parquet_publicado(tmp_path, monkeypatch):
+    import pytest
+
+    monkeypatch.setattr(cs, 'PROCESSED_FORMAT', 'parquet')
+    monkeypatch.setattr(cs, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(cs, 'RAW_DIR', os.path.join(str(tmp_path), 'raw'))
+    monkeypatch.setattr(cs, 'PROCESSED_DIR', os.path.join(str(tmp_path), 'processed'))
+    monkeypatch.setattr(cs, '_descobrir_com_cache',
+                        lambda *a: [{'id': 'a1', 'name': 'A1'}, {'id': 'a2', 'name': 'A2'}])
+    monkeypatch.setattr(cs, 'autenticar_spotify', lambda *a: 'tok')
+    monkeypatch.setattr(cs, 'buscar_top_tracks', lambda aid, token, market='BR': [
+        {'id': f'{aid}-{market}', 'name': 'T', 'popularity': 10}])
+    dataset = os.path.join(str(tmp_path), 'processed', 'rock')
+
+    # processo morto antes de fechar o Parquet: linhas so no buffer, nada no checkpoint
+    fechar = cs.fechar_processed_sink
+
+    def _morre(genero=None):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(cs, 'fechar_processed_sink', _morre)
+    with pytest.raises(KeyboardInterrupt):
+        cs.coletar_por_genero('rock', qtd_artistas=2)
+    assert not cs.load_checkpoint('rock').get('processed_markets')
+    monkeypatch.setattr(cs, '_PROCESSED_SINK', None)
+    monkeypatch.setattr(cs, 'fechar_processed_sink', fechar)
+
+    # retomada refaz os dois artistas; o checkpoint so e salvo com o arquivo ja publicado
+    salvar = cs.save_checkpoint
+
+    def _save(genero, checkpoint):
+        assert glob.glob(os.path.join(dataset, '**', 'part_*.parquet'), recursive=True)
+        assert not glob.glob(os.path.join(dataset, '**', '_part_*.parquet'), recursive=True)
+        return salvar(genero, checkpoint)
+    monkeypatch.setattr(cs, 'save_checkpoint', _save)
+    assert len(cs.coletar_por_genero('rock', qtd_artistas=2)) == 2
+    assert sorted(cs.load_checkpoint('rock')['processed_markets']['BR']) == ['a1', 'a2']
+    assert len(pd.read_parquet(dataset)) == 2
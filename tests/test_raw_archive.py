@@ -0,0 +1,71 @@
+import glob
+import json
+import os
+
+import coleta_spotify as cs
+from raw_archive import RawArchive, iter_records
+
+
+def test_segments_rotate_and_read_back(tmp_path):
+    archive = RawArchive(str(tmp_path), max_segment_bytes=300)
+    for i in range(6):
+        archive.append('rock', 'toptracks', f'a{i}', [{'id': f't{i}'}],
+                       url=f'http://x/v1/artists/a{i}/top-tracks?market=BR', status=200, market='BR')
+    # segmento aberto ainda tem sufixo .part
+    assert glob.glob(os.path.join(str(tmp_path), 'rock', '*', '*', '*', '*.part'))
+    archive.close()
+    segments = sorted(glob.glob(os.path.join(str(tmp_path), 'rock', '*', '*', '*', '*.ndjson.gz')))
+    assert len(segments) > 1
+    assert not glob.glob(os.path.join(str(tmp_path), '**', '*.part'), recursive=True)
+    records = [r for seg in segments for r in iter_records(seg)]
+    assert [r['id'] for r in records] == [f'a{i}' for i in range(6)]
+    assert records[0]['entity'] == 'toptracks' and records[0]['status'] == 200
+    assert records[0]['market'] == 'BR' and records[0]['payload'] == [{'id': 't0'}]
+    assert records[0]['fetched_at'].endswith('Z')
+
+
+def test_coleta_grava_archive_ndjson(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, 'RAW_FORMAT', 'ndjson')
+    monkeypatch.setattr(cs, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(cs, 'RAW_DIR', os.path.join(str(tmp_path), 'raw'))
+    monkeypatch.setattr(cs, 'PROCESSED_DIR', os.path.join(str(tmp_path), 'processed'))
+    monkeypatch.setattr(cs, '_descobrir_com_cache', lambda *a: [{'id': 'a1', 'name': 'A1'}])
+    monkeypatch.setattr(cs, 'autenticar_spotify', lambda *a: 'tok')
+    monkeypatch.setattr(cs, 'buscar_top_tracks', lambda aid, token, market='BR': [{'id': 't1', 'name': 'T1'}])
+
+    cs.coletar_por_genero('rock', qtd_artistas=1, markets=['BR', 'PT'])
+    segments = glob.glob(os.path.join(str(tmp_path), 'raw', 'rock', '*', '*', '*', '*.ndjson.gz'))
+    assert len(segments) == 1
+    records = list(iter_records(segments[0]))
+    assert [(r['entity'], r.get('market')) for r in records] == [('artist', None), ('toptracks', 'BR'),
+                                                                 ('toptracks', 'PT')]
+    # nada em raw/misc no modo ndjson
+    assert not os.path.exists(os.path.join(str(tmp_path), 'raw', 'misc'))
+
+
+def test_payload_repetido_vira_referencia(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, 'RAW_DIR', os.path.join(str(tmp_path), 'raw'))
+    monkeypatch.setattr(cs, '_METRICS', {})
+    tracks = [{'id': 't1', 'name': 'T1' * 1000, 'popularity': 50}]
+    for fmt in ('ndjson', 'json'):
+        monkeypatch.setattr(cs, 'RAW_FORMAT', fmt)
+        first = cs.salvar_raw('rock', 'toptracks', f'a-{fmt}', tracks, market='BR')
+        # mesma lista com chaves em outra ordem: mesmo hash canonico
+        second = cs.salvar_raw('rock', 'toptracks', f'a-{fmt}', [{'popularity': 50, 'name': 'T1' * 1000, 'id': 't1'}],
+                               market='BR')
+        changed = cs.salvar_raw('rock', 'toptracks', f'a-{fmt}', [{'id': 't2'}], market='BR')
+        cs.fechar_raw_archive()
+        if fmt == 'json':
+            assert second.endswith('.ref.json') and not changed.endswith('.ref.json') and changed != first
+            with open(second, 'r', encoding='utf-8') as f:
+                assert json.load(f)['payload_ref']['path'] == first
+        else:
+            records = list(iter_records(first))
+            assert 'payload' in records[0] and records[0]['sha256']
+            assert records[1]['payload_ref'] == {'sha256': records[0]['sha256'], 'path': first,
+                                                 'fetched_at': records[1]['payload_ref']['fetched_at']}
+            assert 'payload' not in records[1] and records[2]['payload'] == [{'id': 't2'}]
+    assert cs._METRICS['raw_dedupe_hits'] == 2
+    assert cs._METRICS['raw_dedupe_bytes_saved'] > 0
+    # indice persistido para a proxima execucao
+    assert os.path.exists(os.path.join(cs.RAW_DIR, 'dedupe_index.json'))
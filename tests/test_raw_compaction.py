@@ -0,0 +1,59 @@
+import glob
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pyarrow.parquet as pq
+
+import coleta_spotify as cs
+import raw_compaction
+import replay_raw
+from raw_archive import DedupeIndex, payload_sha256
+
+
+def test_compacta_particoes_e_mantem_referencias(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(cs, 'RAW_DIR', os.path.join(str(tmp_path), 'raw'))
+    monkeypatch.setattr(cs, 'PROCESSED_DIR', os.path.join(str(tmp_path), 'processed'))
+    tracks = [{'id': 't1', 'name': 'T1' * 200, 'popularity': 50}]
+    monkeypatch.setattr(cs, 'RAW_FORMAT', 'ndjson')
+    cs.salvar_raw('rock', 'artist', 'a1', {'id': 'a1', 'name': 'A1'})
+    for _ in range(2):  # a segunda vira payload_ref
+        cs.salvar_raw('rock', 'toptracks', 'a1', tracks, url='http://x', status=200, market='BR')
+    monkeypatch.setattr(cs, 'RAW_FORMAT', 'json')
+    for _ in range(2):
+        cs.salvar_raw('rock', 'toptracks', 'a2', tracks, market='PT')
+    cs.fechar_raw_archive()
+
+    # dia corrente nunca e compactado
+    assert raw_compaction.compactar(cs.RAW_DIR, grace_seconds=0)['particoes'] == 0
+    monkeypatch.setattr(raw_compaction, '_hoje_utc', lambda: datetime.now(timezone.utc).date() + timedelta(days=1))
+    resumo = raw_compaction.compactar(cs.RAW_DIR, grace_seconds=0)
+    assert resumo['particoes'] == 2 and resumo['arquivos'] == 3 and resumo['linhas'] == 5
+
+    for genero, rows in (('rock', 3), ('misc', 2)):
+        day_dir = glob.glob(os.path.join(cs.RAW_DIR, genero, '*', '*', '*'))[0]
+        assert sorted(os.listdir(day_dir)) == ['compacted.parquet', 'manifest.json']
+        with open(os.path.join(day_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        parquet = os.path.join(day_dir, 'compacted.parquet')
+        assert manifest['rows'] == rows and manifest['sha256'] == raw_compaction._sha256_file(parquet)
+        assert all(s['sha256'] for s in manifest['sources'])
+        table = pq.read_table(parquet).to_pylist()
+        assert all(r['payload'] is not None for r in table)
+        assert [r['inlined_ref'] for r in table if r['entity'] == 'toptracks'] == [False, True]
+        if genero == 'misc':
+            assert {r['market'] for r in table} == {'PT'}
+
+    # indice de dedupe passa a apontar para o Parquet e as novas referencias resolvem
+    index = DedupeIndex(os.path.join(cs.RAW_DIR, 'dedupe_index.json'))
+    sha = payload_sha256(tracks)[0]
+    entry = index.lookup(DedupeIndex.key('toptracks', 'a1', 'BR'), sha)
+    assert entry['path'].endswith('compacted.parquet')
+    assert raw_compaction.RefResolver().resolver({'sha256': sha, 'path': entry['path']}) == tracks
+
+    # replay le o Parquet compactado
+    assert replay_raw.replay(workers=1, gravar_db=False)['linhas'] == 1
+
+    # nova rodada sem arquivos novos nao faz nada
+    assert raw_compaction.compactar(cs.RAW_DIR, grace_seconds=0)['particoes'] == 0
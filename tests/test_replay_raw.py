@@ -0,0 +1,48 @@
+import json
+import os
+import sqlite3
+from datetime import date, datetime, timezone
+
+import coleta_spotify as cs
+import replay_raw
+
+
+def _gravar_raw(genero, artist_id, tracks, market='BR'):
+    cs.salvar_raw(genero, 'artist', artist_id, {'id': artist_id, 'name': f'Artista {artist_id}',
+                                                'popularity': 40, 'genres': [genero]})
+    cs.salvar_raw(genero, 'toptracks', artist_id, tracks, url='http://x', status=200, market=market)
+
+
+def test_replay_refaz_processados_e_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, 'RAW_FORMAT', 'ndjson')
+    monkeypatch.setattr(cs, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(cs, 'RAW_DIR', os.path.join(str(tmp_path), 'raw'))
+    monkeypatch.setattr(cs, 'PROCESSED_DIR', os.path.join(str(tmp_path), 'processed'))
+    tracks = [{'id': 't1', 'name': 'T1', 'popularity': 50, 'duration_ms': 1000}]
+    _gravar_raw('rock', 'a1', tracks)
+    _gravar_raw('pop', 'a2', [{'id': 't2', 'name': 'T2'}], market='PT')
+    # segunda coleta com o mesmo payload: vira payload_ref no segmento
+    _gravar_raw('rock', 'a1', tracks)
+    cs.fechar_raw_archive()
+
+    def _chamada_de_rede(*a, **k):
+        raise AssertionError('replay nao pode chamar a API')
+    monkeypatch.setattr(cs, '_request_with_retry', _chamada_de_rede)
+
+    resumo = replay_raw.replay(workers=2)
+    assert resumo['particoes'] == 2 and resumo['artistas'] == 2 and resumo['linhas'] == 2
+    assert resumo['sem_payload'] == 0 and resumo['linhas_por_segundo'] > 0
+
+    hoje = datetime.now(timezone.utc).date()  # particoes sao por dia UTC
+    proc = os.path.join(str(tmp_path), 'processed', 'rock', 'market=BR', f'{hoje.year}', f'{hoje.month:02d}',
+                        f'{hoje.day:02d}', 'Artista_a1_rock.json')
+    with open(proc, 'r', encoding='utf-8') as f:
+        assert json.load(f)[0]['musica'] == 'T1'
+    conn = sqlite3.connect(os.path.join(str(tmp_path), 'spotify.db'))
+    rows = conn.execute('SELECT artist_id, genre, market, track_id FROM tracks ORDER BY artist_id').fetchall()
+    conn.close()
+    assert rows == [('a1', 'rock', 'BR', 't1'), ('a2', 'pop', 'PT', 't2')]
+
+    # filtros de genero e data
+    assert replay_raw.replay(generos=['pop'], gravar_db=False)['particoes'] == 1
+    assert replay_raw.listar_particoes(cs.RAW_DIR, desde=date(hoje.year + 1, 1, 1)) == []
@@ -0,0 +1,127 @@
+import json
+import os
+import time
+
+import pytest
+
+import retention
+from retention import RetentionPolicy
+
+
+def _arquivo(base, rel, size=100):
+    path = os.path.join(base, *rel.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    return path
+
+
+def test_policy_parse():
+    p = RetentionPolicy.parse('days=7,gb=0.5', RetentionPolicy(30, 0, True))
+    assert (p.days, p.max_bytes, p.keep_last) == (7, 512 * 1024 ** 2, True)
+    with pytest.raises(ValueError):
+        RetentionPolicy.parse('dias=7')
+
+
+def test_retencao_por_idade_preserva_ultimo_snapshot(tmp_path):
+    base = str(tmp_path)
+    hoje = time.strftime('%Y/%m/%d', time.gmtime())
+    a_antigo = _arquivo(base, 'processed/rock/market=BR/2024/01/01/A_rock.json')
+    a_ultimo = _arquivo(base, 'processed/rock/market=BR/2024/01/02/A_rock.json')
+    b_hoje = _arquivo(base, f'processed/rock/market=BR/{hoje}/B_rock.json')
+    rank_antigo = _arquivo(base, 'processed/top_tracks_rock_20240101T000000Z.json')
+    rank_ultimo = _arquivo(base, 'processed/top_tracks_rock_20240102T000000Z.json')
+    m_antigo = _arquivo(base, 'metrics_20240101T000000Z.json')
+    seg_ref = _arquivo(base, 'raw/rock/2024/01/01/segment_000000_1_1.ndjson.gz')
+    compactado = _arquivo(base, 'raw/rock/2024/01/02/compacted.parquet')
+    _arquivo(base, 'raw/rock/2024/01/02/manifest.json')
+    with open(os.path.join(base, 'raw', 'dedupe_index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'toptracks:a1:BR': {'sha256': 'x', 'path': seg_ref, 'fetched_at': ''}}, f)
+
+    policies = {t: RetentionPolicy(days=30, keep_last=True) for t in ('raw', 'processed', 'metrics')}
+    relatorio = retention.aplicar(base, policies)
+
+    assert not os.path.exists(a_antigo) and not os.path.exists(rank_antigo)
+    assert os.path.exists(a_ultimo) and os.path.exists(rank_ultimo) and os.path.exists(b_hoje)
+    # metrics: o unico arquivo e o ultimo da serie
+    assert os.path.exists(m_antigo)
+    # raw: alvo do indice de dedupe fica; particao compactada sai junto com o manifest
+    assert os.path.exists(seg_ref)
+    assert not os.path.exists(os.path.dirname(compactado))
+    assert relatorio['processed']['files_removed'] == 2 and relatorio['processed']['bytes_freed'] == 200
+    assert relatorio['raw']['files_removed'] == 1
+
+
+def test_teto_de_tamanho_remove_mais_antigos(tmp_path):
+    base = str(tmp_path)
+    paths = [_arquivo(base, f'metrics_2024010{d}T000000Z.json', size=400) for d in range(1, 6)]
+    r = retention.aplicar_tier('metrics', base, RetentionPolicy(max_bytes=1000, keep_last=True))
+    assert [os.path.exists(p) for p in paths] == [False, False, False, True, True]
+    assert r['bytes_freed'] == 1200 and r['bytes_kept'] == 800
+
+    dry = retention.aplicar_tier('metrics', base, RetentionPolicy(max_bytes=1), dry_run=True)
+    assert dry['files_removed'] == 2 and all(os.path.exists(p) for p in paths[3:])
+
+
+def test_parquet_orfao_sai_apos_carencia(tmp_path):
+    base = str(tmp_path)
+    hoje = time.strftime('%Y/%m/%d', time.gmtime())
+    orfao = _arquivo(base, 'processed/rock/market=BR/2024/01/01/_part_000000_1_1.parquet')
+    antigo = time.time() - retention.OPEN_GRACE_SECONDS - 10
+    os.utime(orfao, (antigo, antigo))
+    aberto = _arquivo(base, f'processed/rock/market=BR/{hoje}/_part_000000_1_2.parquet')
+    publicado = _arquivo(base, 'processed/rock/market=BR/2024/01/01/part_000000_1_3.parquet')
+    # orfao na particao de hoje: a data do diretorio nao o segura, so a carencia pelo mtime
+    orfao_hoje = _arquivo(base, f'processed/rock/market=BR/{hoje}/_part_000000_1_4.parquet')
+    os.utime(orfao_hoje, (antigo, antigo))
+
+    r = retention.aplicar_tier('processed', base, RetentionPolicy(days=30, keep_last=True))
+    assert not os.path.exists(orfao) and not os.path.exists(orfao_hoje)
+    assert os.path.exists(aberto) and os.path.exists(publicado)
+    assert r['files_removed'] == 2
+
+
+def test_raw_mantem_alvo_de_payload_ref_que_fica(tmp_path):
+    base = str(tmp_path)
+
+    def _raw_json(dias, nome, obj, sufixo='.json'):
+        quando = time.gmtime(time.time() - dias * 86400)
+        path = _arquivo(base, f"raw/misc/{time.strftime('%Y/%m/%d', quando)}/"
+                              f"{nome}_{time.strftime('%Y%m%dT%H%M%SZ', quando)}{sufixo}")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f)
+        return path
+
+    # copia completa antiga, referencia mais nova apontando para ela e indice ja movido para outra copia
+    alvo = _raw_json(40, 'toptracks_a1_BR', [{'id': 't1'}])
+    ref = _raw_json(10, 'toptracks_a1_BR', {'payload_ref': {'sha256': 'x', 'path': alvo}}, '.ref.json')
+    atual = _raw_json(1, 'toptracks_a1_BR', [{'id': 't2'}])
+    sem_ref = _raw_json(40, 'toptracks_a2_BR', [{'id': 't3'}])
+    with open(os.path.join(base, 'raw', 'dedupe_index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'toptracks:a1:BR': {'sha256': 'y', 'path': atual, 'fetched_at': ''}}, f)
+
+    r = retention.aplicar_tier('raw', base, RetentionPolicy(days=30, keep_last=True))
+    assert os.path.exists(alvo) and os.path.exists(ref) and os.path.exists(atual)
+    assert not os.path.exists(sem_ref)
+    assert r['files_removed'] == 1
+
+
+def test_checkpoint_de_genero_em_rotacao_nunca_sai(tmp_path):
+    base = str(tmp_path)
+    ativo = _arquivo(base, 'checkpoints/checkpoint_rock.json')
+    bak = _arquivo(base, 'checkpoints/checkpoint_rock.json.bak')
+    fora = _arquivo(base, 'checkpoints/checkpoint_axe.json')
+    antigo = time.time() - 60 * 86400
+    for path in (ativo, bak, fora):
+        os.utime(path, (antigo, antigo))
+    policy = RetentionPolicy(days=30)
+
+    # sem rotacao: so os backups saem
+    retention.aplicar_tier('checkpoints', base, policy)
+    assert os.path.exists(ativo) and os.path.exists(fora) and not os.path.exists(bak)
+
+    with open(os.path.join(base, 'checkpoints', 'genre_rotation.json'), 'w', encoding='utf-8') as f:
+        json.dump({'genres': ['rock', 'pop'], 'index': 1}, f)
+    r = retention.aplicar_tier('checkpoints', base, policy)
+    assert os.path.exists(ativo) and not os.path.exists(fora)
+    assert r['files_removed'] == 1
@@ -14,7 +14,7 @@ def make_resp(status=200, text='ok', headers=None):
     return m
 
 
-@patch('coleta_spotify.requests.request')
+@patch('coleta_spotify.requests.Session.request')
 def test_retry_on_500_then_success(mock_request):
     # first call 500, second call 200
     mock_request.side_effect = [
@@ -24,7 +24,7 @@ def test_retry_on_500_then_success(mock_request):
     assert resp.status_code == 200
 
 
-@patch('coleta_spotify.requests.request')
+@patch('coleta_spotify.requests.Session.request')
 def test_retry_on_429_with_retry_after(mock_request):
     # first call 429 with Retry-After=1, second 200
     mock_request.side_effect = [make_resp(429, 'rate limited', headers={
@@ -34,7 +34,7 @@ def test_retry_on_429_with_retry_after(mock_request):
     assert resp.status_code == 200
 
 
-@patch('coleta_spotify.requests.request')
+@patch('coleta_spotify.requests.Session.request')
 def test_request_exception_then_success(mock_request):
     # first raises RequestException, second returns 200
     from requests import RequestException
@@ -43,3 +43,163 @@ def test_request_exception_then_success(mock_request):
     resp = cs._request_with_retry('get', 'http://example.test')
     assert resp is not None
     assert resp.status_code == 200
+
+
+def test_rate_limiter_pause_blocks_other_callers():
+    import threading
+    import time
+
+    limiter = cs.RateLimiter(rate=0, burst=1)
+    limiter.pause(0.3)
+    waited = []
+    t = threading.Thread(target=lambda: waited.append(limiter.acquire()))
+    start = time.monotonic()
+    t.start()
+    t.join()
+    assert time.monotonic() - start >= 0.25
+    assert waited[0] >= 0.25
+
+
+def test_rate_limiter_token_bucket_spacing():
+    import time
+
+    limiter = cs.RateLimiter(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    # primeira imediata, as outras duas espaçadas de 1/20s
+    assert time.monotonic() - start >= 0.09
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_429_pauses_shared_limiter(mock_request, monkeypatch):
+    limiter = cs.RateLimiter(rate=0, burst=1)
+    monkeypatch.setattr(cs, '_RATE_LIMITER', limiter)
+    before = cs._METRICS.get('rate_limit_pause_seconds', 0)
+    mock_request.side_effect = [make_resp(429, 'rate limited', headers={
+                                          'Retry-After': '1'}), make_resp(200, 'ok')]
+    resp = cs._request_with_retry('get', 'http://example.test')
+    assert resp.status_code == 200
+    assert cs._METRICS['rate_limit_pause_seconds'] - before >= 0.9
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    from datetime import datetime, timedelta, timezone
+    from email.utils import format_datetime
+
+    assert cs._parse_retry_after('3') == 3.0
+    assert cs._parse_retry_after(None) is None
+    assert cs._parse_retry_after('garbage') is None
+    # nao finitos caem no backoff com jitter em vez de pausar o limiter para sempre
+    assert cs._parse_retry_after('inf') is None
+    assert cs._parse_retry_after('nan') is None
+    future = datetime.now(timezone.utc) + timedelta(seconds=20)
+    wait = cs._parse_retry_after(format_datetime(future, usegmt=True))
+    assert 15 <= wait <= 20
+    past = datetime.now(timezone.utc) - timedelta(seconds=20)
+    assert cs._parse_retry_after(format_datetime(past, usegmt=True)) == 0.0
+
+
+def test_decorrelated_jitter_bounds():
+    sleep = 0.5
+    for _ in range(50):
+        nxt = cs._decorrelated_jitter(0.5, sleep, cap=4)
+        assert 0.5 <= nxt <= min(4, sleep * 3)
+        sleep = nxt
+
+
+def test_circuit_breaker_opens_and_probes_half_open():
+    breaker = cs.CircuitBreaker('test', failure_threshold=2, reset_timeout=0.1)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    import time
+    time.sleep(0.12)
+    # half-open: uma unica prova
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    time.sleep(0.12)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_open_breaker_fails_fast(mock_request, monkeypatch):
+    monkeypatch.setattr(cs, '_CIRCUIT_BREAKERS', {})
+    monkeypatch.setattr(cs, '_decorrelated_jitter', lambda base, prev, cap=None: 0)
+    monkeypatch.setattr(cs, 'BREAKER_FAILURES', 2)
+    breaker = cs.CircuitBreaker('search', failure_threshold=2, reset_timeout=60)
+    cs._CIRCUIT_BREAKERS['search'] = breaker
+    mock_request.return_value = make_resp(503, 'down')
+    url = 'https://api.spotify.com/v1/search?q=genre:%22rock%22&type=artist'
+    with pytest.raises(cs.CircuitOpenError):
+        cs._request_with_retry('get', url)
+    assert mock_request.call_count == 2  # terceira tentativa barrada pelo breaker
+    with pytest.raises(cs.CircuitOpenError):
+        cs._request_with_retry('get', url)
+    assert mock_request.call_count == 2
+    # outros endpoints nao sao afetados
+    mock_request.return_value = make_resp(200, 'ok')
+    assert cs._request_with_retry(
+        'get', 'https://api.spotify.com/v1/artists/x/top-tracks?market=BR').status_code == 200
+    assert cs._endpoint_name('https://api.spotify.com/v1/playlists/p/tracks') == 'playlist-tracks'
+    assert cs._endpoint_name('https://accounts.spotify.com/api/token') == 'token'
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_latency_recorded_per_endpoint_status_and_attempt(mock_request, monkeypatch, tmp_path):
+    monkeypatch.setattr(cs, '_API_LATENCY', {})
+    monkeypatch.setattr(cs, '_CIRCUIT_BREAKERS', {})
+    monkeypatch.setattr(cs, '_decorrelated_jitter', lambda base, prev, cap=None: 0)
+    monkeypatch.setattr(cs, 'DATA_DIR', str(tmp_path))
+    mock_request.side_effect = [make_resp(500, 'err'), make_resp(200, 'ok'), make_resp(200, 'ok')]
+    cs._request_with_retry('get', 'https://api.spotify.com/v1/artists/a/top-tracks?market=BR')
+    cs._request_with_retry('get', 'https://api.spotify.com/v1/search?q=x&type=artist')
+
+    summary = cs.api_latency_summary()
+    assert summary['top-tracks']['count'] == 2
+    assert summary['top-tracks']['by_status'] == {'5xx': 1, '2xx': 1}
+    assert summary['top-tracks']['by_attempt'] == {'1': 1, '2': 1}
+    assert summary['search']['by_status'] == {'2xx': 1}
+    assert set(summary['search']) >= {'p50_ms', 'p95_ms', 'p99_ms', 'rate_429'}
+
+    cs._save_metrics()
+    import glob
+    import json
+    path = glob.glob(str(tmp_path / 'metrics_*.json'))[0]
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f)['api_requests']['top-tracks']['count'] == 2
+
+
+def test_percentile_nearest_rank():
+    values = sorted(range(1, 101))
+    assert cs._percentile(values, 50) == 50
+    assert cs._percentile(values, 99) == 99
+    assert cs._percentile([7], 95) == 7
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_reenvio_interno_nao_disputa_a_prova_half_open(mock_request, monkeypatch):
+    import time
+
+    monkeypatch.setattr(cs, '_CIRCUIT_BREAKERS', {})
+    breaker = cs.CircuitBreaker('top-tracks', failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    cs._CIRCUIT_BREAKERS['top-tracks'] = breaker
+    time.sleep(0.06)
+    # 304 cujo body saiu do cache: a mesma chamada repete sem validadores, ainda com a prova
+    cache = MagicMock()
+    cache.lookup.return_value = {'key': 'k'}
+    cache.conditional_headers.return_value = {'If-None-Match': '"v1"'}
+    cache.read_body.return_value = None
+    monkeypatch.setattr(cs, '_get_response_cache', lambda: cache)
+    mock_request.side_effect = [make_resp(304, ''), make_resp(200, 'ok')]
+
+    resp = cs._request_with_retry('get', 'https://api.spotify.com/v1/artists/a/top-tracks?market=BR')
+    assert resp.status_code == 200
+    assert mock_request.call_count == 2 and breaker.state == 'closed'
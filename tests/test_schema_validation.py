@@ -0,0 +1,59 @@
+import json
+import os
+import sqlite3
+
+import coleta_spotify as cs
+
+
+def test_validador_compilado_em_cache(tmp_path):
+    schema = tmp_path / 'schema.json'
+    schema.write_text(json.dumps({'type': 'array', 'items': {'type': 'object', 'required': ['artista']}}))
+    v1 = cs._get_schema_validator(str(schema))
+    assert cs._get_schema_validator(str(schema)) is v1
+    assert cs.validar_com_schema([{'artista': 'A'}], str(schema))
+    assert not cs.validar_com_schema([{}], str(schema))
+    assert cs._get_schema_validator(str(tmp_path / 'nao_existe.json')) is None
+
+
+def test_schema_invalido_nao_levanta(tmp_path):
+    malformado = tmp_path / 'malformado.json'
+    malformado.write_text('{"type": "array",')
+    invalido = tmp_path / 'invalido.json'
+    invalido.write_text(json.dumps({'type': 'array', 'items': {'type': 12}}))
+    for path in (malformado, invalido):
+        assert cs._get_schema_validator(str(path)) is None
+        assert cs.validar_com_schema([{'artista': 'A'}], str(path)) is False
+
+
+def test_lote_sem_subschema_de_item_e_rejeitado_inteiro(tmp_path):
+    schema = tmp_path / 'schema.json'
+    schema.write_text(json.dumps({'type': 'array', 'maxItems': 1}))
+    validator = cs._get_schema_validator(str(schema))
+    assert validator.validar_lote([{'id': 't1'}]) == ([0], [])
+    validos, rejeitados = validator.validar_lote([{'id': 't1'}, {'id': 't2'}])
+    assert validos == [] and [i for i, _ in rejeitados] == [0, 1] and rejeitados[0][1]
+
+
+def test_linhas_invalidas_vao_para_rejects(tmp_path, monkeypatch):
+    monkeypatch.setattr(cs, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(cs, 'PROCESSED_DIR', os.path.join(str(tmp_path), 'processed'))
+    monkeypatch.setattr(cs, '_METRICS', {})
+    tracks = [{'id': 't1', 'name': 'Boa', 'popularity': 50},
+              {'id': 't2', 'name': 'Ruim', 'popularity': 'alta'}]
+
+    out = cs.processar_e_salvar({'id': 'a1', 'name': 'A1'}, tracks, 'rock', market='BR')
+    with open(out, 'r', encoding='utf-8') as f:
+        assert [r['id'] for r in json.load(f)] == ['t1']
+    rejects = [os.path.join(root, fn) for root, _, files in os.walk(os.path.join(str(tmp_path), 'rejects'))
+               for fn in files]
+    assert len(rejects) == 1 and 'market=BR' in rejects[0]
+    with open(rejects[0], 'r', encoding='utf-8') as f:
+        linhas = [json.loads(line) for line in f]
+    assert [(r['row']['id'], r['artist_id']) for r in linhas] == [('t2', 'a1')] and linhas[0]['erro']
+
+    conn = sqlite3.connect(os.path.join(str(tmp_path), 'spotify.db'))
+    assert conn.execute('SELECT track_id FROM tracks').fetchall() == [('t1',)]
+    conn.close()
+    assert cs._METRICS['rows_rejected'] == 1
+    for etapa in ('normalize', 'validate', 'write', 'db'):
+        assert f'stage_{etapa}_seconds' in cs._METRICS
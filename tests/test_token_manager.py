@@ -0,0 +1,70 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import coleta_spotify as cs
+
+
+def make_resp(status=200, payload=None):
+    m = MagicMock()
+    m.status_code = status
+    m.text = ''
+    m.headers = {}
+    m.json.return_value = payload or {}
+    return m
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_token_cached_until_expiry(mock_request):
+    mock_request.return_value = make_resp(
+        200, {'access_token': 'tok-1', 'expires_in': 3600})
+    tm = cs.TokenManager('cid', 'secret')
+    assert tm.get_token() == 'tok-1'
+    assert tm.get_token() == 'tok-1'
+    assert mock_request.call_count == 1
+
+    # dentro da margem de renovacao -> novo exchange
+    mock_request.return_value = make_resp(
+        200, {'access_token': 'tok-2', 'expires_in': 3600})
+    tm._expires_at = cs.time.time() + tm.refresh_margin - 1
+    assert tm.get_token() == 'tok-2'
+    assert mock_request.call_count == 2
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_token_disk_cache_shared_between_managers(mock_request, tmp_path):
+    cache = str(tmp_path / 'token.json')
+    mock_request.return_value = make_resp(
+        200, {'access_token': 'tok-disk', 'expires_in': 3600})
+    assert cs.TokenManager('cid', 's', cache_path=cache).get_token() == 'tok-disk'
+    # outro processo (novo manager) le do disco sem novo exchange
+    assert cs.TokenManager('cid', 's', cache_path=cache).get_token() == 'tok-disk'
+    assert mock_request.call_count == 1
+    with open(cache, 'r', encoding='utf-8') as f:
+        assert json.load(f)['access_token'] == 'tok-disk'
+    # client id diferente nao reaproveita o token
+    mock_request.return_value = make_resp(
+        200, {'access_token': 'tok-other', 'expires_in': 3600})
+    assert cs.TokenManager('other', 's', cache_path=cache).get_token() == 'tok-other'
+
+
+@patch('coleta_spotify.requests.Session.request')
+def test_401_refreshes_token_once(mock_request, monkeypatch):
+    monkeypatch.setattr(cs, '_TOKEN_MANAGERS', {})
+    mock_request.return_value = make_resp(
+        200, {'access_token': 'old', 'expires_in': 3600})
+    token = cs.autenticar_spotify('cid-401', 'secret')
+    assert token == 'old'
+
+    mock_request.reset_mock()
+    mock_request.return_value = None
+    mock_request.side_effect = [
+        make_resp(401),
+        make_resp(200, {'access_token': 'new', 'expires_in': 3600}),
+        make_resp(200, {'ok': True}),
+    ]
+    resp = cs._request_with_retry(
+        'get', 'http://example.test/v1/x', headers={'Authorization': f'Bearer {token}'})
+    assert resp.status_code == 200
+    last_headers = mock_request.call_args_list[-1].kwargs['headers']
+    assert last_headers['Authorization'] == 'Bearer new'
+    assert cs.autenticar_spotify('cid-401', 'secret') == 'new'